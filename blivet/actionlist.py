@@ -21,14 +21,19 @@
 #
 
 import copy
+import sys
+from threading import Condition, Lock, Thread
+
+import six
 
 from .deviceaction import ActionCreateDevice
 from .deviceaction import action_type_from_string, action_object_from_string
 from .devicelibs import lvm
-from .devices import PartitionDevice
+from .devices import Device, PartitionDevice
 from .errors import DiskLabelCommitError, StorageError
 from .flags import flags
 from . import tsort
+from . import udev
 
 import logging
 log = logging.getLogger("blivet")
@@ -38,13 +43,27 @@ class ActionList(object):
         self._actions = []
         self._completed_actions = []
 
+        # the actions in their order before the last sort and the graph the
+        # sort was based on, whose items are indices into that list
+        self._graph = None
+
+        # the undo journal to save the list's state in before changing it;
+        # see DeviceTree.checkpoint
+        self.journal = None
+
     def __iter__(self):
         return iter(self._actions)
 
+    def _recordState(self):
+        if self.journal is not None:
+            self.journal.record(self)
+
     def append(self, action):
+        self._recordState()
         self._actions.append(action)
 
     def remove(self, action):
+        self._recordState()
         self._actions.remove(action)
 
     def find(self, device=None, action_type=None, object_type=None,
@@ -98,57 +117,183 @@ class ActionList(object):
         return actions
 
     def prune(self):
-        """ Remove redundant/obsolete actions from the action list. """
-        for action in reversed(self._actions[:]):
-            if action not in self._actions:
+        """ Remove redundant/obsolete actions from the action list.
+
+            An action can only obsolete actions on a device with the same id
+            or, for device destroy actions, actions adding members to the
+            destroyed container, so each action is only compared to the
+            actions in its device's bucket.
+        """
+        buckets = {}
+        for action in self._actions:
+            buckets.setdefault(action.device.id, []).append(action)
+            if action.isAdd:
+                buckets.setdefault(action.container.id, []).append(action)
+
+        pruned = set()
+        for action in reversed(self._actions):
+            if action.id in pruned:
                 log.debug("action %d already pruned", action.id)
                 continue
 
-            for obsolete in self._actions[:]:
+            for obsolete in buckets[action.device.id]:
+                if obsolete.id in pruned:
+                    continue
+
                 if action.obsoletes(obsolete):
                     log.info("removing obsolete action %d (%d)",
                              obsolete.id, action.id)
-                    self._actions.remove(obsolete)
+                    pruned.add(obsolete.id)
 
-                    if obsolete.obsoletes(action) and action in self._actions:
+                    if obsolete.obsoletes(action) and action.id not in pruned:
                         log.info("removing mutually-obsolete action %d (%d)",
                                  action.id, obsolete.id)
-                        self._actions.remove(action)
+                        pruned.add(action.id)
+
+        if pruned:
+            self._actions = [a for a in self._actions if a.id not in pruned]
+
+    @staticmethod
+    def _dependencyKeys(device, cache):
+        """ Return the index keys of everything device can depend on.
+
+            :param device: the device whose dependencies to collect
+            :type device: :class:`~.devices.Device`
+            :param dict cache: already computed key sets, hashed by device id
+            :returns: keys of all devices (and partition groups) device may
+                      depend on, including device itself
+            :rtype: frozenset
+
+            This is a superset of the devices for which
+            :meth:`~.devices.Device.dependsOn` can return True.
+        """
+        keys = cache.get(device.id)
+        if keys is not None:
+            return keys
+
+        keys = set([("device", device.id)])
+        deps = list(device.parents)
+        for attr in ("origin", "source"):
+            # snapshots depend on their origin/source
+            dep = getattr(device, attr, None)
+            if isinstance(dep, Device):
+                deps.append(dep)
+
+        if isinstance(device, PartitionDevice) and device.disk and \
+           device.isLogical:
+            # logical partitions depend on the extended partition
+            keys.add(("extended", device.disk.id))
+
+        for dep in deps:
+            keys.update(ActionList._dependencyKeys(dep, cache))
+
+        keys = frozenset(keys)
+        cache[device.id] = keys
+        return keys
+
+    def _candidatePairs(self):
+        """ Generate all pairs of actions that may have an ordering relation
+            other than the one based solely on action type.
+
+            :returns: pairs of indices into the action list, in no particular
+                      direction; each pair is generated at most once
+        """
+        index = {}      # key -> list of indices of actions indexed under key
+        lookups = []    # keys to look up for each action
+        cache = {}
+        for idx, action in enumerate(self._actions):
+            device = action.device
+            keys = [("device", device.id)]
+            lookup = set(self._dependencyKeys(device, cache))
+            if isinstance(device, PartitionDevice) and device.disk:
+                # partitions on one disk are created/removed in number order
+                keys.append(("disk", device.disk.id))
+                lookup.add(("disk", device.disk.id))
+                if device.isExtended:
+                    keys.append(("extended", device.disk.id))
+
+            if action.isAdd:
+                keys.append(("container", action.container.id))
+            elif action.container is not None:
+                lookup.add(("container", action.container.id))
+
+            container = getattr(device, "container", None)
+            if container is not None:
+                keys.append(("member", container.id))
+
+            if action.isRemove:
+                lookup.add(("member", action.container.id))
+
+            for key in keys:
+                index.setdefault(key, []).append(idx)
+
+            lookups.append(lookup)
+
+        seen = set()
+        for idx, lookup in enumerate(lookups):
+            for key in lookup:
+                for other in index.get(key, []):
+                    if other == idx:
+                        continue
+
+                    pair = (min(idx, other), max(idx, other))
+                    if pair in seen:
+                        continue
+
+                    seen.add(pair)
+                    yield pair
 
     def sort(self):
-        """ Sort actions based on dependencies. """
+        """ Sort actions based on dependencies.
+
+            Every non-container action requires all non-container actions of
+            a higher type (see :meth:`~.deviceaction.DeviceAction.requires`).
+            Instead of an edge for each such pair, the graph gets a barrier
+            node between consecutive action types, which keeps the number of
+            edges linear. All other requirements involve related devices, so
+            :meth:`requires` is only consulted for the pairs generated by
+            :meth:`_candidatePairs`.
+        """
+        self._graph = None
         if not self._actions:
             return
 
         edges = []
-
-        # collect all ordering requirements for the actions
-        for action in self._actions:
-            action_idx = self._actions.index(action)
-            children = []
-            for _action in self._actions:
-                if _action == action:
-                    continue
-
-                # create edges based on both action type and dependencies.
-                if _action.requires(action):
-                    children.append(_action)
-
-            for child in children:
-                child_idx = self._actions.index(child)
-                edges.append((action_idx, child_idx))
+        n_actions = len(self._actions)
+
+        # order by action type using one barrier node between each two types
+        layers = {}
+        for idx, action in enumerate(self._actions):
+            if not action.isContainer:
+                layers.setdefault(action.type, []).append(idx)
+
+        barrier = n_actions
+        types = sorted(layers.keys(), reverse=True)
+        for (prev_type, next_type) in zip(types, types[1:]):
+            edges.extend((idx, barrier) for idx in layers[prev_type])
+            edges.extend((barrier, idx) for idx in layers[next_type])
+            barrier += 1
+
+        # collect all other ordering requirements for the actions
+        for (idx, other) in self._candidatePairs():
+            action = self._actions[idx]
+            _action = self._actions[other]
+            if _action.requires(action):
+                edges.append((idx, other))
+
+            if action.requires(_action):
+                edges.append((other, idx))
 
         # create a graph reflecting the ordering information we have
-        graph = tsort.create_graph(list(range(len(self._actions))), edges)
+        graph = tsort.create_graph(list(range(barrier)), edges)
 
         # perform a topological sort based on the graph's contents
         order = tsort.tsort(graph)
+        self._graph = (self._actions, graph)
 
         # now replace self._actions with a sorted version of the same list
-        actions = []
-        for idx in order:
-            actions.append(self._actions[idx])
-        self._actions = actions
+        self._actions = [self._actions[idx] for idx in order
+                         if idx < n_actions]
 
     def _preProcess(self, devices=None):
         """ Prepare the action queue for execution. """
@@ -261,6 +406,174 @@ class ActionList(object):
         devices = [a.name for a in active if any(d in disks for d in a.disks)]
         return devices
 
+    def _executeAction(self, action, callbacks, devices):
+        """ Execute an action, retrying once if its disklabel commit fails. """
+        try:
+            action.execute(callbacks)
+        except DiskLabelCommitError:
+            # it's likely that a previous action
+            # triggered setup of an lvm or md device.
+            # include deps no longer in the tree due to pending removal
+            devs = devices + [a.device for a in self._actions[:]]
+            for dep in set(devs):
+                if dep.exists and dep.dependsOn(action.device.disk):
+                    dep.teardown(recursive=True)
+
+            action.execute(callbacks)
+
+    @staticmethod
+    def _updatePartitionNames(devices, disks=None):
+        """ Catch any renumbering parted does.
+
+            :param devices: the devices in the tree
+            :keyword disks: only update partitions on these disks
+            :type disks: collection of :class:`~.devices.StorageDevice`
+        """
+        for device in devices:
+            if device.exists and isinstance(device, PartitionDevice) and \
+               (disks is None or device.disk in disks):
+                device.updateName()
+                device.format.device = device.path
+
+    @staticmethod
+    def _serializeCallbacks(callbacks):
+        """ Return callbacks that are never run concurrently.
+
+            :param callbacks: callbacks to be invoked when actions are executed
+            :type callbacks: :class:`~.callbacks.DoItCallbacks` or None
+        """
+        if callbacks is None:
+            return None
+
+        lock = Lock()
+
+        def serialized(func):
+            if func is None:
+                return None
+
+            def wrapper(*args, **kwargs):
+                with lock:
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return callbacks.__class__(*(serialized(f) for f in callbacks))
+
+    def _processParallel(self, callbacks, devices):
+        """ Execute the sorted actions concurrently where possible.
+
+            :param callbacks: callbacks to be invoked when actions are executed
+            :type callbacks: :class:`~.callbacks.DoItCallbacks`
+            :param devices: a list of all devices current in the devicetree
+
+            An action is started once all the actions it requires according
+            to the graph built by :meth:`sort` are done, and no other action
+            using any of its disks is running. Actions are started in sorted
+            order as far as that allows, in up to
+            :attr:`~.flags.Flags.action_threads` threads.
+
+            If an action fails no more actions are started and the exception
+            is raised once the running ones have finished. The actions that
+            have not been executed remain in the list.
+
+            The external programs the actions run are not serialized either;
+            program_log_lock is only held while their command lines and
+            output are logged (see :func:`~.util.run_program`).
+        """
+        (actions, graph) = self._graph
+        nodes = dict((action.id, idx) for (idx, action) in enumerate(actions))
+        position = dict((action.id, idx) for (idx, action) in enumerate(self._actions))
+        incoming = graph['incoming'].copy()
+        callbacks = self._serializeCallbacks(callbacks)
+
+        # actions on devices built on any of the same disks (or other devices
+        # without parents) never run at the same time, so disklabel commits
+        # and partition renumbering stay serialized
+        keys = {}
+        for action in self._actions:
+            keys[action.id] = frozenset(d.id for d in action.device.ancestors
+                                        if not d.parents)
+
+        ready = []
+        busy = set()
+        state = {"running": 0, "error": None}
+        cond = Condition()
+
+        def release(node):
+            for child in graph['children'][node]:
+                incoming[child] -= 1
+                if incoming[child] != 0:
+                    continue
+
+                if child < len(actions):
+                    ready.append(actions[child])
+                else:
+                    # barrier between action types
+                    release(child)
+
+        for node in graph['items']:
+            if node < len(actions) and incoming[node] == 0:
+                ready.append(actions[node])
+
+        ready.sort(key=lambda a: position[a.id])
+
+        def next_action():
+            while True:
+                if state["error"] is not None or \
+                   (not ready and not state["running"]):
+                    return None
+
+                for action in ready:
+                    if not keys[action.id] & busy:
+                        ready.remove(action)
+                        busy.update(keys[action.id])
+                        state["running"] += 1
+                        return action
+
+                cond.wait()
+
+        def worker():
+            while True:
+                with cond:
+                    action = next_action()
+                    if action is None:
+                        cond.notify_all()
+                        return
+
+                log.info("executing action: %s", action)
+                try:
+                    self._executeAction(action, callbacks, devices)
+                except Exception: # pylint: disable=broad-except
+                    error = sys.exc_info()
+                else:
+                    error = None
+
+                with cond:
+                    state["running"] -= 1
+                    busy.difference_update(keys[action.id])
+                    if error is None:
+                        self._updatePartitionNames(devices,
+                                                   action.device.disks)
+                        self._actions.remove(action)
+                        self._completed_actions.append(action)
+                        release(nodes[action.id])
+                        ready.sort(key=lambda a: position[a.id])
+                    elif state["error"] is None:
+                        state["error"] = error
+
+                    cond.notify_all()
+
+        threads = [Thread(target=worker)
+                   for _i in range(min(flags.action_threads, len(self._actions)))]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if state["error"] is not None:
+            six.reraise(*state["error"])
+
     def process(self, callbacks=None, devices=None, dryRun=None):
         """
         Execute all registered actions.
@@ -269,32 +582,30 @@ class ActionList(object):
         :param devices: a list of all devices current in the devicetree
         :type callbacks: :class:`~.callbacks.DoItCallbacks`
 
+        With :attr:`~.flags.Flags.action_threads` greater than 1, actions on
+        disjoint sets of disks may be executed concurrently (see
+        :meth:`_processParallel`). The callbacks are then called from the
+        threads executing the actions, but never more than one at a time.
         """
         devices = devices or []
+        settles = udev.settle_coordinator.stats
         self._preProcess(devices=devices)
 
+        if not dryRun and flags.action_threads > 1 and len(self._actions) > 1:
+            log.info("executing %d actions using up to %d threads",
+                     len(self._actions), flags.action_threads)
+            self._processParallel(callbacks, devices)
+
         for action in self._actions[:]:
             log.info("executing action: %s", action)
             if not dryRun:
-                try:
-                    action.execute(callbacks)
-                except DiskLabelCommitError:
-                    # it's likely that a previous action
-                    # triggered setup of an lvm or md device.
-                    # include deps no longer in the tree due to pending removal
-                    devs = devices + [a.device for a in self._actions]
-                    for dep in set(devs):
-                        if dep.exists and dep.dependsOn(action.device.disk):
-                            dep.teardown(recursive=True)
-
-                    action.execute(callbacks)
-
-                for device in devices:
-                    # make sure we catch any renumbering parted does
-                    if device.exists and isinstance(device, PartitionDevice):
-                        device.updateName()
-                        device.format.device = device.path
-
+                self._executeAction(action, callbacks, devices)
+                self._updatePartitionNames(devices)
                 self._completed_actions.append(self._actions.pop(0))
 
         self._postProcess(devices=devices)
+
+        stats = udev.settle_coordinator.stats
+        log.info("udev settle: %d requested, %d executed while processing actions",
+                 stats.requested - settles.requested,
+                 stats.executed - settles.executed)
@@ -45,7 +45,7 @@ from .devicetree import DeviceTree
 from .formats import get_default_filesystem_type
 from .flags import flags
 from .platform import platform as _platform
-from .formats import getFormat
+from .formats import getFormat, probesPutOff
 from .osinstall import FSSet, findExistingInstallations
 from . import arch
 from . import iscsi
@@ -69,6 +69,32 @@ def empty_device(device, devicetree):
 
     return empty
 
+def devicetree_view(func):
+    """ Cache the result of a :class:`Blivet` method returning a device list.
+
+        The cached list (or dict of lists) is discarded whenever the device
+        tree changes (see :attr:`~.devicetree.DeviceTree.generation`) and
+        callers get a copy of it, and of any lists in it, that they are free
+        to modify.
+    """
+    @functools.wraps(func)
+    def wrapper(self):
+        key = (self.devicetree, self.devicetree.generation)
+        if self._views_key != key:
+            self._views = {}
+            self._views_key = key
+
+        if func.__name__ not in self._views:
+            self._views[func.__name__] = func(self)
+
+        view = self._views[func.__name__]
+        if isinstance(view, dict):
+            return dict((key, copy.copy(value)) for (key, value) in view.items())
+
+        return copy.copy(view)
+
+    return wrapper
+
 class StorageDiscoveryConfig(object):
     """ Class to encapsulate various detection/initialization parameters. """
     def __init__(self):
@@ -151,6 +177,10 @@ class Blivet(object):
         self.services = set()
         self._free_space_snapshot = None
 
+        # cached device lists; see devicetree_view
+        self._views = {}
+        self._views_key = None
+
     def doIt(self, callbacks=None):
         """
         Commit queued changes to disk.
@@ -323,6 +353,7 @@ class Blivet(object):
         return list(_all.difference(used))
 
     @property
+    @devicetree_view
     def devices(self):
         """ A list of all the devices in the device tree. """
         devices = self.devicetree.devices
@@ -330,6 +361,7 @@ class Blivet(object):
         return devices
 
     @property
+    @devicetree_view
     def disks(self):
         """ A list of the disks in the device tree.
 
@@ -350,6 +382,7 @@ class Blivet(object):
         return disks
 
     @property
+    @devicetree_view
     def partitioned(self):
         """ A list of the partitioned devices in the device tree.
 
@@ -377,6 +410,7 @@ class Blivet(object):
         return partitioned
 
     @property
+    @devicetree_view
     def partitions(self):
         """ A list of the partitions in the device tree.
 
@@ -388,7 +422,17 @@ class Blivet(object):
         partitions.sort(key=lambda d: d.name)
         return partitions
 
+    @devicetree_view
+    def _partitionsByDisk(self):
+        """ Dict of the lists of partitions on each disk, hashed by disk id. """
+        partitions = {}
+        for partition in self.partitions:
+            partitions.setdefault(partition.disk.id, []).append(partition)
+
+        return partitions
+
     @property
+    @devicetree_view
     def vgs(self):
         """ A list of the LVM Volume Groups in the device tree.
 
@@ -401,6 +445,7 @@ class Blivet(object):
         return vgs
 
     @property
+    @devicetree_view
     def lvs(self):
         """ A list of the LVM Logical Volumes in the device tree.
 
@@ -413,6 +458,7 @@ class Blivet(object):
         return lvs
 
     @property
+    @devicetree_view
     def thinlvs(self):
         """ A list of the LVM Thin Logical Volumes in the device tree.
 
@@ -425,6 +471,7 @@ class Blivet(object):
         return thin
 
     @property
+    @devicetree_view
     def thinpools(self):
         """ A list of the LVM Thin Pool Logical Volumes in the device tree.
 
@@ -437,6 +484,7 @@ class Blivet(object):
         return pools
 
     @property
+    @devicetree_view
     def pvs(self):
         """ A list of the LVM Physical Volumes in the device tree.
 
@@ -450,6 +498,7 @@ class Blivet(object):
         return pvs
 
     @property
+    @devicetree_view
     def mdarrays(self):
         """ A list of the MD arrays in the device tree.
 
@@ -462,6 +511,7 @@ class Blivet(object):
         return arrays
 
     @property
+    @devicetree_view
     def mdcontainers(self):
         """ A list of the MD containers in the device tree. """
         arrays = self.devicetree.getDevicesByType("mdcontainer")
@@ -469,6 +519,7 @@ class Blivet(object):
         return arrays
 
     @property
+    @devicetree_view
     def mdmembers(self):
         """ A list of the MD member devices in the device tree.
 
@@ -482,6 +533,7 @@ class Blivet(object):
         return members
 
     @property
+    @devicetree_view
     def btrfsVolumes(self):
         """ A list of the BTRFS volumes in the device tree.
 
@@ -493,6 +545,7 @@ class Blivet(object):
                       key=lambda d: d.name)
 
     @property
+    @devicetree_view
     def swaps(self):
         """ A list of the swap devices in the device tree.
 
@@ -730,6 +783,7 @@ class Blivet(object):
         if clearPartType is None:
             clearPartType = self.config.clearPartType
 
+        partitions = self._partitionsByDisk()
         free = {}
         for disk in disks:
             should_clear = self.shouldClear(disk, clearPartType=clearPartType,
@@ -742,7 +796,7 @@ class Blivet(object):
             fs_free = Size(0)
             if disk.partitioned:
                 disk_free = disk.format.free
-                for partition in [p for p in self.partitions if p.disk == disk]:
+                for partition in partitions.get(disk.id, []):
                     # only check actual filesystems since lvm &c require a bunch of
                     # operations to translate free filesystem space into free disk
                     # space
@@ -1351,7 +1405,8 @@ class Blivet(object):
         key = "devices.%d.%s" % (time.time(), suffix)
         with contextlib.closing(shelve.open(self._dumpFile)) as shelf:
             try:
-                shelf[key] = [d.dict for d in self.devices]
+                with probesPutOff():
+                    shelf[key] = [d.dict for d in self.devices]
             except AttributeError:
                 log_exception_info()
 
@@ -1664,31 +1719,39 @@ class Blivet(object):
     def copy(self):
         log.debug("starting Blivet copy")
         new = copy.deepcopy(self)
+
+        # id -> device for all of the copy's devices, including hidden ones
+        devices = dict((d.id, d) for d in new.devicetree._devices + new.devicetree._hidden)
+
         # go through and re-get partedPartitions from the disks since they
         # don't get deep-copied
         hidden_partitions = [d for d in new.devicetree._hidden
                                 if isinstance(d, PartitionDevice)]
+        parted_partitions = {}
         for partition in new.partitions + hidden_partitions:
             if not partition._partedPartition:
                 continue
 
             # update the refs in req_disks as well
-            req_disks = (new.devicetree.getDeviceByID(disk.id) for disk in partition.req_disks)
+            req_disks = (devices.get(disk.id) for disk in partition.req_disks)
             partition.req_disks = [disk for disk in req_disks if disk is not None]
 
-            p = partition.disk.format.partedDisk.getPartitionByPath(partition.path)
-            partition.partedPartition = p
+            disk = partition.disk
+            if disk.id not in parted_partitions:
+                parted_partitions[disk.id] = dict((p.path, p) for p in disk.format.partedDisk.partitions)
+
+            partition.partedPartition = parted_partitions[disk.id].get(partition.path)
 
         for root in new.roots:
-            root.swaps = [new.devicetree.getDeviceByID(d.id, hidden=True) for d in root.swaps]
+            root.swaps = [devices.get(d.id) for d in root.swaps]
             root.swaps = [s for s in root.swaps if s]
 
+            removed = set()
             for (mountpoint, old_dev) in root.mounts.items():
-                removed = set()
                 if old_dev is None:
                     continue
 
-                new_dev = new.devicetree.getDeviceByID(old_dev.id, hidden=True)
+                new_dev = devices.get(old_dev.id)
                 if new_dev is None:
                     # if the device has been removed don't include this
                     # mountpoint at all
@@ -305,9 +305,7 @@ class DeviceFactory(object):
         self.min_luks_entropy = min_luks_entropy
 
         # used for error recovery
-        self.__devices = []
-        self.__actions = []
-        self.__names = []
+        self.__checkpoint = None
         self.__roots = []
 
     @property
@@ -669,6 +667,7 @@ class DeviceFactory(object):
         else:
             if (hasattr(current_format, "mountpoint") and
                 current_format.mountpoint != self.mountpoint):
+                current_format.recordState()
                 current_format.mountpoint = self.mountpoint
 
             if (hasattr(current_format, "label") and
@@ -759,18 +758,24 @@ class DeviceFactory(object):
             # only do the backup/restore error handling in the top-level factory
             self._save_devicetree()
 
+        configured = False
         try:
             self._configure()
+            configured = True
         except Exception as e:
             log.error("failed to configure device factory: %s", e)
-            if self.parent_factory is None:
-                # only do the backup/restore error handling at the top-level
-                self._revert_devicetree()
-
             if not isinstance(e, (StorageError, OverflowError)):
                 e = DeviceFactoryError(str(e))
 
             raise(e)
+        finally:
+            # only do the backup/restore error handling at the top-level; the
+            # checkpoint is reverted on any failure, including interruptions
+            if self.parent_factory is None:
+                if configured:
+                    self.storage.devicetree.releaseCheckpoint(self.__checkpoint)
+                else:
+                    self._revert_devicetree()
 
     def _configure(self):
         self._set_container()
@@ -806,6 +811,7 @@ class DeviceFactory(object):
 
         if self.container and hasattr(self.container, "size_policy") and \
            not self.container.exists:
+            self.container.recordState()
             self.container.size_policy = self.container_size
 
         # Configure this factory's leaf device, eg, for LVMFactory: the LV.
@@ -818,16 +824,11 @@ class DeviceFactory(object):
     # methods for error recovery
     #
     def _save_devicetree(self):
-        _blivet_copy = self.storage.copy()
-        self.__devices = _blivet_copy.devicetree._devices
-        self.__actions = _blivet_copy.devicetree._actions
-        self.__names = _blivet_copy.devicetree.names
-        self.__roots = _blivet_copy.roots
+        self.__checkpoint = self.storage.devicetree.checkpoint()
+        self.__roots = self.storage.roots[:]
 
     def _revert_devicetree(self):
-        self.storage.devicetree._devices = self.__devices
-        self.storage.devicetree._actions = self.__actions
-        self.storage.devicetree.names = self.__names
+        self.storage.devicetree.revertCheckpoint(self.__checkpoint)
         self.storage.roots = self.__roots
 
 class PartitionFactory(DeviceFactory):
@@ -860,6 +861,7 @@ class PartitionFactory(DeviceFactory):
 
             base_size = self._get_base_size()
             size = self._get_device_size()
+            self.raw_device.recordState()
             self.raw_device.req_base_size = base_size
             self.raw_device.req_size = base_size
             self.raw_device.req_max_size = size
@@ -892,6 +894,7 @@ class PartitionFactory(DeviceFactory):
         return device
 
     def _set_disks(self):
+        self.raw_device.recordState()
         self.raw_device.req_disks = self.disks[:]
 
     def _set_name(self):
@@ -1038,6 +1041,7 @@ class PartitionSetFactory(PartitionFactory):
             member = member.raw_device
 
             # max size is set after instantiating the SizeSet below
+            member.recordState()
             member.req_base_size = base_size
             member.req_size = member.req_base_size
             member.req_grow = True
@@ -1101,6 +1105,7 @@ class PartitionSetFactory(PartitionFactory):
         self.storage.size_sets.append(size_set)
         for member in members[:]:
             member = member.raw_device
+            member.recordState()
             member.req_max_size = size_set.size
 
         ##
@@ -1164,6 +1169,7 @@ class LVMFactory(DeviceFactory):
         if self.device and size != self.raw_device.size:
             log.info("adjusting device size from %s to %s",
                             self.raw_device.size, size)
+            self.raw_device.recordState()
             self.raw_device.size = size
             self.raw_device.req_grow = False
 
@@ -1506,6 +1512,7 @@ class LVMThinPFactory(LVMFactory):
 
     def _set_pool_size(self):
         new_size = self._get_pool_size()
+        self.pool.recordState()
         self.pool.size = new_size
         self.pool.req_grow = False
 
@@ -1704,6 +1711,7 @@ class BTRFSFactory(DeviceFactory):
         if self.device == self.container:
             # This is a btrfs volume -- the only thing not handled already is
             # updating the mountpoint.
+            self.device.format.recordState()
             self.device.format.mountpoint = self.mountpoint
             return
 
@@ -27,6 +27,7 @@ import logging
 log = logging.getLogger("blivet")
 
 from . import raid
+from .. import util
 from ..size import Size
 from ..i18n import N_
 from ..flags import flags
@@ -55,6 +56,9 @@ KNOWN_THPOOL_PROFILES = (ThPoolProfile("thin-generic", N_("Generic")),
 config_args_data = { "filterRejects": [],    # regular expressions to reject.
                      "filterAccepts": [] }   # regexp to accept
 
+# the --config string last passed to libblockdev, for running lvm directly
+config_string = ""
+
 def _set_global_config():
     """lvm command accepts lvm.conf type arguments preceded by --config. """
 
@@ -75,6 +79,7 @@ def _set_global_config():
     # devices_string can have (inside the brackets) "dir", "scan",
     # "preferred_names", "filter", "cache_dir", "write_cache_state",
     # "types", "sysfs_scan", "md_component_detection".  see man lvm.conf.
+    global config_string # pylint: disable=global-statement
     config_string = " devices { %s } " % (devices_string) # strings can be added
     if not flags.lvm_metadata_backup:
         config_string += "backup {backup=0 archive=0} "
@@ -109,3 +114,133 @@ def lvm_cc_removeFilterRejectRegexp(regexp):
 def lvm_cc_resetFilter():
     config_args_data["filterRejects"] = []
     config_args_data["filterAccepts"] = []
+
+class LVMInfo(object):
+    """ A snapshot of the system's LVM metadata.
+
+        The PV and LV reports are each fetched with a single call, the first
+        time they are needed, and all questions about PVs, LVs and the
+        relationships between LVs are then answered from memory until the
+        snapshot is invalidated or refreshed.
+
+        libblockdev's LV report does not include the origin and pool of each
+        LV, so these are read for all LVs at once with a single run of lvs.
+    """
+
+    def __init__(self):
+        self._pvs = None
+        self._lvs = None
+
+        # (vg name, lv name) -> origin/pool lv name
+        self._origins = {}
+        self._pools = {}
+        self._relationsLoaded = False
+
+    def __deepcopy__(self, memo):
+        # the reports are never modified, only replaced, so copies share them
+        new = self.__class__()
+        new._pvs = self._pvs
+        new._lvs = self._lvs
+        new._origins = self._origins.copy()
+        new._pools = self._pools.copy()
+        new._relationsLoaded = self._relationsLoaded
+        return new
+
+    def invalidate(self):
+        """ Drop the snapshot; it will be fetched again when next used. """
+        self._pvs = None
+        self._lvs = None
+        self._origins = {}
+        self._pools = {}
+        self._relationsLoaded = False
+
+    def refresh(self):
+        """ Fetch a new snapshot right away. """
+        self.invalidate()
+        self._loadPVs()
+        self._loadLVs()
+        self._loadRelations()
+
+    def _loadPVs(self):
+        pvs = blockdev.lvm.pvs()
+        self._pvs = dict((pv.pv_name, pv) for pv in pvs)
+
+    def _loadLVs(self):
+        lvs = blockdev.lvm.lvs()
+        self._lvs = dict(("%s-%s" % (lv.vg_name, lv.lv_name), lv) for lv in lvs)
+
+    def _loadRelations(self):
+        self._relationsLoaded = True
+        argv = ["lvs", "--noheadings", "--all", "--separator", "|",
+                "-o", "vg_name,lv_name,origin,pool_lv"]
+        if config_string:
+            argv += ["--config", config_string]
+
+        try:
+            (rc, out) = util.run_program_and_capture_output(argv)
+        except OSError as e:
+            log.error("failed to list the LVs' origins and pools: %s", e)
+            return
+
+        if rc != 0:
+            log.error("failed to list the LVs' origins and pools: lvs exited "
+                      "with status %d", rc)
+            return
+
+        for line in out.splitlines():
+            fields = [f.strip().strip("[]") for f in line.split("|")]
+            if len(fields) != 4:
+                continue
+
+            (vg_name, lv_name, origin, pool) = fields
+            self._origins[(vg_name, lv_name)] = origin or None
+            self._pools[(vg_name, lv_name)] = pool or None
+
+    @property
+    def pvs(self):
+        """ Dict of PV data keyed by PV path. """
+        if self._pvs is None:
+            self._loadPVs()
+
+        return self._pvs
+
+    @property
+    def lvs(self):
+        """ Dict of LV data keyed by "vgname-lvname". """
+        if self._lvs is None:
+            self._loadLVs()
+
+        return self._lvs
+
+    def lvOrigin(self, vg_name, lv_name):
+        """ Return the name of the origin of an LV (or None).
+
+            :param str vg_name: name of the VG
+            :param str lv_name: name of the LV
+            :rtype: str or None
+        """
+        if not self._relationsLoaded:
+            self._loadRelations()
+
+        # ask about LVs the listing did not include one at a time
+        key = (vg_name, lv_name)
+        if key not in self._origins:
+            self._origins[key] = blockdev.lvm.lvorigin(vg_name, lv_name) or None
+
+        return self._origins[key]
+
+    def thinPoolName(self, vg_name, lv_name):
+        """ Return the name of the thin pool of a thin LV (or None).
+
+            :param str vg_name: name of the VG
+            :param str lv_name: name of the thin LV
+            :rtype: str or None
+        """
+        if not self._relationsLoaded:
+            self._loadRelations()
+
+        key = (vg_name, lv_name)
+        if key not in self._pools:
+            self._pools[key] = blockdev.lvm.thlvpoolname(vg_name, lv_name) or None
+
+        return self._pools[key]
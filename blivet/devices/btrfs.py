@@ -225,6 +225,7 @@ class BTRFSVolumeDevice(BTRFSDevice, ContainerDevice, RaidDevice):
             except ValueError as e:
                 raise errors.BTRFSValueError(e)
 
+        self.recordState()
         if data:
             self._dataLevel = level
         else:
@@ -275,7 +276,12 @@ class BTRFSVolumeDevice(BTRFSDevice, ContainerDevice, RaidDevice):
         return super(BTRFSVolumeDevice, self).formatImmutable or self.exists
 
     def _setName(self, value):
+        if value == self._name:
+            return
+
+        self.recordState()
         self._name = value  # name is not used outside of blivet
+        self._notifyWatchers("name")
 
     def _setFormat(self, fmt):
         """ Set the Device's format. """
@@ -308,6 +314,7 @@ class BTRFSVolumeDevice(BTRFSDevice, ContainerDevice, RaidDevice):
         if vol.name in [v.name for v in self.subvolumes]:
             raise errors.BTRFSValueError("subvolume %s already exists" % vol.name)
 
+        self.recordState()
         self.subvolumes.append(vol)
 
     def _removeSubVolume(self, name):
@@ -315,6 +322,7 @@ class BTRFSVolumeDevice(BTRFSDevice, ContainerDevice, RaidDevice):
             raise errors.BTRFSValueError("cannot remove non-existent subvolume %s" % name)
 
         names = [v.name for v in self.subvolumes]
+        self.recordState()
         self.subvolumes.pop(names.index(name))
 
     def listSubVolumes(self, snapshotsOnly=False):
@@ -660,6 +668,6 @@ class BTRFSSnapShotDevice(BTRFSSubVolumeDevice):
         finally:
             self.volume._undo_temp_mount()
 
-    def dependsOn(self, dep):
+    def _implicitlyDependsOn(self, dep):
         return (dep == self.source or
-                super(BTRFSSnapShotDevice, self).dependsOn(dep))
+                super(BTRFSSnapShotDevice, self)._implicitlyDependsOn(dep))
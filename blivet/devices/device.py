@@ -21,6 +21,7 @@
 #
 
 import pprint
+import six
 
 from .. import util
 from ..storage_log import log_method_call
@@ -67,6 +68,13 @@ class Device(util.ObjectID):
     _type = "device"
     _packages = []
 
+    # functions to call when one of the attributes that identify this device
+    # changes; see addWatcher
+    _watchers = util.WatcherList()
+
+    # the undo journal of the device tree this device is in; see recordState
+    _journal = None
+
     def __init__(self, name, parents=None):
         """
             :param name: the device name (generally a device node's basename)
@@ -125,6 +133,7 @@ class Device(util.ObjectID):
 
             See :attr:`~.ParentList.appendfunc`.
         """
+        self.recordState()
         parent.addChild()
 
     def _removeParent(self, parent):
@@ -132,14 +141,23 @@ class Device(util.ObjectID):
 
             See :attr:`~.ParentList.removefunc`.
         """
+        self.recordState()
         parent.removeChild()
 
+    def _parentsChanged(self):
+        """ Called after any change to this device's parent list.
+
+            See :attr:`~.ParentList.changefunc`.
+        """
+        self._notifyWatchers("parents")
+
     def _initParentList(self):
         """ Initialize this instance's parent list. """
         if not hasattr(self, "_parents"):
             # pylint: disable=attribute-defined-outside-init
             self._parents = ParentList(appendfunc=self._addParent,
-                                       removefunc=self._removeParent)
+                                       removefunc=self._removeParent,
+                                       changefunc=self._parentsChanged)
 
         # iterate over a copy of the parent list because we are altering it in
         # the for-cycle
@@ -164,14 +182,64 @@ class Device(util.ObjectID):
               "parents": [p.name for p in self.parents]}
         return d
 
+    def addWatcher(self, func):
+        """ Register a function to call when this device's identity changes.
+
+            :param func: the function to call
+            :type func: callable taking the device and the attribute name
+
+            The function is called after a change to any of the attributes
+            used to look devices up, eg: name, uuid, sysfs path or format, and
+            after any change to the parent list.
+            Watchers are not carried over to copies of this device.
+        """
+        if "_watchers" not in self.__dict__:
+            self._watchers = util.WatcherList() # pylint: disable=attribute-defined-outside-init
+
+        if func not in self._watchers:
+            self._watchers.append(func)
+
+    def removeWatcher(self, func):
+        """ Unregister a function added via :meth:`addWatcher`. """
+        if func in self._watchers:
+            self._watchers.remove(func)
+
+    def _notifyWatchers(self, attr):
+        """ Tell this device's watchers that the named attribute changed. """
+        self._watchers.notify(self, attr)
+
+    def _getJournal(self):
+        return self._journal
+
+    def _setJournal(self, journal):
+        # pylint: disable=attribute-defined-outside-init
+        self._journal = journal
+        self._parents.journal = journal
+
+    journal = property(lambda s: s._getJournal(),
+                       lambda s, j: s._setJournal(j),
+                       doc="the undo journal changes to this device go to")
+
+    def recordState(self):
+        """ Save this device's state in its undo journal, if it has one.
+
+            The device's own methods do this before changing it. Code that
+            sets one of its plain attributes, eg: req_size, has to do it
+            itself. See :meth:`~.devicetree.DeviceTree.checkpoint`.
+        """
+        if self._journal is not None:
+            self._journal.record(self)
+
     def removeChild(self):
         """ Decrement the child counter for this device. """
         log_method_call(self, name=self.name, kids=self.kids)
+        self.recordState()
         self.kids -= 1
 
     def addChild(self):
         """ Increment the child counter for this device. """
         log_method_call(self, name=self.name, kids=self.kids)
+        self.recordState()
         self.kids += 1
 
     def setup(self, orig=False):
@@ -222,15 +290,50 @@ class Device(util.ObjectID):
             :rtype: bool
         """
         # XXX does a device depend on itself?
-        if dep in self.parents:
+        (ancestors, implicit) = self._getAncestry()
+        if dep is not self and dep in ancestors:
             return True
 
-        for parent in self.parents:
-            if parent.dependsOn(dep):
-                return True
+        return any(a._implicitlyDependsOn(dep) for a in implicit)
+
+    def _implicitlyDependsOn(self, dep):
+        """ Return True if this device depends on dep other than via parents.
+
+            :param dep: the other device
+            :type dep: :class:`Device`
+            :rtype: bool
 
+            Classes overriding this get checked for every device built on top
+            of their instances, eg: a snapshot depends on its origin, so
+            anything on the snapshot depends on the origin too.
+        """
+        # pylint: disable=unused-argument
         return False
 
+    def _getAncestry(self):
+        """ Return the set of this device's ancestors (including itself) and
+            the ones that implement :meth:`_implicitlyDependsOn`.
+
+            The result is cached until any device's parent list changes.
+        """
+        cache = getattr(self, "_ancestry", None)
+        if cache is not None and cache[0] == ParentList.generation:
+            return cache[1]
+
+        ancestors = set([self])
+        for parent in self.parents:
+            if parent not in ancestors:
+                ancestors.update(parent._getAncestry()[0])
+
+        default = six.get_unbound_function(Device._implicitlyDependsOn)
+        implicit = tuple(a for a in ancestors
+                         if six.get_method_function(a._implicitlyDependsOn)
+                         is not default)
+        ancestry = (frozenset(ancestors), implicit)
+        # pylint: disable=attribute-defined-outside-init
+        self._ancestry = (ParentList.generation, ancestry)
+        return ancestry
+
     def dracutSetupArgs(self):
         return set()
 
@@ -245,7 +348,12 @@ class Device(util.ObjectID):
     def _setName(self, value):
         if not self.isNameValid(value):
             raise ValueError("%s is not a valid name for this device" % value)
+
+        old_name = self._name
+        self.recordState()
         self._name = value
+        if value != old_name:
+            self._notifyWatchers("name")
 
     name = property(lambda s: s._getName(),
                     lambda s, v: s._setName(v),
@@ -269,10 +377,7 @@ class Device(util.ObjectID):
     @property
     def ancestors(self):
         """ A list of all of this device's ancestors, including itself. """
-        l = set([self])
-        for p in [d for d in self.parents if d not in l]:
-            l.update(set(p.ancestors))
-        return list(l)
+        return list(self._getAncestry()[0])
 
     @property
     def packages(self):
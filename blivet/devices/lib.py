@@ -107,7 +107,19 @@ class ParentList(object):
             x in ml
             x = ml[i]   # not ml[i] = x
     """
-    def __init__(self, items=None, appendfunc=None, removefunc=None):
+
+    generation = 0
+    """ incremented on every change to any instance; used to invalidate
+        cached ancestry information in :class:`~.Device`
+    """
+
+    journal = None
+    """ the undo journal to save the list's contents in before changing them;
+        set along with the owning :class:`~.Device`'s journal
+    """
+
+    def __init__(self, items=None, appendfunc=None, removefunc=None,
+                 changefunc=None):
         """
             :keyword items: initial contents
             :type items: any iterable
@@ -115,6 +127,8 @@ class ParentList(object):
             :type appendfunc: callable
             :keyword removefunc: a function to call before removing an item
             :type removefunc: callable
+            :keyword changefunc: a function to call after the list has changed
+            :type changefunc: callable taking no arguments
 
             appendfunc and removefunc should take the item to be added or
             removed and perform any checks or other processing. The appropriate
@@ -124,6 +138,9 @@ class ParentList(object):
             to the function. While this is not optimal for general-purpose use,
             it is ideal for the intended use as part of :class:`~.Device`. The
             functions themselves should not modify the :class:`~.ParentList`.
+
+            changefunc is called after every change to the list, including
+            :meth:`replace`. It is meant for bookkeeping, not for checks.
         """
         self.items = list()
         if items:
@@ -135,6 +152,9 @@ class ParentList(object):
         self.removefunc = removefunc or (lambda i: True)
         """ a function to call before removing an item """
 
+        self.changefunc = changefunc or (lambda: True)
+        """ a function to call after the list has changed """
+
     def __iter__(self):
         return iter(self.items)
 
@@ -147,13 +167,20 @@ class ParentList(object):
     def __len__(self):
         return len(self.items)
 
+    def _recordState(self):
+        if self.journal is not None:
+            self.journal.record(self)
+
     def append(self, y):
         """ Add an item to the list after running a callback. """
         if y in self.items:
             raise ValueError("item is already in the list")
 
         self.appendfunc(y)
+        self._recordState()
         self.items.append(y)
+        ParentList.generation += 1
+        self.changefunc()
 
     def remove(self, y):
         """ Remove an item from the list after running a callback. """
@@ -161,7 +188,10 @@ class ParentList(object):
             raise ValueError("item is not in the list")
 
         self.removefunc(y)
+        self._recordState()
         self.items.remove(y)
+        ParentList.generation += 1
+        self.changefunc()
 
     def replace(self, x, y):
         """ Replace the first instance of x with y, bypassing callbacks.
@@ -176,4 +206,7 @@ class ParentList(object):
             raise ValueError("item to be replaced is not in the list")
 
         idx = self.items.index(x)
+        self._recordState()
         self.items[idx] = y
+        ParentList.generation += 1
+        self.changefunc()
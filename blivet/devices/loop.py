@@ -61,7 +61,12 @@ class LoopDevice(StorageDevice):
                                exists=True, parents=parents)
 
     def _setName(self, value):
+        if value == self._name:
+            return
+
+        self.recordState()
         self._name = value  # actual name is set by losetup
+        self._notifyWatchers("name")
 
     def updateName(self):
         """ Update this device's name. """
@@ -31,7 +31,7 @@ from ..devicelibs import lvm
 
 from .. import errors
 from .. import util
-from ..formats import getFormat
+from ..formats import getFormat, putsOffProbes
 from ..storage_log import log_method_call
 from .. import udev
 from ..size import Size, KiB, MiB, ROUND_UP, ROUND_DOWN
@@ -117,6 +117,7 @@ class LVMVolumeGroupDevice(ContainerDevice):
         # >0 is fixed
         self.size_policy = self.size
 
+    @putsOffProbes
     def __repr__(self):
         s = super(LVMVolumeGroupDevice, self).__repr__()
         s += ("  free = %(free)s  PE Size = %(peSize)s  PE Count = %(peCount)s\n"
@@ -138,6 +139,7 @@ class LVMVolumeGroupDevice(ContainerDevice):
         return s
 
     @property
+    @putsOffProbes
     def dict(self):
         d = super(LVMVolumeGroupDevice, self).dict
         d.update({"free": self.free, "peSize": self.peSize,
@@ -264,11 +266,13 @@ class LVMVolumeGroupDevice(ContainerDevice):
             raise errors.DeviceError("new lv is too large to fit in free space", self.name)
 
         log.debug("Adding %s/%s to %s", lv.name, lv.size, self.name)
+        self.recordState()
         self._lvs.append(lv)
 
         # snapshot accounting
         origin = getattr(lv, "origin", None)
         if origin:
+            origin.recordState()
             origin.snapshots.append(lv)
 
     def _removeLogVol(self, lv):
@@ -276,11 +280,13 @@ class LVMVolumeGroupDevice(ContainerDevice):
         if lv not in self.lvs:
             raise ValueError("specified lv is not part of this vg")
 
+        self.recordState()
         self._lvs.remove(lv)
 
         # snapshot accounting
         origin = getattr(lv, "origin", None)
         if origin:
+            origin.recordState()
             origin.snapshots.remove(lv)
 
     def _addParent(self, member):
@@ -522,6 +528,7 @@ class LVMLogicalVolumeDevice(DMDevice):
         # here we go with the circular references
         self.parents[0]._addLogVol(self)
 
+    @putsOffProbes
     def __repr__(self):
         s = DMDevice.__repr__(self)
         s += ("  VG device = %(vgdev)r\n"
@@ -534,6 +541,7 @@ class LVMLogicalVolumeDevice(DMDevice):
         return s
 
     @property
+    @putsOffProbes
     def dict(self):
         d = super(LVMLogicalVolumeDevice, self).dict
         if self.exists:
@@ -555,6 +563,7 @@ class LVMLogicalVolumeDevice(DMDevice):
         size = self.vg.align(size)
         log.debug("trying to set lv %s size to %s", self.name, size)
         if size <= self.vg.freeSpace + self.vgSpaceUsed:
+            self.recordState()
             self._size = size
             self.targetSize = size
         else:
@@ -961,10 +970,10 @@ class LVMSnapShotDevice(LVMSnapShotBase, LVMLogicalVolumeDevice):
     def _getPartedDevicePath(self):
         return "%s-cow" % self.path
 
-    def dependsOn(self, dep):
+    def _implicitlyDependsOn(self, dep):
         # pylint: disable=bad-super-call
         return (self.origin == dep or
-                super(LVMSnapShotBase, self).dependsOn(dep))
+                super(LVMSnapShotBase, self)._implicitlyDependsOn(dep))
 
 class LVMThinPoolDevice(LVMLogicalVolumeDevice):
     """ An LVM Thin Pool """
@@ -1038,6 +1047,7 @@ class LVMThinPoolDevice(LVMLogicalVolumeDevice):
         # TODO: add some checking to prevent overcommit for preexisting
         self.vg._addLogVol(lv)
         log.debug("Adding %s/%s to %s", lv.name, lv.size, self.name)
+        self.recordState()
         self._lvs.append(lv)
 
     def _removeLogVol(self, lv):
@@ -1045,6 +1055,7 @@ class LVMThinPoolDevice(LVMLogicalVolumeDevice):
         if lv not in self._lvs:
             raise ValueError("specified lv is not part of this vg")
 
+        self.recordState()
         self._lvs.remove(lv)
         self.vg._removeLogVol(lv)
 
@@ -1130,6 +1141,7 @@ class LVMThinLogicalVolumeDevice(LVMLogicalVolumeDevice):
 
         size = self.vg.align(size)
         size = self.vg.align(util.numeric_type(size))
+        self.recordState()
         self._size = size
         self.targetSize = size
 
@@ -1229,7 +1241,7 @@ class LVMThinSnapShotDevice(LVMSnapShotBase, LVMThinLogicalVolumeDevice):
         blockdev.lvm.thsnapshotcreate(self.vg.name, self._name, self.origin.lvname,
                                       pool_name=pool_name)
 
-    def dependsOn(self, dep):
+    def _implicitlyDependsOn(self, dep):
         # once a thin snapshot exists it no longer depends on its origin
         return ((self.origin == dep and not self.exists) or
-                super(LVMThinSnapShotDevice, self).dependsOn(dep))
+                super(LVMThinSnapShotDevice, self)._implicitlyDependsOn(dep))
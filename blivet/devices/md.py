@@ -167,6 +167,7 @@ class MDRaidArrayDevice(ContainerDevice, RaidDevice):
         except ValueError as e:
             raise errors.DeviceError(e)
 
+        self.recordState()
         self._level = level
 
     @property
@@ -276,6 +277,7 @@ class MDRaidArrayDevice(ContainerDevice, RaidDevice):
 
         if not self.exists and number > self.totalDevices:
             raise ValueError("memberDevices cannot be greater than totalDevices")
+        self.recordState()
         self._memberDevices = number
 
     memberDevices = property(_getMemberDevices, _setMemberDevices,
@@ -36,7 +36,6 @@ from ..size import Size, MiB
 import logging
 log = logging.getLogger("blivet")
 
-from .device import Device
 from .storage import StorageDevice
 from .dm import DMDevice
 from .lib import devicePathToName, deviceNameToDiskByPath
@@ -261,6 +260,7 @@ class PartitionDevice(StorageDevice):
             # change this partition's geometry in-memory so that other
             # partitioning operations can complete (e.g., autopart)
             super(PartitionDevice, self)._setTargetSize(newsize)
+            self.disk.format.recordState()
             disk = self.disk.format.partedDisk
 
             # resize the partition's geometry in memory
@@ -331,6 +331,7 @@ class PartitionDevice(StorageDevice):
             raise ValueError("partition must be None or a parted.Partition instance")
 
         log.debug("device %s new partedPartition %s", self.name, partition)
+        self.recordState()
         self._partedPartition = partition
         self.updateName()
 
@@ -366,13 +367,19 @@ class PartitionDevice(StorageDevice):
         return self.req_base_weight
 
     def _setWeight(self, weight):
+        self.recordState()
         self.req_base_weight = weight
 
     weight = property(lambda d: d._getWeight(),
                       lambda d,w: d._setWeight(w))
 
     def _setName(self, value):
+        if value == self._name:
+            return
+
+        self.recordState()
         self._name = value  # actual name setting is done by parted
+        self._notifyWatchers("name")
 
     def updateName(self):
         if self.partedPartition is None:
@@ -380,13 +387,10 @@ class PartitionDevice(StorageDevice):
         else:
             self.name = devicePathToName(self.partedPartition.path)
 
-    def dependsOn(self, dep):
-        """ Return True if this device depends on dep. """
-        if isinstance(dep, PartitionDevice) and dep.isExtended and \
-           self.isLogical and self.disk == dep.disk:
-            return True
-
-        return Device.dependsOn(self, dep)
+    def _implicitlyDependsOn(self, dep):
+        """ Logical partitions depend on the extended partition. """
+        return (isinstance(dep, PartitionDevice) and dep.isExtended and
+                self.isLogical and self.disk == dep.disk)
 
     @property
     def isleaf(self):
@@ -413,6 +417,7 @@ class PartitionDevice(StorageDevice):
 
     def _setBootable(self, bootable):
         """ Set the bootable flag for this partition. """
+        self.recordState()
         if self.partedPartition:
             if arch.isS390():
                 return
@@ -451,6 +456,7 @@ class PartitionDevice(StorageDevice):
         if not self.partedPartition or not self.flagAvailable(flag):
             return
 
+        self.disk.format.recordState()
         self.partedPartition.setFlag(flag)
 
     def unsetFlag(self, flag):
@@ -458,6 +464,7 @@ class PartitionDevice(StorageDevice):
         if not self.partedPartition or not self.flagAvailable(flag):
             return
 
+        self.disk.format.recordState()
         self.partedPartition.unsetFlag(flag)
 
     @property
@@ -716,6 +723,7 @@ class PartitionDevice(StorageDevice):
 
         if not self.exists:
             # device does not exist (a partition request), just set basic value
+            self.recordState()
             self._size = newsize
             self.req_size = newsize
             self.req_base_size = newsize
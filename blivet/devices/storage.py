@@ -29,7 +29,7 @@ from .. import util
 from ..flags import flags
 from ..storage_log import log_method_call
 from .. import udev
-from ..formats import getFormat
+from ..formats import getFormat, putsOffProbes
 from ..size import Size
 
 import logging
@@ -131,6 +131,15 @@ class StorageDevice(Device):
         if self.exists and self.status:
             self.updateSize()
 
+    def __deepcopy__(self, memo):
+        new = super(StorageDevice, self).__deepcopy__(memo)
+
+        # watchers are not copied, so the copy has to watch its own format
+        if new._format is not None:
+            new._format.addWatcher(new._formatChanged)
+
+        return new
+
     def __str__(self):
         exist = "existing"
         if not self.exists:
@@ -169,6 +178,30 @@ class StorageDevice(Device):
         """ The device itself, or when encrypted, the backing device. """
         return self
 
+    def _getUUID(self):
+        return self._uuid
+
+    def _setUUID(self, uuid):
+        self.recordState()
+        self._uuid = uuid
+        self._notifyWatchers("uuid")
+
+    uuid = property(lambda s: s._getUUID(),
+                    lambda s, u: s._setUUID(u),
+                    doc="universally unique identifier (device -- not fs)")
+
+    def _getSysfsPath(self):
+        return self._sysfsPath
+
+    def _setSysfsPath(self, path):
+        self.recordState()
+        self._sysfsPath = path
+        self._notifyWatchers("sysfsPath")
+
+    sysfsPath = property(lambda s: s._getSysfsPath(),
+                         lambda s, p: s._setSysfsPath(p),
+                         doc="sysfs device path")
+
     def _setName(self, value):
         """Set the device's name.
 
@@ -216,12 +249,14 @@ class StorageDevice(Device):
         if self.alignTargetSize(newsize) != newsize:
             raise ValueError("new size would violate alignment requirements")
 
+        self.recordState()
         self._targetSize = newsize
 
     targetSize = property(lambda s: s._getTargetSize(),
                           lambda s, v: s._setTargetSize(v),
                           doc="Target size of this device")
 
+    @putsOffProbes
     def __repr__(self):
         s = Device.__repr__(self)
         s += ("  uuid = %(uuid)s  size = %(size)s\n"
@@ -240,6 +275,7 @@ class StorageDevice(Device):
         return s
 
     @property
+    @putsOffProbes
     def dict(self):
         d =  super(StorageDevice, self).dict
         d.update({"uuid": self.uuid, "size": self.size,
@@ -335,6 +371,7 @@ class StorageDevice(Device):
 
     @readonly.setter
     def readonly(self, value):
+        self.recordState()
         self._readonly = value
 
     @property
@@ -343,6 +380,7 @@ class StorageDevice(Device):
 
     @protected.setter
     def protected(self, value):
+        self.recordState()
         self._protected = value
 
     #
@@ -526,6 +564,7 @@ class StorageDevice(Device):
             raise errors.DeviceError("device cannot be smaller than %s" %
                                      min_size, self.name)
 
+        self.recordState()
         self._size = newsize
 
     size = property(lambda x: x._getSize(),
@@ -600,9 +639,25 @@ class StorageDevice(Device):
             # FIXME: self.format.status doesn't mean much
             raise errors.DeviceError("cannot replace active format", self.name)
 
+        if self._format is not None:
+            self._format.removeWatcher(self._formatChanged)
+
+        self.recordState()
         self._format = fmt
+        self._format.journal = self._journal
         self._format.device = self.path
+        self._format.addWatcher(self._formatChanged)
         self._updateNetDevMountOption()
+        self._notifyWatchers("format")
+
+    def _setJournal(self, journal):
+        super(StorageDevice, self)._setJournal(journal)
+        if self._format is not None:
+            self._format.journal = journal
+
+    def _formatChanged(self, fmt, attr): # pylint: disable=unused-argument
+        """ Pass changes to our format's uuid or label on to our watchers. """
+        self._notifyWatchers("format")
 
     def _updateNetDevMountOption(self):
         """ Fix mount options to include or exclude _netdev as appropriate. """
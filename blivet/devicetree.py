@@ -22,6 +22,7 @@
 
 import os
 import re
+from threading import RLock
 
 from gi.repository import BlockDev as blockdev
 
@@ -30,6 +31,7 @@ from .errors import DeviceError, DeviceTreeError, StorageError
 from .deviceaction import ActionDestroyDevice, ActionDestroyFormat
 from .devices import BTRFSDevice, DASDDevice, NoDevice, PartitionDevice
 from .devices import LVMLogicalVolumeDevice, LVMVolumeGroupDevice
+from .devices.lib import ParentList
 from . import formats
 from .devicelibs import lvm
 from .devicelibs import edd
@@ -44,6 +46,12 @@ log = logging.getLogger("blivet")
 
 _LVM_DEVICE_CLASSES = (LVMLogicalVolumeDevice, LVMVolumeGroupDevice)
 
+# device attributes the lookup indexes are keyed on
+_INDEXED_ATTRS = ("id", "name", "path", "sysfsPath", "uuid", "label")
+
+# attributes saved in undo journals; the lookup indexes are rebuilt instead
+_JOURNALED_ATTRS = ("_devices", "_hidden", "names")
+
 class DeviceTree(object):
     """ A quasi-tree that represents the devices in the system.
 
@@ -64,6 +72,14 @@ class DeviceTree(object):
         for leaf devices, except for resize actions.
     """
 
+    # source of values for the generation attribute, shared by all instances
+    # so that a tree never goes back to a generation it has already had
+    _nextGeneration = 0
+
+    # serializes index updates made by watchers, which may be called from
+    # the threads executing actions (see flags.action_threads)
+    _indexLock = RLock()
+
     def __init__(self, conf=None, passphrase=None, luksDict=None,
                  iscsi=None, dasd=None):
         """
@@ -88,13 +104,37 @@ class DeviceTree(object):
         self._devices = []
         self._actions = ActionList()
 
+        # changes to the tree and the devices in it are saved here while
+        # there is a checkpoint; see checkpoint
+        self._journal = util.UndoJournal()
+        self._actions.journal = self._journal
+
         # a list of all device names we encounter
         self.names = []
 
         self._hidden = []
 
-        # initialize attributes that may later hold cached lvm info
-        self.dropLVMCache()
+        # lookup indexes for the getDeviceBy* methods, keyed by attribute
+        # and then by value; see _indexDevice
+        self._index = dict((attr, {}) for attr in _INDEXED_ATTRS)
+        self._indexed = {}
+        self._indexSeq = 0
+
+        # parent id -> children, for all devices in the tree (including the
+        # hidden ones); see _indexDevice
+        self._children = {}
+        self._parentIds = {}
+
+        # changes whenever devices are added, removed, hidden or unhidden or
+        # the identity or parents of a device in the tree change
+        self.generation = None
+        self._devicesCache = (None, [])
+        self._uuidsCache = (None, {})
+        self._labelsCache = (None, {})
+        self._bumpGeneration()
+
+        # snapshot of the lvm metadata, fetched when first needed
+        self.lvmInfo = lvm.LVMInfo()
 
         lvm.lvm_cc_resetFilter()
 
@@ -105,6 +145,15 @@ class DeviceTree(object):
                                     iscsi=iscsi,
                                     dasd=dasd)
 
+    def __deepcopy__(self, memo):
+        new = util.variable_copy(self, memo)
+
+        # watchers are not copied, so the copy has to watch its own devices
+        for (device, _position, _keys) in new._indexed.values():
+            device.addWatcher(new._deviceChanged)
+
+        return new
+
     @property
     def actions(self):
         return self._actions
@@ -149,24 +198,15 @@ class DeviceTree(object):
 
     @property
     def pvInfo(self):
-        if self._pvs_cache is None:
-            pvs = blockdev.lvm.pvs()
-            self._pvs_cache = dict((pv.pv_name, pv) for pv in pvs) # pylint: disable=attribute-defined-outside-init
-
-        return self._pvs_cache
+        return self.lvmInfo.pvs
 
     @property
     def lvInfo(self):
-        if self._lvs_cache is None:
-            lvs = blockdev.lvm.lvs()
-            self._lvs_cache = dict(("%s-%s" % (lv.vg_name, lv.lv_name), lv) for lv in lvs) # pylint: disable=attribute-defined-outside-init
-
-        return self._lvs_cache
+        return self.lvmInfo.lvs
 
     def dropLVMCache(self):
         """ Drop cached lvm information. """
-        self._pvs_cache = None # pylint: disable=attribute-defined-outside-init
-        self._lvs_cache = None # pylint: disable=attribute-defined-outside-init
+        self.lvmInfo.invalidate()
 
     def _addDevice(self, newdev, new=True):
         """ Add a device to the tree.
@@ -177,17 +217,20 @@ class DeviceTree(object):
             Raise ValueError if the device's identifier is already
             in the list.
         """
-        if newdev.uuid and newdev.uuid in [d.uuid for d in self._devices] and \
-           not isinstance(newdev, NoDevice):
+        if newdev.uuid and not isinstance(newdev, NoDevice) and \
+           any(d.uuid == newdev.uuid
+               for d in self._indexLookup("uuid", [newdev.uuid])):
             raise ValueError("device is already in tree")
 
         # make sure this device's parent devices are in the tree already
         for parent in newdev.parents:
-            if parent not in self._devices:
+            if not self._isIndexed(parent):
                 raise DeviceTreeError("parent device not in tree")
 
         newdev.addHook(new=new)
+        self._journal.record(self, _JOURNALED_ATTRS)
         self._devices.append(newdev)
+        self._indexDevice(newdev)
 
         # don't include "req%d" partition names
         if ((newdev.type != "partition" or
@@ -213,7 +256,7 @@ class DeviceTree(object):
 
                 Only leaves may be removed.
         """
-        if dev not in self._devices:
+        if not self._isIndexed(dev):
             raise ValueError("Device '%s' not in tree" % dev.name)
 
         if not dev.isleaf and not force:
@@ -232,7 +275,9 @@ class DeviceTree(object):
                        device.disk == dev.disk:
                         device.updateName()
 
+        self._journal.record(self, _JOURNALED_ATTRS)
         self._devices.remove(dev)
+        self._unindexDevice(dev)
         if dev.name in self.names and getattr(dev, "complete", True):
             self.names.remove(dev.name)
         log.info("removed %s %s (id %d) from device tree", dev.type,
@@ -339,6 +384,7 @@ class DeviceTree(object):
             # add the device back into the tree
             self._addDevice(action.device, new=False)
 
+        self._journal.record(action)
         action.cancel()
         self._actions.remove(action)
         log.info("canceled action %s", action)
@@ -393,17 +439,36 @@ class DeviceTree(object):
             log.debug("dep is a leaf")
             return dependents
 
-        devices = self._devices[:]
-        if hidden:
-            devices.extend(self._hidden)
+        # Some devices depend on a sibling rather than on a parent, eg:
+        # snapshots on their origin or logical partitions on the extended
+        # partition, so check everything built on dep's parents.
+        devices = set()
+        for root in dep.parents or [dep]:
+            devices.update(self._descendants(root, hidden=hidden))
 
-        for device in devices:
+        for device in self._treeOrder(devices):
             log.debug("checking if %s depends on %s", device.name, dep.name)
             if device.dependsOn(dep):
                 dependents.append(device)
 
         return dependents
 
+    def descendants(self, device, hidden=False):
+        """ Return all devices built on top of a device.
+
+            :param device: the device whose descendants we are looking for
+            :type device: :class:`~.devices.StorageDevice`
+            :keyword bool hidden: include hidden devices
+            :returns: the device's children, their children and so on, in
+                      device list order
+            :rtype: list of :class:`~.devices.StorageDevice`
+
+            Unlike :meth:`getDependentDevices`, this only follows parent
+            relationships, so the cost depends only on the size of the
+            subtree.
+        """
+        return self._treeOrder(self._descendants(device, hidden=hidden))
+
     def getRelatedDisks(self, disk):
         """ Return disks related to disk by container membership.
 
@@ -484,7 +549,9 @@ class DeviceTree(object):
 
         self._removeDevice(device, force=True, modparent=False)
 
+        self._journal.record(self, _JOURNALED_ATTRS)
         self._hidden.append(device)
+        self._indexDevice(device, hidden=True)
         lvm.lvm_cc_addFilterRejectRegexp(device.name)
 
         if isinstance(device, DASDDevice):
@@ -514,8 +581,10 @@ class DeviceTree(object):
                 log.info("unhiding device %s %s (id %d)", hidden.type,
                                                           hidden.name,
                                                           hidden.id)
+                self._journal.record(self, _JOURNALED_ATTRS)
                 self._hidden.remove(hidden)
                 self._devices.append(hidden)
+                self._indexDevice(hidden)
                 hidden.addHook(new=False)
                 lvm.lvm_cc_removeFilterRejectRegexp(hidden.name)
                 if isinstance(device, DASDDevice):
@@ -599,6 +668,255 @@ class DeviceTree(object):
             except DeviceError as e:
                 log.error("setup of %s failed: %s", device.name, e)
 
+    #
+    # checkpoints
+    #
+    def checkpoint(self):
+        """ Start recording changes so they can be reverted.
+
+            :returns: the checkpoint
+
+            Every checkpoint must be passed to either :meth:`revertCheckpoint`
+            or :meth:`releaseCheckpoint`, the most recent one first.
+
+            The changes are recorded in this tree's :class:`~.util.UndoJournal`,
+            which the devices in the tree, their formats and the action list
+            refer to. Only changes to these are recorded; other trees,
+            including copies of this one, are not affected.
+        """
+        return self._journal.start()
+
+    def releaseCheckpoint(self, checkpoint):
+        """ Keep the changes made since a checkpoint.
+
+            :param checkpoint: the checkpoint
+        """
+        self._journal.close(checkpoint)
+
+    def revertCheckpoint(self, checkpoint):
+        """ Revert the devices and actions to their state at a checkpoint.
+
+            :param checkpoint: the checkpoint
+        """
+        self._journal.undo(checkpoint)
+
+        # parent lists were restored behind the devices' backs
+        ParentList.generation += 1
+        self._rebuildIndexes()
+
+        # disklabels got back a copy of their parted.Disk, so re-get the
+        # partitions' parted.Partitions from the copies
+        parted_partitions = {}
+        for partition in self._devices + self._hidden:
+            if not isinstance(partition, PartitionDevice) or \
+               not partition._partedPartition:
+                continue
+
+            disk = partition.disk
+            parted_disk = disk.format.partedDisk
+            if partition._partedPartition.disk is parted_disk:
+                continue
+
+            if disk.id not in parted_partitions:
+                parted_partitions[disk.id] = dict((p.path, p) for p in parted_disk.partitions)
+
+            partition.partedPartition = parted_partitions[disk.id].get(partition.path)
+
+    #
+    # lookup indexes
+    #
+    def _bumpGeneration(self):
+        """ Record that the contents of the tree have changed. """
+        DeviceTree._nextGeneration += 1
+        self.generation = DeviceTree._nextGeneration
+
+    def _rebuildIndexes(self):
+        """ Rebuild the lookup indexes from the device and hidden lists.
+
+            This is for code that replaces the device list wholesale, eg: to
+            revert to a saved copy of the tree.
+        """
+        for (device, _position, _values) in list(self._indexed.values()):
+            self._unindexDevice(device)
+
+        for device in self._devices:
+            self._indexDevice(device)
+
+        for device in self._hidden:
+            self._indexDevice(device, hidden=True)
+
+    def _indexValues(self, device):
+        """ Return the indexed attribute values of a device.
+
+            :param device: the device
+            :type device: :class:`~.devices.StorageDevice`
+            :returns: dict with attribute name keys and sets of values
+            :rtype: dict
+        """
+        values = dict((attr, set()) for attr in _INDEXED_ATTRS)
+        values["id"].add(device.id)
+        for attr in ("name", "path", "sysfsPath", "uuid"):
+            value = getattr(device, attr, None)
+            if value:
+                values[attr].add(value)
+
+        fmt_uuid = getattr(device.format, "uuid", None)
+        if fmt_uuid:
+            values["uuid"].add(fmt_uuid)
+
+        label = getattr(device.format, "label", None)
+        if label:
+            values["label"].add(label)
+
+        return values
+
+    def _isIndexed(self, device, hidden=False):
+        """ Return True if device is in the tree.
+
+            :param device: the device
+            :type device: :class:`~.devices.StorageDevice`
+            :keyword bool hidden: whether to also accept hidden devices
+        """
+        entry = self._indexed.get(device.id)
+        return (entry is not None and entry[0] is device and
+                (hidden or not entry[1][0]))
+
+    def _addIndexValues(self, device, values):
+        for (attr, attr_values) in values.items():
+            for value in attr_values:
+                self._index[attr].setdefault(value, []).append(device)
+
+    def _removeIndexValues(self, device, values):
+        for (attr, attr_values) in values.items():
+            for value in attr_values:
+                devices = self._index[attr][value]
+                devices.remove(device)
+                if not devices:
+                    del self._index[attr][value]
+
+    def _indexDevice(self, device, hidden=False):
+        """ Add a device to the lookup indexes.
+
+            :param device: the device
+            :type device: :class:`~.devices.StorageDevice`
+            :keyword bool hidden: whether the device was added to the hidden list
+
+            Each call places the device after all others in the same list, so
+            that lookups can report matches in the same order as a scan of
+            the device list (or the hidden list) would.
+        """
+        if device.id in self._indexed:
+            self._unindexDevice(device)
+
+        values = self._indexValues(device)
+        self._indexed[device.id] = (device, (hidden, self._indexSeq), values)
+        self._indexSeq += 1
+        self._addIndexValues(device, values)
+        self._addChildIndex(device)
+        device.addWatcher(self._deviceChanged)
+        device.journal = self._journal
+        self._bumpGeneration()
+
+    def _unindexDevice(self, device):
+        """ Remove a device from the lookup indexes. """
+        # the indexed instance may be a different copy of the same device
+        (device, _position, values) = self._indexed.pop(device.id)
+        self._removeIndexValues(device, values)
+        self._removeChildIndex(device)
+        device.removeWatcher(self._deviceChanged)
+        self._bumpGeneration()
+
+    def _addChildIndex(self, device):
+        parent_ids = [p.id for p in device.parents]
+        for parent_id in parent_ids:
+            self._children.setdefault(parent_id, []).append(device)
+
+        self._parentIds[device.id] = parent_ids
+
+    def _removeChildIndex(self, device):
+        for parent_id in self._parentIds.pop(device.id):
+            children = self._children[parent_id]
+            children.remove(device)
+            if not children:
+                del self._children[parent_id]
+
+    def _descendants(self, device, hidden=False):
+        """ Return the set of devices in the tree built on top of device. """
+        descendants = set()
+        todo = [device]
+        while todo:
+            for child in self._children.get(todo.pop().id, []):
+                if child not in descendants and \
+                   self._isIndexed(child, hidden=hidden):
+                    descendants.add(child)
+                    todo.append(child)
+
+        return descendants
+
+    def _treeOrder(self, devices):
+        """ Return devices in the tree sorted in device list order.
+
+            Hidden devices are placed after all others.
+        """
+        return sorted(devices, key=lambda d: self._indexed[d.id][1])
+
+    def _reindexDevice(self, device):
+        """ Update the lookup indexes to reflect a device's current state. """
+        (_device, position, values) = self._indexed[device.id]
+        self._removeIndexValues(device, values)
+        values = self._indexValues(device)
+        self._indexed[device.id] = (device, position, values)
+        self._addIndexValues(device, values)
+
+    def _deviceChanged(self, device, attr):
+        """ Watcher for changes to the identity of devices in the tree.
+
+            See :meth:`~.devices.Device.addWatcher`.
+        """
+        with self._indexLock:
+            if not self._isIndexed(device, hidden=True):
+                return
+
+            self._bumpGeneration()
+            if attr == "parents":
+                self._removeChildIndex(device)
+                self._addChildIndex(device)
+                return
+
+            self._reindexDevice(device)
+            if attr == "name":
+                # names and paths of devices like lvs and partitions are
+                # derived from the names of their parents
+                for dependent in self._descendants(device, hidden=True):
+                    self._reindexDevice(dependent)
+
+    def _indexLookup(self, attr, values, incomplete=True, hidden=False,
+                     match=None):
+        """ Return devices whose indexed attribute has one of the given values.
+
+            :param str attr: the name of the indexed attribute
+            :param values: the values to match
+            :type values: iterable
+            :keyword bool incomplete: include incomplete devices in result
+            :keyword bool hidden: include hidden devices in result
+            :keyword match: a function to further filter matches by value
+            :type match: callable taking the device and the matched value
+            :returns: the matching devices, in device list order
+            :rtype: list of :class:`~.devices.Device`
+
+            Hidden devices are placed after all others, as in the result of
+            :meth:`_filterDevices`.
+        """
+        found = {}
+        for value in values:
+            for device in self._index[attr].get(value, []):
+                if match is None or match(device, value):
+                    found[device.id] = device
+
+        return self._treeOrder(d for d in found.values()
+                               if self._isIndexed(d, hidden=hidden) and
+                               (incomplete or getattr(d, "complete", True)))
+
     def _filterDevices(self, incomplete=False, hidden=False):
         """ Return list of devices modified according to parameters.
 
@@ -617,6 +935,18 @@ class DeviceTree(object):
             devices = (d for d in devices if getattr(d, "complete", True))
         return devices
 
+    @staticmethod
+    def _lvmNameMatch(name):
+        """ Return an index match function for a device name or path.
+
+            lvm doubles the dashes in vg and lv names when it builds
+            device-mapper names, so lvm devices also match the given name with
+            the doubled dashes collapsed.
+        """
+        def match(device, value):
+            return value == name or isinstance(device, _LVM_DEVICE_CLASSES)
+        return match
+
     def getDeviceBySysfsPath(self, path, incomplete=False, hidden=False):
         """ Return a list of devices with a matching sysfs path.
 
@@ -629,8 +959,9 @@ class DeviceTree(object):
         log_method_call(self, path=path, incomplete=incomplete, hidden=hidden)
         result = None
         if path:
-            devices = self._filterDevices(incomplete=incomplete, hidden=hidden)
-            result = next((d for d in devices if d.sysfsPath == path), None)
+            devices = self._indexLookup("sysfsPath", [path],
+                                        incomplete=incomplete, hidden=hidden)
+            result = next(iter(devices), None)
         log_method_return(self, result)
         return result
 
@@ -646,8 +977,9 @@ class DeviceTree(object):
         log_method_call(self, uuid=uuid, incomplete=incomplete, hidden=hidden)
         result = None
         if uuid:
-            devices = self._filterDevices(incomplete=incomplete, hidden=hidden)
-            result = next((d for d in devices if d.uuid == uuid or d.format.uuid == uuid), None)
+            devices = self._indexLookup("uuid", [uuid],
+                                        incomplete=incomplete, hidden=hidden)
+            result = next(iter(devices), None)
         log_method_return(self, result)
         return result
 
@@ -684,8 +1016,9 @@ class DeviceTree(object):
         log_method_call(self, label=label, incomplete=incomplete, hidden=hidden)
         result = None
         if label:
-            devices = self._filterDevices(incomplete=incomplete, hidden=hidden)
-            result = next((d for d in devices if getattr(d.format, "label", None) == label), None)
+            devices = self._indexLookup("label", [label],
+                                        incomplete=incomplete, hidden=hidden)
+            result = next(iter(devices), None)
         log_method_return(self, result)
         return result
 
@@ -701,10 +1034,10 @@ class DeviceTree(object):
         log_method_call(self, name=name, incomplete=incomplete, hidden=hidden)
         result = None
         if name:
-            devices = self._filterDevices(incomplete=incomplete, hidden=hidden)
-            result = next((d for d in devices if d.name == name or \
-               (isinstance(d, _LVM_DEVICE_CLASSES) and d.name == name.replace("--","-"))),
-               None)
+            devices = self._indexLookup("name", [name, name.replace("--","-")],
+                                        incomplete=incomplete, hidden=hidden,
+                                        match=self._lvmNameMatch(name))
+            result = next(iter(devices), None)
         log_method_return(self, result)
         return result
 
@@ -723,14 +1056,14 @@ class DeviceTree(object):
         log_method_call(self, path=path, incomplete=incomplete, hidden=hidden)
         result = None
         if path:
-            devices = self._filterDevices(incomplete=incomplete, hidden=hidden)
+            devices = self._indexLookup("path", [path, path.replace("--","-")],
+                                        incomplete=incomplete, hidden=hidden,
+                                        match=self._lvmNameMatch(path))
 
             # The usual order of the devices list is one where leaves are at
             # the end. So that the search can prefer leaves to interior nodes
-            # the list that is searched is the reverse of the devices list.
-            result = next((d for d in reversed(list(devices)) if d.path == path or \
-               (isinstance(d, _LVM_DEVICE_CLASSES) and d.path == path.replace("--","-"))),
-               None)
+            # the last match is the one returned.
+            result = next(reversed(devices), None)
 
         log_method_return(self, result)
         return result
@@ -775,26 +1108,35 @@ class DeviceTree(object):
             :rtype: :class:`~.devices.Device`
         """
         log_method_call(self, id_num=id_num, incomplete=incomplete, hidden=hidden)
-        devices = self._filterDevices(incomplete=incomplete, hidden=hidden)
-        result = next((d for d in devices if d.id == id_num), None)
+        devices = self._indexLookup("id", [id_num],
+                                    incomplete=incomplete, hidden=hidden)
+        result = next(iter(devices), None)
         log_method_return(self, result)
         return result
 
     @property
     def devices(self):
         """ List of devices currently in the tree """
+        (generation, devices) = self._devicesCache
+        if generation == self.generation:
+            return devices[:]
+
         devices = []
+        uuids = set()
         for device in self._devices:
             if not getattr(device, "complete", True):
                 continue
 
-            if device.uuid and device.uuid in [d.uuid for d in devices] and \
-               not isinstance(device, NoDevice):
-                raise DeviceTreeError("duplicate uuids in device tree")
+            if device.uuid and not isinstance(device, NoDevice):
+                if device.uuid in uuids:
+                    raise DeviceTreeError("duplicate uuids in device tree")
+
+                uuids.add(device.uuid)
 
             devices.append(device)
 
-        return devices
+        self._devicesCache = (self.generation, devices)
+        return devices[:]
 
     @property
     def filesystems(self):
@@ -810,6 +1152,10 @@ class DeviceTree(object):
     @property
     def uuids(self):
         """ Dict with uuid keys and :class:`~.devices.Device` values. """
+        (generation, uuids) = self._uuidsCache
+        if generation == self.generation:
+            return uuids.copy()
+
         uuids = {}
         for dev in self._devices:
             try:
@@ -828,7 +1174,15 @@ class DeviceTree(object):
             if uuid:
                 uuids[uuid] = dev
 
-        return uuids
+        self._uuidsCache = (self.generation, uuids)
+        return uuids.copy()
+
+    @staticmethod
+    def _labelMatch(device, label):
+        """ Index match function for :attr:`labels`. """
+        # pylint: disable=unused-argument
+        # don't include btrfs member devices
+        return device.format.type != "btrfs" or isinstance(device, BTRFSDevice)
 
     @property
     def labels(self):
@@ -836,14 +1190,18 @@ class DeviceTree(object):
 
             FIXME: duplicate labels are a possibility
         """
+        (generation, labels) = self._labelsCache
+        if generation == self.generation:
+            return labels.copy()
+
         labels = {}
         for dev in self._devices:
-            # don't include btrfs member devices
             if getattr(dev.format, "label", None) and \
-               (dev.format.type != "btrfs" or isinstance(dev, BTRFSDevice)):
+               self._labelMatch(dev, dev.format.label):
                 labels[dev.format.label] = dev
 
-        return labels
+        self._labelsCache = (self.generation, labels)
+        return labels.copy()
 
     @property
     def leaves(self):
@@ -851,9 +1209,102 @@ class DeviceTree(object):
         leaves = [d for d in self._devices if d.isleaf]
         return leaves
 
+    def handleUdevEvent(self, info, action=None):
+        """ Update the tree to reflect a udev event.
+
+            :param info: udev data for the device the event is about
+            :type info: :class:`pyudev.Device`
+            :keyword str action: "add", "change" or "remove" (default: the
+                                 event's own action)
+
+            Only the device the event is about and the devices that depend on
+            it are scanned again.
+        """
+        self._populator.handleUdevEvent(info, action=action)
+
+    def processUdevEvents(self, monitor, timeout=0):
+        """ Update the tree from the events queued on a udev monitor.
+
+            :param monitor: the monitor (see :func:`~.udev.get_monitor`)
+            :type monitor: :class:`pyudev.Monitor`
+            :keyword timeout: how long to wait for the first event, in seconds
+                              (None to wait for as long as it takes)
+            :type timeout: float or NoneType
+            :returns: the number of events handled
+            :rtype: int
+
+            This is an alternative to :meth:`reset` and :meth:`populate` for
+            keeping an existing tree up to date.
+        """
+        count = 0
+        info = monitor.poll(timeout=timeout)
+        while info is not None:
+            self.handleUdevEvent(info)
+            count += 1
+            info = monitor.poll(timeout=0)
+
+        return count
+
+    def probeFormats(self, devices=None):
+        """ Gather the size info of existing filesystems ahead of use.
+
+            :keyword devices: the devices whose formats to probe (default: all)
+            :type devices: list of :class:`~.devices.StorageDevice`
+
+            Formats whose probe was put off (see :attr:`~.flags.Flags.lazy_probe`)
+            are probed concurrently, in up to
+            :attr:`~.flags.Flags.probe_threads` threads. Each probe only
+            updates its own format instance. Devices that are not active are
+            set up before the probes and torn down after all of them.
+        """
+        if devices is None:
+            devices = self.devices
+
+        fmts = []
+        seen = set()
+        for device in devices:
+            fmt = device.format
+            if id(fmt) in seen or not getattr(fmt, "needsProbe", False):
+                continue
+
+            seen.add(id(fmt))
+            fmts.append(fmt)
+
+        if not fmts:
+            return
+
+        # set up the devices the probes need first, and tear them down once
+        # all of the probes are done, since they may share parents
+        setup = []
+        for fmt in fmts:
+            device = fmt.probeDevice
+            if device is None or device.status:
+                continue
+
+            try:
+                device.setup()
+            except (StorageError, blockdev.BlockDevError) as e:
+                log.error("failed to set up %s to probe its filesystem: %s",
+                          device.name, e)
+            else:
+                setup.append(device)
+
+        log.info("probing %d formats using up to %d threads", len(fmts),
+                 flags.probe_threads)
+        try:
+            util.parallel_map(lambda fmt: fmt.probe(), fmts,
+                              max_workers=flags.probe_threads)
+        finally:
+            for device in setup:
+                try:
+                    device.teardown(recursive=True)
+                except (StorageError, blockdev.BlockDevError) as e:
+                    log.info("teardown of %s failed: %s", device.name, e)
+
     def getChildren(self, device):
         """ Return a list of a device's children. """
-        return [c for c in self._devices if device in c.parents]
+        return self._treeOrder(c for c in self._children.get(device.id, [])
+                               if self._isIndexed(c))
 
     def resolveDevice(self, devspec, blkidTab=None, cryptTab=None, options=None):
         """ Return the device matching the provided device specification.
@@ -881,14 +1332,19 @@ class DeviceTree(object):
             if ((uuid.startswith('"') and uuid.endswith('"')) or
                 (uuid.startswith("'") and uuid.endswith("'"))):
                 uuid = uuid[1:-1]
-            device = self.uuids.get(uuid)
+            # same as self.uuids.get(uuid), where the last device wins
+            devices = self._indexLookup("uuid", [uuid])
+            device = devices[-1] if devices else None
         elif devspec.startswith("LABEL="):
             # device-by-label
             label = devspec.partition("=")[2]
             if ((label.startswith('"') and label.endswith('"')) or
                 (label.startswith("'") and label.endswith("'"))):
                 label = label[1:-1]
-            device = self.labels.get(label)
+            # same as self.labels.get(label), where the last device wins
+            devices = self._indexLookup("label", [label],
+                                        match=self._labelMatch)
+            device = devices[-1] if devices else None
         elif re.match(r'(0x)?[A-Za-z0-9]{2}(p\d+)?$', devspec):
             # BIOS drive number
             spec = int(devspec, 16)
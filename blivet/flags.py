@@ -64,6 +64,35 @@ class Flags(object):
         # meaningful when flags.installer_mode is False)
         self.include_nodev = False
 
+        # number of threads to use for probing existing filesystems (fsck and
+        # size info) while populating the devicetree; with 1 or less each
+        # filesystem is probed as soon as it is found
+        self.probe_threads = 1
+
+        # number of threads to use for executing actions; with more than 1,
+        # actions on disjoint sets of disks run concurrently once everything
+        # they require is done
+        self.action_threads = 1
+
+        # number of threads to use for examining filesystems while looking
+        # for existing installations; each one is mounted on its own
+        # temporary directory instead of on the sysroot
+        self.discovery_threads = 1
+
+        # number of iSCSI portals to run discovery on and of iSCSI nodes to
+        # log into at once when adding targets in a batch (see
+        # iscsi.addTargets); each discovery and login runs in a process of
+        # its own
+        self.iscsi_threads = 1
+
+        # probe existing filesystems only when their size info is first used
+        # (or DeviceTree.probeFormats is called) instead of when they are found
+        self.lazy_probe = False
+
+        # log method calls and returns (at debug level) as one JSON object
+        # per line instead of as indented text; see storage_log
+        self.structured_trace = False
+
         self.boot_cmdline = {}
 
         self.update_from_boot_cmdline()
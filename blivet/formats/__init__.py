@@ -22,13 +22,17 @@
 #
 
 import os
+import functools
 import importlib
+import threading
+from contextlib import contextmanager
 from gi.repository import BlockDev as blockdev
 
 from ..util import notify_kernel
 from ..util import get_sysfs_path_by_name
 from ..util import run_program
 from ..util import ObjectID
+from ..util import WatcherList
 from ..storage_log import log_method_call
 from ..errors import DeviceFormatError, FormatCreateError, FormatDestroyError, FormatSetupError
 from ..i18n import N_
@@ -47,6 +51,34 @@ def register_device_format(fmt_class):
     log.debug("registered device format class %s as %s", fmt_class.__name__,
                                                          fmt_class._type)
 
+_probes = threading.local()
+
+@contextmanager
+def probesPutOff():
+    """ Put off probing formats in the current thread (see :meth:`~.fs.FS.probe`).
+
+        While in this context, formats report what is known about them
+        without probing them.
+    """
+    _probes.putOff = getattr(_probes, "putOff", 0) + 1
+    try:
+        yield
+    finally:
+        _probes.putOff -= 1
+
+def probesArePutOff():
+    """ Return whether probes are put off in the current thread. """
+    return getattr(_probes, "putOff", 0) > 0
+
+def putsOffProbes(func):
+    """ Decorate a method that must not probe formats, eg: __repr__. """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with probesPutOff():
+            return func(*args, **kwargs)
+
+    return wrapper
+
 default_fstypes = ("ext4", "ext3", "ext2")
 def get_default_filesystem_type():
     for fstype in default_fstypes:
@@ -160,6 +192,8 @@ class DeviceFormat(ObjectID):
     _check = False
     _hidden = False                     # hide devices with this formatting?
     _ksMountpoint = None
+    _watchers = WatcherList()           # see addWatcher
+    journal = None                      # see recordState
 
     def __init__(self, **kwargs):
         """
@@ -188,6 +222,7 @@ class DeviceFormat(ObjectID):
         self.exists = kwargs.get("exists", False)
         self.options = kwargs.get("options")
 
+    @putsOffProbes
     def __repr__(self):
         s = ("%(classname)s instance (%(id)s) object id %(object_id)d--\n"
              "  type = %(type)s  name = %(name)s  status = %(status)s\n"
@@ -214,6 +249,7 @@ class DeviceFormat(ObjectID):
         return "%s %s" % (self._existence_str, self.desc)
 
     @property
+    @putsOffProbes
     def dict(self):
         d = {"type": self.type, "name": self.name, "device": self.device,
              "uuid": self.uuid, "exists": self.exists,
@@ -221,6 +257,48 @@ class DeviceFormat(ObjectID):
              "resizable": self.resizable}
         return d
 
+    def addWatcher(self, func):
+        """ Register a function to call when this format's uuid or label changes.
+
+            :param func: the function to call
+            :type func: callable taking the format and the attribute name
+
+            Watchers are not carried over to copies of this format.
+        """
+        if "_watchers" not in self.__dict__:
+            self._watchers = WatcherList() # pylint: disable=attribute-defined-outside-init
+
+        if func not in self._watchers:
+            self._watchers.append(func)
+
+    def removeWatcher(self, func):
+        """ Unregister a function added via :meth:`addWatcher`. """
+        if func in self._watchers:
+            self._watchers.remove(func)
+
+    def _getUUID(self):
+        return self._uuid
+
+    def recordState(self):
+        """ Save this format's state in its undo journal, if it has one.
+
+            The format's own methods do this before changing it. Code that
+            sets one of its plain attributes, eg: mountpoint, has to do it
+            itself. The journal is the one of the device tree the format's
+            device is in; see :meth:`~.devicetree.DeviceTree.checkpoint`.
+        """
+        if self.journal is not None:
+            self.journal.record(self)
+
+    def _setUUID(self, uuid):
+        self.recordState()
+        self._uuid = uuid
+        self._watchers.notify(self, "uuid")
+
+    uuid = property(lambda s: s._getUUID(),
+                    lambda s, u: s._setUUID(u),
+                    doc="this format's UUID")
+
     @classmethod
     def labeling(cls):
         """Returns False by default since most formats are non-labeling."""
@@ -268,7 +346,9 @@ class DeviceFormat(ObjectID):
 
            This method is not intended to be overridden.
         """
+        self.recordState()
         self._label = label
+        self._watchers.notify(self, "label")
 
     def _getLabel(self):
         """The label for this filesystem.
@@ -281,6 +361,7 @@ class DeviceFormat(ObjectID):
         return self._label
 
     def _setOptions(self, options):
+        self.recordState()
         self._options = options
 
     def _getOptions(self):
@@ -308,6 +389,7 @@ class DeviceFormat(ObjectID):
         error_msg = self._deviceCheck(devspec)
         if error_msg:
             raise ValueError(error_msg)
+        self.recordState()
         self._device = devspec
 
     def _getDevice(self):
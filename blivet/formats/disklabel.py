@@ -44,6 +44,10 @@ class DiskLabel(DeviceFormat):
     _name = N_("partition table")
     _formattable = True                # can be formatted
 
+    # partitions are added to and removed from the parted.Disk in place, so
+    # undo journals save a duplicate of it (see util.UndoJournal)
+    _journalDuplicate = ("_partedDisk",)
+
     def __init__(self, **kwargs):
         """
             :keyword device: full path to the block device node
@@ -123,6 +127,7 @@ class DiskLabel(DeviceFormat):
     def resetPartedDisk(self):
         """ Set this instance's partedDisk to reflect the disk's contents. """
         log_method_call(self, device=self.device)
+        self.recordState()
         self._partedDisk = self._origPartedDisk
 
     def freshPartedDisk(self):
@@ -294,6 +299,7 @@ class DiskLabel(DeviceFormat):
                                          geometry=geometry)
 
         constraint = parted.Constraint(exactGeom=geometry)
+        self.recordState()
         self.partedDisk.addPartition(partition=new_partition,
                                      constraint=constraint)
 
@@ -303,6 +309,7 @@ class DiskLabel(DeviceFormat):
             :param partition: the partition to remove
             :type partition: :class:`parted.Partition`
         """
+        self.recordState()
         self.partedDisk.removePartition(partition)
 
     @property
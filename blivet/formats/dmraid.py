@@ -77,6 +77,7 @@ class DMRaidMember(DeviceFormat):
         return self._raidmem
 
     def _setRaidmem(self, raidmem):
+        self.recordState()
         self._raidmem = raidmem
 
     raidmem = property(lambda d: d._getRaidmem(),
@@ -25,10 +25,14 @@
 from decimal import Decimal
 import os
 import tempfile
+import threading
+
+from gi.repository import BlockDev as blockdev
 
 from . import fslabeling
-from ..errors import FormatCreateError, FSError, FSResizeError
+from ..errors import FormatCreateError, FSError, FSResizeError, StorageError
 from . import DeviceFormat, register_device_format
+from . import probesArePutOff, putsOffProbes
 from .. import util
 from .. import platform
 from ..flags import flags
@@ -56,6 +60,26 @@ def update_kernel_filesystems():
 
 update_kernel_filesystems()
 
+class _ProbedAttribute(object):
+    """ A filesystem attribute whose value is gathered by probing.
+
+        Reading the attribute first runs the filesystem's pending probe, if
+        there is one (see :meth:`FS.probe`). The value is kept in the
+        instance attribute of the same name prefixed with "_probed".
+    """
+    def __init__(self, name):
+        self._attr = "_probed%s" % name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        obj.probe()
+        return getattr(obj, self._attr)
+
+    def __set__(self, obj, value):
+        setattr(obj, self._attr, value)
+
 class FS(DeviceFormat):
     """ Filesystem base class. """
     _type = "Abstract Filesystem Class"  # fs type name
@@ -74,6 +98,12 @@ class FS(DeviceFormat):
     _defaultInfoOptions = []
     _existingSizeFields = []
     _resizefsUnit = None
+
+    # instance attributes that come from updateSizeInfo
+    _size = _ProbedAttribute("_size")
+    _minInstanceSize = _ProbedAttribute("_minInstanceSize")
+    _targetSize = _ProbedAttribute("_targetSize")
+
     _fsProfileSpecifier = None           # mkfs option specifying fsprofile
 
     def __init__(self, **kwargs):
@@ -88,6 +118,11 @@ class FS(DeviceFormat):
             :keyword size: the filesystem's size in MiB
             :keyword exists: indicates whether this is an existing filesystem
             :type exists: bool
+            :keyword probe: whether to gather size information for an existing
+                            filesystem right away in installer mode; if False,
+                            it is gathered on first use or by :meth:`probe`
+                            (default: True unless flags.lazy_probe is set)
+            :type probe: bool
 
             .. note::
 
@@ -101,31 +136,45 @@ class FS(DeviceFormat):
             raise TypeError("FS is an abstract class.")
 
         DeviceFormat.__init__(self, **kwargs)
+
+        # in installer mode, the size info of existing filesystems is gathered
+        # by running fsck and the info tool; see probe
+        self._probePending = bool(flags.installer_mode and self.resizefsProg and
+                                  self.exists)
+        self._probing = False
+        self._probeLock = threading.RLock()
+
+        # the device this filesystem is on, if a probe that is put off has to
+        # set it up first; see probe
+        self.probeDevice = None
+
         self.mountpoint = kwargs.get("mountpoint")
         self.mountopts = kwargs.get("mountopts")
         self.label = kwargs.get("label")
         self.fsprofile = kwargs.get("fsprofile")
 
-        # filesystem size does not necessarily equal device size
-        self._size = kwargs.get("size", Size(0))
-        self._minInstanceSize = Size(0)    # min size of this FS instance
+        # filesystem size does not necessarily equal device size; these hold
+        # the values of the _size, _minInstanceSize and _targetSize attributes
+        self._probed_size = kwargs.get("size", Size(0))
+        self._probed_minInstanceSize = Size(0)    # min size of this FS instance
+        self._probed_targetSize = self._probed_size
 
         # Resize operations are limited to error-free filesystems whose current
         # size is known.
         self._resizable = False
-        if flags.installer_mode and self.resizefsProg:
-            # if you want current/min size you have to call updateSizeInfo
-            try:
-                self.updateSizeInfo()
-            except FSError:
-                log.warning("%s filesystem on %s needs repair", self.type,
-                                                                self.device)
-
-        self._targetSize = self._size
+        if kwargs.get("probe", not flags.lazy_probe):
+            self.probe()
 
         if self.supported:
             self.loadModule()
 
+    def __deepcopy__(self, memo):
+        """ Create a deep copy of a filesystem; the copy gets its own lock. """
+        new = util.variable_copy(self, memo, omit=('_probeLock',))
+        new._probeLock = threading.RLock()
+        return new
+
+    @putsOffProbes
     def __repr__(self):
         s = DeviceFormat.__repr__(self)
         s += ("  mountpoint = %(mountpoint)s  mountopts = %(mountopts)s\n"
@@ -144,6 +193,7 @@ class FS(DeviceFormat):
         return s
 
     @property
+    @putsOffProbes
     def dict(self):
         d = super(FS, self).dict
         d.update({"mountpoint": self.mountpoint, "size": self._size,
@@ -193,6 +243,7 @@ class FS(DeviceFormat):
         if not self.resizable:
             raise FSError("filesystem is not resizable")
 
+        self.recordState()
         if newsize is None:
             # unset any outstanding resize request
             self._targetSize = self._size
@@ -217,11 +268,84 @@ class FS(DeviceFormat):
     size = property(_getSize, doc="This filesystem's size, accounting "
                                   "for pending changes")
 
+    @property
+    def needsProbe(self):
+        """ Whether this filesystem's size info has yet to be gathered. """
+        return self._probePending
+
+    def probe(self):
+        """ Gather size information about an existing filesystem.
+
+            This runs the external check and info tools, so it can take a
+            while. Only the first call does anything; later ones, and calls
+            for filesystems that need no probing, return right away. It is
+            safe to run probes of different filesystems concurrently, as long
+            as their devices are already set up. A thread that reads the size
+            info while another one is probing waits for the probe to finish.
+
+            If :attr:`probeDevice` is set and the device is not active, the
+            device is set up for the probe and torn down again afterwards.
+            Nothing is done while probes are put off (see
+            :func:`~.formats.probesPutOff`).
+        """
+        if not self._probePending or probesArePutOff():
+            return
+
+        with self._probeLock:
+            # the probe itself reads the size info as it is
+            if not self._probePending or self._probing:
+                return
+
+            self._probing = True
+            try:
+                self._probe()
+            finally:
+                self._probing = False
+                self._probePending = False
+
+    def _probe(self):
+        device = self.probeDevice
+        setup = device is not None and not device.status
+        if setup:
+            try:
+                device.setup()
+            except (StorageError, blockdev.BlockDevError) as e:
+                log.error("failed to set up %s to probe its filesystem: %s",
+                          device.name, e)
+                return
+
+        # if you want current/min size you have to call updateSizeInfo
+        try:
+            self.updateSizeInfo()
+        except FSError:
+            log.warning("%s filesystem on %s needs repair", self.type,
+                                                            self.device)
+        finally:
+            if setup:
+                try:
+                    device.teardown(recursive=True)
+                except (StorageError, blockdev.BlockDevError) as e:
+                    log.info("teardown of %s failed: %s", device.name, e)
+
+        self._targetSize = self._size
+
     def updateSizeInfo(self):
         """ Update this filesystem's current and minimum size (for resize). """
         if not self.exists:
             return
 
+        # any pending probe is done once this returns; until then, the size
+        # info is read as it is from this thread and waited for from others
+        with self._probeLock:
+            probing = self._probing
+            self._probing = True
+            try:
+                self._updateSizeInfo()
+            finally:
+                self._probing = probing
+                self._probePending = False
+
+    def _updateSizeInfo(self):
         self._size = Size(0)
         self._minSize = self.__class__._minSize
         self._minInstanceSize = Size(0)
@@ -349,6 +473,11 @@ class FS(DeviceFormat):
 
         return size
 
+    @property
+    def minSize(self):
+        self.probe()
+        return super(FS, self).minSize
+
     @property
     def currentSize(self):
         """ The filesystem's current actual size. """
@@ -869,6 +998,7 @@ class FS(DeviceFormat):
     @property
     def resizable(self):
         """ Can formats of this filesystem type be resized? """
+        self.probe()
         return super(FS, self).resizable and self.utilsAvailable
 
     @property
@@ -893,6 +1023,7 @@ class FS(DeviceFormat):
         return self.mountopts or ",".join(self.defaultMountOptions)
 
     def _setOptions(self, options):
+        self.recordState()
         self.mountopts = options
 
     @property
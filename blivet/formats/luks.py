@@ -140,6 +140,7 @@ class LUKS(DeviceFormat):
 
     def _setPassphrase(self, passphrase):
         """ Set the passphrase used to access this device. """
+        self.recordState()
         self.__passphrase = passphrase
 
     passphrase = property(fset=_setPassphrase)
@@ -63,6 +63,7 @@ class MultipathMember(DeviceFormat):
         return self._member
 
     def _setMember(self, member):
+        self.recordState()
         self._member = member
 
     member = property(lambda s: s._getMember(),
@@ -95,6 +95,7 @@ class SwapSpace(DeviceFormat):
 
     def _setPriority(self, priority):
         # pylint: disable=attribute-defined-outside-init
+        self.recordState()
         if priority is None:
             self._priority = -1
             return
@@ -59,6 +59,55 @@ def has_iscsi():
     return True
 
 
+def _node_info(node):
+    """ Return the parameters needed to re-create a :py:func:`libiscsi.node`.
+
+        The node object is not pickable so it can't be sent through a pipe.
+    """
+    # TODO: change libiscsi.node to pickable object
+    return {'name': node.name,
+            'tpgt': node.tpgt,
+            'address': node.address,
+            'port': node.port,
+            'iface': node.iface}
+
+def _login_node(node, username=None, password=None, r_username=None,
+                r_password=None):
+    """ Log into an iSCSI node.
+
+        Raises IOError or ValueError.
+    """
+    authinfo = None
+    if username or password or r_username or r_password:
+        # may raise a ValueError
+        authinfo = libiscsi.chapAuthInfo(username=username,
+                                         password=password,
+                                         reverse_username=r_username,
+                                         reverse_password=r_password)
+    node.setAuth(authinfo)
+    node.login()
+
+def _run_in_process(target, *args):
+    """ Run one of the _call_* functions in a new process.
+
+        :param target: the function to run
+        :type target: callable taking a pipe and args
+        :returns: the tuple (ok, data) the function sent back, or None if
+                  it did not send anything
+        :rtype: tuple or NoneType
+    """
+    (con_recv, con_write) = Pipe(False)
+    p = Process(target=target, args=(con_write,) + args)
+    p.start()
+
+    try:
+        result = con_recv.recv()
+    except EOFError:
+        result = None
+
+    p.join()
+    return result
+
 def _call_discover_targets(conn_pipe, ipaddr, port, authinfo):
     """ Function to separate iscsi :py:func:`libiscsi.discover_sendtargets` call to it's own process.
 
@@ -98,18 +147,37 @@ def _call_discover_targets(conn_pipe, ipaddr, port, authinfo):
         conn_pipe.close()
         return
 
-    nodes = []
+    conn_pipe.send((True, [_node_info(node) for node in found_nodes]))
 
-    # the node object is not pickable so it can't be send with pipe
-    # TODO: change libiscsi.node to pickable object
-    for node in found_nodes:
-        nodes.append({'name': node.name,
-                     'tpgt': node.tpgt,
-                     'address': node.address,
-                     'port': node.port,
-                     'iface': node.iface})
+def _call_node_login(conn_pipe, node_info, credentials):
+    """ Function to log into an iSCSI node in its own process.
 
-    conn_pipe.send((True, nodes))
+        This allows logging into a number of nodes at once, which the
+        :py:mod:`libiscsi` library can't do in threads of one process (see
+        :py:func:`_call_discover_targets`).
+
+        .. note::
+
+            To transfer data to main process ``conn_pipe`` (write only) is used.
+            Pipe returns tuple (ok, data).
+
+            * ``ok``: True if the login succeeded
+            * ``data``: None if ``ok`` was True, the exception otherwise
+
+        :param conn_pipe: Pipe to the main process (write only)
+        :type conn_pipe: :py:func:`multiprocessing.Pipe`
+        :param dict node_info: :py:func:`libiscsi.node` parameters
+        :param tuple credentials: CHAP username, password, reverse username
+                                  and reverse password for node login
+    """
+    try:
+        _login_node(libiscsi.node(**node_info), *credentials)
+    except (IOError, ValueError) as ex:
+        conn_pipe.send((False, ex))
+        conn_pipe.close()
+        return
+
+    conn_pipe.send((True, None))
 
 
 class iscsi(object):
@@ -313,6 +381,30 @@ class iscsi(object):
 
         Returns list of nodes user can log in.
         """
+        return self.discover_portals([(ipaddr, port)], username, password,
+                                     r_username, r_password)[(ipaddr, port)]
+
+    def discover_portals(self, portals, username=None, password=None,
+                         r_username=None, r_password=None):
+        """
+        Discover iSCSI nodes on a number of targets at once.
+
+        Each target is handled as by :meth:`discover`, but discovery runs on
+        up to flags.iscsi_threads targets at a time.
+
+        :param portals: the targets' IP addresses and ports
+        :type portals: list of (str, str)
+        :param username: CHAP username for discovery
+        :type username: str or NoneType
+        :param password: CHAP password for discovery
+        :type password: str or NoneType
+        :param r_username: reverse CHAP username for discovery
+        :type r_username: str or NoneType
+        :param r_password: reverse CHAP password for discovery
+        :type r_password: str or NoneType
+        :returns: the nodes user can log in, keyed by (ipaddr, port)
+        :rtype: dict
+        """
         authinfo = None
 
         if not has_iscsi():
@@ -320,10 +412,17 @@ class iscsi(object):
         if self._initiator == "":
             raise ValueError(_("No initiator name set"))
 
-        if self.active_nodes((ipaddr, port)):
-            log.debug("iSCSI: skipping discovery of %s:%s due to active nodes",
-                      ipaddr, port)
-        else:
+        portals = list(portals)
+        pending = []
+        for (ipaddr, port) in portals:
+            if self.active_nodes((ipaddr, port)):
+                log.debug("iSCSI: skipping discovery of %s:%s due to active nodes",
+                          ipaddr, port)
+            elif (ipaddr, port) not in pending:
+                pending.append((ipaddr, port))
+
+        failed = set()
+        if pending:
             if username or password or r_username or r_password:
                 # Note may raise a ValueError
                 authinfo = libiscsi.chapAuthInfo(username=username,
@@ -335,72 +434,109 @@ class iscsi(object):
             # start libiscsi discover_sendtargets in a new process
             # threads can't be used here because the libiscsi library
             # using signals internally which are send to bad thread
-            (con_recv, con_write) = Pipe(False)
-            p = Process(target=_call_discover_targets, args=(con_write,
-                                                             ipaddr,
-                                                             port,
-                                                             authinfo, ))
-            p.start()
+            def discover_portal(portal):
+                return _run_in_process(_call_discover_targets, portal[0],
+                                       portal[1], authinfo)
+
+            results = util.parallel_map(discover_portal, pending,
+                                        max_workers=flags.iscsi_threads)
+            for (portal, result) in zip(pending, results):
+                if result is None:
+                    log.error("iSCSI: can't receive response from "
+                              "_call_discover_targets")
+                    failed.add(portal)
+                    continue
 
-            try:
-                (ok, data) = con_recv.recv()
+                (ok, data) = result
                 if not ok:
                     log.debug("iSCSI: exception raised when "
                               "discover_sendtargets process called: %s",
                               str(data))
-            except EOFError:
-                ok = False
-                log.error("iSCSI: can't receive response from "
-                          "_call_discover_targets")
-
-            p.join()
+                    failed.add(portal)
+                    continue
 
-            # convert dictionary back to iscsi nodes object
-            if ok:
-                found_nodes = []
+                # convert dictionary back to iscsi nodes object
+                self.discovered_targets[portal] = []
                 for node in data:
-                    found_nodes.append(libiscsi.node(**node))
-            else:
-                return []
-
-            self.discovered_targets[(ipaddr, port)] = []
-            for node in found_nodes:
-                self.discovered_targets[(ipaddr, port)].append([node, False])
-                log.debug("discovered iSCSI node: %s", node.name)
+                    node = libiscsi.node(**node)
+                    self.discovered_targets[portal].append([node, False])
+                    log.debug("discovered iSCSI node: %s", node.name)
 
         # only return the nodes we are not logged into yet
-        return [node for (node, logged_in) in
-                self.discovered_targets[(ipaddr, port)]
-                if not logged_in]
+        return dict((portal, [node for (node, logged_in) in
+                              self.discovered_targets.get(portal, [])
+                              if not logged_in and portal not in failed])
+                    for portal in portals)
+
+    def _finish_login(self, node, error=None):
+        """ Record the result of logging into a node.
+
+            :param node: the node
+            :param error: the exception the login raised, if any
+            :returns: (rc, msg) as from :meth:`log_into_node`
+            :rtype: tuple
+        """
+        if error is not None:
+            msg = str(error)
+            log.warning("iSCSI: could not log into %s: %s", node.name, msg)
+            return (False, msg)
+
+        log.info("iSCSI: logged into %s at %s:%s through %s",
+                node.name, node.address, node.port, node.iface)
+        if not self._mark_node_active(node):
+            log.error("iSCSI: node not found among discovered")
+
+        return (True, "")
 
     def log_into_node(self, node, username=None, password=None,
                   r_username=None, r_password=None):
         """
         Raises IOError.
         """
-        rc = False # assume failure
-        msg = ""
-
         try:
-            authinfo = None
-            if username or password or r_username or r_password:
-                # may raise a ValueError
-                authinfo = libiscsi.chapAuthInfo(username=username,
-                                                 password=password,
-                                                 reverse_username=r_username,
-                                                 reverse_password=r_password)
-            node.setAuth(authinfo)
-            node.login()
-            rc = True
-            log.info("iSCSI: logged into %s at %s:%s through %s",
-                    node.name, node.address, node.port, node.iface)
-            if not self._mark_node_active(node):
-                log.error("iSCSI: node not found among discovered")
+            _login_node(node, username, password, r_username, r_password)
         except (IOError, ValueError) as e:
-            msg = str(e)
-            log.warning("iSCSI: could not log into %s: %s", node.name, msg)
+            return self._finish_login(node, e)
+
+        return self._finish_login(node)
 
-        return (rc, msg)
+    def log_into_nodes(self, nodes, username=None, password=None,
+                       r_username=None, r_password=None):
+        """
+        Log into a number of nodes at once.
+
+        Up to flags.iscsi_threads logins run at a time, each in a process of
+        its own. The credentials are used for all of the nodes.
+
+        :param nodes: the nodes to log into
+        :type nodes: list of :py:func:`libiscsi.node`
+        :returns: (rc, msg) for each node, as from :meth:`log_into_node`
+        :rtype: list of tuple
+        """
+        nodes = list(nodes)
+        if flags.iscsi_threads <= 1 or len(nodes) <= 1:
+            return [self.log_into_node(node, username, password, r_username,
+                                       r_password)
+                    for node in nodes]
+
+        credentials = (username, password, r_username, r_password)
+        def login(node):
+            return _run_in_process(_call_node_login, _node_info(node),
+                                   credentials)
+
+        results = []
+        logins = util.parallel_map(login, nodes, max_workers=flags.iscsi_threads)
+        for (node, result) in zip(nodes, logins):
+            if result is None:
+                error = IOError("no response from the login process")
+            else:
+                (ok, error) = result
+                if ok:
+                    error = None
+
+            results.append(self._finish_login(node, error))
+
+        return results
 
     def addTarget(self, ipaddr, port="3260", user=None, pw=None,
                   user_in=None, pw_in=None, target=None, iface=None,
@@ -437,36 +573,54 @@ class iscsi(object):
         :param discover_pw_in: reverse CHAP password for discovery
         :type discover_pw_in: str or NoneType
         """
+        self.addTargets([(ipaddr, port)], user, pw, user_in, pw_in, target,
+                        iface, discover_user, discover_pw, discover_user_in,
+                        discover_pw_in)
+
+    def addTargets(self, portals, user=None, pw=None,
+                   user_in=None, pw_in=None, target=None, iface=None,
+                   discover_user=None, discover_pw=None,
+                   discover_user_in=None, discover_pw_in=None):
+        """
+        Connect to a number of iSCSI servers and add all targets found on
+        them, as :meth:`addTarget` does for one server.
 
-        found = 0
-        logged_in = 0
+        Discovery and logins run for up to flags.iscsi_threads servers and
+        nodes at a time (see :meth:`discover_portals` and
+        :meth:`log_into_nodes`), and udev is only waited for once, after
+        all of the logins.
 
-        found_nodes = self.discover(ipaddr, port, discover_user, discover_pw,
-                                    discover_user_in, discover_pw_in)
-        if found_nodes == None:
-            raise IOError(_("No iSCSI nodes discovered"))
+        :param portals: the servers' IP addresses and ports
+        :type portals: list of (str, str)
 
-        for node in found_nodes:
-            if target and target != node.name:
-                log.debug("iscsi: skipping logging to iscsi node '%s'", node.name)
-                continue
-            if iface:
-                node_net_iface = self.ifaces.get(node.iface, node.iface)
-                if iface != node_net_iface:
-                    log.debug("iscsi: skipping logging to iscsi node '%s' via %s",
-                               node.name, node_net_iface)
+        The other parameters are as for :meth:`addTarget` and apply to all
+        of the servers. IOError is raised if no new nodes were discovered on
+        any of the servers or no node could be logged into.
+        """
+        found_nodes = self.discover_portals(portals, discover_user,
+                                            discover_pw, discover_user_in,
+                                            discover_pw_in)
+
+        nodes = []
+        for portal in found_nodes:
+            for node in found_nodes[portal]:
+                if target and target != node.name:
+                    log.debug("iscsi: skipping logging to iscsi node '%s'", node.name)
                     continue
+                if iface:
+                    node_net_iface = self.ifaces.get(node.iface, node.iface)
+                    if iface != node_net_iface:
+                        log.debug("iscsi: skipping logging to iscsi node '%s' via %s",
+                                   node.name, node_net_iface)
+                        continue
 
-            found = found + 1
-
-            (rc, _msg) = self.log_into_node(node, user, pw, user_in, pw_in)
-            if rc:
-                logged_in = logged_in +1
+                nodes.append(node)
 
-        if found == 0:
+        if not nodes:
             raise IOError(_("No new iSCSI nodes discovered"))
 
-        if logged_in == 0:
+        results = self.log_into_nodes(nodes, user, pw, user_in, pw_in)
+        if not any(rc for (rc, _msg) in results):
             raise IOError(_("Could not log in to any of the discovered nodes"))
 
         self.stabilize()
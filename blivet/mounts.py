@@ -19,21 +19,36 @@
 #
 # Red Hat Author(s): Vojtech Trefny <vtrefny@redhat.com>
 #
+import select
 from collections import defaultdict
-from . import util
+from threading import Lock
 
 import logging
 log = logging.getLogger("blivet")
 
 class MountsCache(object):
-    """ Cache object for system mountpoints; checks /proc/mounts and
-        /proc/self/mountinfo for up-to-date information.
+    """ Cache object for system mountpoints; parses /proc/self/mountinfo.
+
+        The kernel flags the mountinfo file as having an exceptional
+        condition (POLLPRI) whenever the mount table changes, so the file is
+        only parsed again after that happens.
     """
+    MOUNTINFO = "/proc/self/mountinfo"
 
     def __init__(self):
-        self.mountsHash = 0
+        # (devspec, subvolspec) -> mountpoints
         self.mountpoints = defaultdict(list)
 
+        # mountpoint -> (devspec, subvolspec) of the devices mounted there
+        self.devices = defaultdict(list)
+
+        self._mountinfo = None
+        self._poll = None
+        self._stale = True
+
+        # held while checking for changes and reading the table again
+        self._lock = Lock()
+
     def getMountpoints(self, devspec, subvolspec=None):
         """ Get mountpoints for selected device
 
@@ -50,7 +65,18 @@ class MountsCache(object):
         """
         self._cacheCheck()
 
-        return self.mountpoints[(devspec, subvolspec)]
+        return self.mountpoints.get((devspec, subvolspec), [])[:]
+
+    def getDevices(self, path):
+        """ Get the devices mounted on a path
+
+            :param str path: the mountpoint
+            :returns: (devspec, subvolspec) of the devices, in order of mounting
+            :rtype: list of tuple
+        """
+        self._cacheCheck()
+
+        return self.devices.get(path, [])[:]
 
     def isMountpoint(self, path):
         """ Check to see if a path is already mounted
@@ -59,46 +85,73 @@ class MountsCache(object):
         """
         self._cacheCheck()
 
-        return any(path in p for p in self.mountpoints.values())
+        return path in self.devices
+
+    def invalidate(self):
+        """ Make sure the mount table is read again on next use. """
+        self._stale = True
 
-    def _getActiveMounts(self):
-        """ Get information about mounted devices from /proc/mounts and
-            /proc/self/mountinfo
+    def _parse(self, lines):
+        """ Refresh the cache from the lines of /proc/self/mountinfo.
 
-            Refreshes self.mountpoints with current moutpoint information
+            The new maps replace the old ones only once they are complete, so
+            lookups never see a partial table.
         """
-        self.mountpoints = defaultdict(list)
-        for line in open("/proc/mounts").readlines():
+        mountpoints = defaultdict(list)
+        devices = defaultdict(list)
+        for line in lines:
+            # mount ID, parent ID, major:minor, root, mountpoint, options,
+            # optional fields, "-", fstype, source, superblock options
+            fields = line.split()
             try:
-                (devspec, mountpoint, fstype, _options, _rest) = line.split(None, 4)
-            except ValueError:
-                log.error("failed to parse /proc/mounts line: %s", line)
+                sep = fields.index("-", 6)
+                (root, mountpoint) = fields[3:5]
+                (fstype, devspec) = fields[sep + 1:sep + 3]
+            except (ValueError, IndexError):
+                log.error("failed to parse %s line: %s", self.MOUNTINFO, line)
                 continue
 
             if fstype == "btrfs":
-                # get the subvol name from /proc/self/mountinfo
-                for line in open("/proc/self/mountinfo").readlines():
-                    fields = line.split()
-                    _subvol = fields[3]
-                    _mountpoint = fields[4]
-                    _devspec = fields[9]
-                    if _mountpoint == mountpoint and _devspec == devspec:
-                        # empty _subvol[1:] means it is a top-level volume
-                        subvolspec = _subvol[1:] or 5
-
-                        self.mountpoints[(devspec, subvolspec)].append(mountpoint)
-
+                # empty root[1:] means it is a top-level volume
+                subvolspec = root[1:] or 5
             else:
-                self.mountpoints[(devspec, None)].append(mountpoint)
+                subvolspec = None
 
-    def _cacheCheck(self):
-        """ Computes the MD5 hash on /proc/mounts and updates the cache on change
-        """
+            mountpoints[(devspec, subvolspec)].append(mountpoint)
+            devices[mountpoint].append((devspec, subvolspec))
+
+        (self.mountpoints, self.devices) = (mountpoints, devices)
 
-        md5hash = util.md5_file("/proc/mounts")
+    def _changed(self):
+        """ Has the mount table changed since it was last read? """
+        if self._mountinfo is None:
+            try:
+                self._mountinfo = open(self.MOUNTINFO)
+                self._poll = select.poll()
+                self._poll.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+            except (IOError, OSError, AttributeError) as e:
+                # without a way to get notified, read the file every time
+                log.debug("cannot watch %s for changes: %s", self.MOUNTINFO, e)
+                self._mountinfo = None
+                self._poll = None
+
+            return True
+
+        return bool(self._poll.poll(0))
 
-        if md5hash != self.mountsHash:
-            self.mountsHash = md5hash
-            self._getActiveMounts()
+    def _cacheCheck(self):
+        """ Updates the cache if the mount table has changed """
+        with self._lock:
+            changed = self._changed()
+            if not (changed or self._stale):
+                return
+
+            self._stale = False
+            if self._mountinfo is not None:
+                self._mountinfo.seek(0)
+                self._parse(self._mountinfo.readlines())
+            else:
+                with open(self.MOUNTINFO) as f:
+                    self._parse(f.readlines())
 
 mountsCache = MountsCache()
@@ -23,6 +23,7 @@
 import shlex
 import os
 import stat
+import tempfile
 import time
 from gi.repository import BlockDev as blockdev
 
@@ -106,29 +107,35 @@ def releaseFromOsRelease(fn):
 
     return (relName, relVer)
 
-def getReleaseString():
+def getReleaseString(root=None, arch=None):
     """
     Attempt to identify the installation of a Linux distribution by checking
     a previously mounted filesystem for several files.  The filesystem must
     be mounted under the target physical root.
 
+    :keyword str root: where the filesystem is mounted (default: the sysroot)
+    :keyword str arch: the machine's arch, if it is already known (default:
+                       run arch in the root to find out)
     :returns: The machine's arch, distribution name, and distribution version
     or None for any parts that cannot be determined
     :rtype: (string, string, string)
     """
     relName = None
     relVer = None
+    relArch = arch
+    root = root or getSysroot()
 
-    try:
-        relArch = util.capture_output(["arch"], root=getSysroot()).strip()
-    except OSError:
-        relArch = None
+    if relArch is None:
+        try:
+            relArch = util.capture_output(["arch"], root=root).strip()
+        except OSError:
+            relArch = None
 
-    filename = "%s/etc/redhat-release" % getSysroot()
+    filename = "%s/etc/redhat-release" % root
     if os.access(filename, os.R_OK):
         (relName, relVer) = releaseFromRedhatRelease(filename)
     else:
-        filename = "%s/etc/os-release" % getSysroot()
+        filename = "%s/etc/os-release" % root
         if os.access(filename, os.R_OK):
             (relName, relVer) = releaseFromOsRelease(filename)
 
@@ -191,16 +198,76 @@ def parseFSTab(devicetree, chroot=None):
 
     return (mounts, swaps)
 
+def _isRootCandidate(device):
+    """ Return True if device's filesystem may hold an installation.
+
+        The checks only use what is already known about the device and its
+        format, and the cheapest ones come first.
+    """
+    return (device.format.exists and device.format.linuxNative and
+            device.controllable and device.format.mountable)
+
+def _examineRoot(devicetree, device, mountpoint, arch=None):
+    """ Look for an installation on a device's filesystem.
+
+        :param devicetree: the device tree
+        :type devicetree: :class:`~.devicetree.DeviceTree`
+        :param device: the device, whose filesystem must be mounted
+        :type device: :class:`~.devices.StorageDevice`
+        :param str mountpoint: where the filesystem is mounted
+        :keyword str arch: the machine's arch (see :func:`getReleaseString`)
+        :returns: whether the filesystem has an fstab and, if it does, the
+                  installation found on it (if any)
+        :rtype: tuple of bool and :class:`Root` or None
+    """
+    if not os.access(mountpoint + "/etc/fstab", os.R_OK):
+        return (False, None)
+
+    try:
+        (architecture, product, version) = getReleaseString(root=mountpoint,
+                                                            arch=arch)
+    except ValueError:
+        name = _("Linux on %s") % device.name
+    else:
+        # I'd like to make this finer grained, but it'd be very difficult
+        # to translate.
+        if not product or not version or not architecture:
+            name = _("Unknown Linux")
+        elif "linux" in product.lower():
+            name = _("%(product)s %(version)s for %(arch)s") % \
+                    {"product": product, "version": version, "arch": architecture}
+        else:
+            name = _("%(product)s Linux %(version)s for %(arch)s") % \
+                    {"product": product, "version": version, "arch": architecture}
+
+    (mounts, swaps) = parseFSTab(devicetree, chroot=mountpoint)
+    if not mounts and not swaps:
+        # empty /etc/fstab. weird, but I've seen it happen.
+        return (True, None)
+
+    return (True, Root(mounts=mounts, swaps=swaps, name=name))
+
 def findExistingInstallations(devicetree):
+    """ Find the installations on the filesystems in the device tree.
+
+        :param devicetree: the device tree
+        :type devicetree: :class:`~.devicetree.DeviceTree`
+        :returns: the installations found, in device tree order
+        :rtype: list of :class:`Root`
+
+        With :attr:`~.flags.Flags.discovery_threads` greater than 1, the
+        filesystems are examined concurrently (see
+        :func:`_findExistingInstallationsParallel`).
+    """
     if not os.path.exists(getTargetPhysicalRoot()):
         util.makedirs(getTargetPhysicalRoot())
 
-    roots = []
-    for device in devicetree.leaves:
-        if not device.format.linuxNative or not device.format.mountable or \
-           not device.controllable:
-            continue
+    candidates = [d for d in devicetree.leaves if _isRootCandidate(d)]
+    if flags.discovery_threads > 1 and len(candidates) > 1:
+        return _findExistingInstallationsParallel(devicetree, candidates)
 
+    roots = []
+    for device in candidates:
         try:
             device.setup()
         except Exception: # pylint: disable=broad-except
@@ -215,32 +282,80 @@ def findExistingInstallations(devicetree):
             device.teardown()
             continue
 
-        if not os.access(getSysroot() + "/etc/fstab", os.R_OK):
-            device.teardown(recursive=True)
-            continue
+        (has_fstab, root) = _examineRoot(devicetree, device, getSysroot())
+        device.teardown(recursive=not has_fstab)
+        if root is not None:
+            roots.append(root)
+
+    return roots
 
+def _findExistingInstallationsParallel(devicetree, candidates):
+    """ Examine the candidate filesystems concurrently.
+
+        :param devicetree: the device tree
+        :type devicetree: :class:`~.devicetree.DeviceTree`
+        :param candidates: the devices whose filesystems to examine
+        :type candidates: list of :class:`~.devices.StorageDevice`
+        :returns: the installations found, in the order of the candidates
+        :rtype: list of :class:`Root`
+
+        Candidates often share parents (eg: the lvs of a vg), so they are all
+        set up first, and torn down at the end, one at a time. In between,
+        each filesystem is mounted on its own temporary directory, examined
+        and unmounted, in up to :attr:`~.flags.Flags.discovery_threads`
+        threads. No programs are run in a chroot from those threads, since
+        that is not safe while other threads are running; the machine's
+        arch is the same for all of the installations anyway.
+    """
+    arch = os.uname()[4]
+    ready = []
+    for device in candidates:
         try:
-            (architecture, product, version) = getReleaseString()
-        except ValueError:
-            name = _("Linux on %s") % device.name
+            device.setup()
+        except Exception: # pylint: disable=broad-except
+            log_exception_info(log.warning, "setup of %s failed", [device.name])
         else:
-            # I'd like to make this finer grained, but it'd be very difficult
-            # to translate.
-            if not product or not version or not architecture:
-                name = _("Unknown Linux")
-            elif "linux" in product.lower():
-                name = _("%(product)s %(version)s for %(arch)s") % \
-                        {"product": product, "version": version, "arch": architecture}
-            else:
-                name = _("%(product)s Linux %(version)s for %(arch)s") % \
-                        {"product": product, "version": version, "arch": architecture}
+            ready.append(device)
+
+    def examine(device):
+        mountpoint = tempfile.mkdtemp(prefix="blivet-root.")
+        options = device.format.options + ",ro"
+        try:
+            device.format.mount(options=options, mountpoint=mountpoint)
+        except Exception: # pylint: disable=broad-except
+            log_exception_info(log.warning, "mount of %s as %s failed", [device.name, device.format.type])
+            os.rmdir(mountpoint)
+            # only the device itself is torn down, as in the serial case
+            return (True, None)
 
-        (mounts, swaps) = parseFSTab(devicetree, chroot=getSysroot())
+        try:
+            return _examineRoot(devicetree, device, mountpoint, arch=arch)
+        finally:
+            try:
+                device.format.unmount(mountpoint=mountpoint)
+            except Exception: # pylint: disable=broad-except
+                log_exception_info(log.warning, "unmount of %s failed", [device.name])
+
+            if not os.path.ismount(mountpoint):
+                os.rmdir(mountpoint)
+
+    log.info("examining %d filesystems using up to %d threads", len(ready),
+             flags.discovery_threads)
+    results = util.parallel_map(examine, ready,
+                                max_workers=flags.discovery_threads)
+
+    # tear down the parents of filesystems without an fstab only once none
+    # of the candidates is active any more
+    for device in ready:
         device.teardown()
-        if not mounts and not swaps:
-            # empty /etc/fstab. weird, but I've seen it happen.
-            continue
-        roots.append(Root(mounts=mounts, swaps=swaps, name=name))
+
+    roots = []
+    for (device, (has_fstab, root)) in zip(ready, results):
+        if not has_fstab:
+            device.teardown(recursive=True)
+
+        if root is not None:
+            roots.append(root)
 
     return roots
 
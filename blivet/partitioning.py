@@ -21,6 +21,7 @@
 #
 
 from operator import gt, lt
+import bisect
 from decimal import Decimal
 from gi.repository import BlockDev as blockdev
 import functools
@@ -164,8 +165,154 @@ def getNextPartitionType(disk, no_primary=None):
 
     return part_type
 
+class FreeSpaceRegions(object):
+    """ An index of the free regions on a disk.
+
+        The regions are those :meth:`parted.Disk.getFreeSpaceRegions` returns,
+        except for any that start beyond the highest start sector the
+        disklabel allows. They are kept in order of start sector and in order
+        of length for each set of regions a partition type can go in, so
+        :func:`getBestFreeSpaceRegion` can find the region it wants with a
+        bisection.
+
+        The index describes the disk as it was when the index was created, so
+        a new one is needed once a partition has been added to or removed from
+        the disk.
+    """
+    def __init__(self, disk):
+        """
+            :param disk: the disk
+            :type disk: :class:`parted.Disk`
+        """
+        self.disk = disk
+        self.sectorSize = disk.device.sectorSize
+        max_start = disk.maxPartitionStartSector
+        self._regions = [f for f in disk.getFreeSpaceRegions()
+                         if f.start <= max_start]
+        self._extended = disk.getExtendedPartition()
+        self._views = {}
+
+    def _view(self, part_type):
+        """ Return the regions a partition of the given type can go in.
+
+            :param part_type: the partition type
+            :type part_type: one of parted's PARTITION_* constants
+            :returns: the regions and their start sectors in order of start
+                      sector, the greatest length of each region and those
+                      before it, and the regions and their lengths in order of
+                      length
+            :rtype: tuple of five lists
+        """
+        key = None
+        if self._extended and part_type in (parted.PARTITION_NORMAL,
+                                            parted.PARTITION_LOGICAL):
+            key = part_type
+
+        view = self._views.get(key)
+        if view is None:
+            regions = self._regions
+            if key is not None:
+                # logical partitions go inside the extended partition and
+                # primary partitions outside of it
+                inside = (key == parted.PARTITION_LOGICAL)
+                extended = self._extended.geometry
+                regions = [f for f in regions
+                           if extended.contains(f) == inside]
+
+            max_lengths = []
+            for f in regions:
+                max_lengths.append(max(f.length, max_lengths[-1])
+                                   if max_lengths else f.length)
+
+            starts = [f.start for f in regions]
+            by_length = sorted(regions, key=lambda f: (f.length, f.start))
+            lengths = [f.length for f in by_length]
+            view = (regions, starts, max_lengths, by_length, lengths)
+            self._views[key] = view
+
+        return view
+
+    def regions(self, part_type):
+        """ Return the regions a partition of the given type can go in.
+
+            :param part_type: the partition type
+            :type part_type: one of parted's PARTITION_* constants
+            :returns: the regions, in order of start sector
+            :rtype: list of :class:`parted.Geometry`
+        """
+        return self._view(part_type)[0]
+
+    def containing(self, part_type, sector):
+        """ Return the region that contains a sector, if any.
+
+            :param part_type: the partition type
+            :type part_type: one of parted's PARTITION_* constants
+            :param sector: the sector
+            :type sector: int
+            :rtype: :class:`parted.Geometry` or NoneType
+        """
+        (regions, starts, _max_lengths, _by_length, _lengths) = self._view(part_type)
+        i = bisect.bisect_right(starts, sector) - 1
+        if i >= 0 and regions[i].containsSector(sector):
+            return regions[i]
+
+        return None
+
+    def first(self, part_type, length, max_start=None):
+        """ Return the first region of at least the given length.
+
+            :param part_type: the partition type
+            :type part_type: one of parted's PARTITION_* constants
+            :param length: the length in sectors
+            :type length: int
+            :keyword max_start: the highest start sector allowed
+            :type max_start: int
+            :rtype: :class:`parted.Geometry` or NoneType
+        """
+        (regions, _starts, max_lengths, _by_length, _lengths) = self._view(part_type)
+        i = bisect.bisect_left(max_lengths, length)
+        if i < len(regions) and \
+           (max_start is None or regions[i].start <= max_start):
+            return regions[i]
+
+        return None
+
+    def smallest(self, part_type, length):
+        """ Return the smallest region of at least the given length.
+
+            :param part_type: the partition type
+            :type part_type: one of parted's PARTITION_* constants
+            :param length: the length in sectors
+            :type length: int
+            :rtype: :class:`parted.Geometry` or NoneType
+
+            Of several regions of the same length the first one is returned.
+        """
+        (_regions, _starts, _max_lengths, by_length, lengths) = self._view(part_type)
+        i = bisect.bisect_left(lengths, length)
+        if i < len(by_length):
+            return by_length[i]
+
+        return None
+
+    def largest(self, part_type):
+        """ Return the largest region.
+
+            :param part_type: the partition type
+            :type part_type: one of parted's PARTITION_* constants
+            :rtype: :class:`parted.Geometry` or NoneType
+
+            Of several regions of the same length the first one is returned.
+        """
+        (_regions, _starts, _max_lengths, by_length, lengths) = self._view(part_type)
+        if not by_length:
+            return None
+
+        return by_length[bisect.bisect_left(lengths, lengths[-1])]
+
 def getBestFreeSpaceRegion(disk, part_type, req_size, start=None,
-                           boot=None, best_free=None, grow=None):
+                           boot=None, best_free=None, grow=None,
+                           regions=None):
     """ Return the "best" free region on the specified disk.
 
         For non-boot partitions, we return the largest free region on the
@@ -194,63 +341,62 @@ def getBestFreeSpaceRegion(disk, part_type, req_size, start=None,
         :type best_free: :class:`parted.Geometry`
         :keyword grow: indicates whether this is a growable request
         :type grow: bool
+        :keyword regions: the free regions on the disk, if already known
+        :type regions: :class:`FreeSpaceRegions`
 
     """
     log.debug("getBestFreeSpaceRegion: disk=%s part_type=%d req_size=%s "
               "boot=%s best=%s grow=%s start=%s",
               disk.device.path, part_type, req_size, boot, best_free, grow,
               start)
-    extended = disk.getExtendedPartition()
-
-    for free_geom in disk.getFreeSpaceRegions():
-        log.debug("checking %d-%d (%s)", free_geom.start, free_geom.end,
-                                         Size(free_geom.getLength(unit="B")))
-        if start is not None and not free_geom.containsSector(start):
-            log.debug("free region does not contain requested start sector")
-            continue
-
-        if extended:
-            in_extended = extended.geometry.contains(free_geom)
-            if ((in_extended and part_type == parted.PARTITION_NORMAL) or
-                (not in_extended and part_type == parted.PARTITION_LOGICAL)):
-                log.debug("free region not suitable for request")
-                continue
-
-        if free_geom.start > disk.maxPartitionStartSector:
-            log.debug("free range start sector beyond max for new partitions")
-            continue
+    if regions is None:
+        regions = FreeSpaceRegions(disk)
+
+    # the smallest region that can hold the request, in sectors
+    length = -(-int(req_size) // regions.sectorSize)
+
+    max_start = None
+    if boot:
+        # the start sector beyond which the request would end above 2 TiB
+        max_start = (int(Size("2 TiB")) - int(req_size)) // regions.sectorSize
+
+    # For boot partitions, we want the first suitable region we find.
+    # For growable or extended partitions, we want the largest possible
+    # free region.
+    # For all others, we want the smallest suitable free region.
+    if grow or part_type == parted.PARTITION_EXTENDED:
+        op = gt
+    else:
+        op = lt
 
-        if boot:
-            max_boot = Size("2 TiB")
-            free_start = Size(free_geom.start * disk.device.sectorSize)
-            req_end = free_start + req_size
-            if req_end > max_boot:
-                log.debug("free range position would place boot req above %s",
-                            max_boot)
-                continue
+    if start is not None:
+        free_geom = regions.containing(part_type, start)
+        if free_geom and max_start is not None and free_geom.start > max_start:
+            log.debug("free range position would place boot req above 2 TiB")
+            free_geom = None
+    elif boot and best_free and op is lt:
+        # the first region that is both big enough and smaller than the
+        # current best one
+        free_geom = None
+        for f in regions.regions(part_type):
+            if f.start <= max_start and length <= f.length < best_free.length:
+                free_geom = f
+                break
+    elif boot:
+        if best_free:
+            length = max(length, best_free.length + 1)
+        free_geom = regions.first(part_type, length, max_start=max_start)
+    elif op is gt:
+        free_geom = regions.largest(part_type)
+    else:
+        free_geom = regions.smallest(part_type, length)
 
+    if free_geom and free_geom.length >= length and \
+       (not best_free or op(free_geom.length, best_free.length)):
         log.debug("current free range is %d-%d (%s)", free_geom.start,
                                                       free_geom.end,
                                                       Size(free_geom.getLength(unit="B")))
-        free_size = Size(free_geom.getLength(unit="B"))
-
-        # For boot partitions, we want the first suitable region we find.
-        # For growable or extended partitions, we want the largest possible
-        # free region.
-        # For all others, we want the smallest suitable free region.
-        if grow or part_type == parted.PARTITION_EXTENDED:
-            op = gt
-        else:
-            op = lt
-        if req_size <= free_size:
-            if not best_free or op(free_geom.length, best_free.length):
-                best_free = free_geom
-
-                if boot:
-                    # if this is a bootable partition we want to
-                    # use the first freespace region large enough
-                    # to satisfy the request
-                    break
+        best_free = free_geom
 
     return best_free
 
@@ -305,6 +451,7 @@ def removeNewPartitions(disks, remove, all_partitions):
                 # these get removed last
                 continue
 
+            part.disk.format.recordState()
             part.disk.format.partedDisk.removePartition(part.partedPartition)
             part.partedPartition = None
             part.disk = None
@@ -316,6 +463,7 @@ def removeNewPartitions(disks, remove, all_partitions):
            (flags.installer_mode or
             extended not in (p.partedPartition for p in all_partitions)):
             log.debug("removing empty extended partition from %s", disk.name)
+            disk.format.recordState()
             disk.format.partedDisk.removePartition(extended)
 
 def addPartition(disklabel, free, part_type, size, start=None, end=None):
@@ -389,6 +537,7 @@ def addPartition(disklabel, free, part_type, size, start=None, end=None):
                                  type=part_type,
                                  geometry=new_geom)
     constraint = parted.Constraint(exactGeom=new_geom)
+    disklabel.recordState()
     disklabel.partedDisk.addPartition(partition=partition,
                                       constraint=constraint)
     return partition
@@ -501,12 +650,14 @@ def doPartitioning(storage):
 
     partitions = storage.partitions[:]
     for part in storage.partitions:
+        part.recordState()
         part.req_bootable = False
         if not part.exists:
             # start over with flexible-size requests
             part.req_size = part.req_base_size
 
     try:
+        storage.bootDevice.recordState()
         storage.bootDevice.req_bootable = True
     except AttributeError:
         # there's no stage2 device. hopefully it's temporary.
@@ -523,6 +674,7 @@ def doPartitioning(storage):
         # Mark all growable requests as no longer growable.
         for partition in storage.partitions:
             log.debug("fixing size of %s", partition)
+            partition.recordState()
             partition.req_grow = False
             partition.req_base_size = partition.size
             partition.req_size = partition.size
@@ -595,7 +747,22 @@ def allocatePartitions(storage, disks, partitions, freespace):
 
     removeNewPartitions(disks, new_partitions, partitions)
 
+    # Growth potential is weighed over the whole layout, but placing a request
+    # only changes the layout of the disk it is placed on. So keep the
+    # requests allocated to each disk so far and the growth they allow, and
+    # only work out the growth of a disk again when a request is added to it.
+    disk_partitions = dict((path, []) for path in disklabels)
+    disk_growth = {}    # growth in sectors
+    any_growable = False
+
+    # Likewise the free regions on each disk are only looked up again once a
+    # partition has been added to it. The partitions added to test a layout's
+    # growth potential are removed again, so they leave the regions as they
+    # were.
+    free_regions = {}   # FreeSpaceRegions instances
+
     for _part in new_partitions:
+        any_growable = any_growable or _part.req_grow
         if _part.partedPartition and _part.isExtended:
             # ignore new extendeds as they are implicit requests
             continue
@@ -644,6 +811,10 @@ def allocatePartitions(storage, disks, partitions, freespace):
                 current_free = None
 
             log.debug("checking freespace on %s", _disk.name)
+            regions = free_regions.get(_disk.path)
+            if regions is None:
+                regions = FreeSpaceRegions(disklabel.partedDisk)
+                free_regions[_disk.path] = regions
 
             new_part_type = getNextPartitionType(disklabel.partedDisk)
             if new_part_type is None:
@@ -671,7 +842,8 @@ def allocatePartitions(storage, disks, partitions, freespace):
                                           start=_part.req_start_sector,
                                           best_free=current_free,
                                           boot=boot,
-                                          grow=_part.req_grow)
+                                          grow=_part.req_grow,
+                                          regions=regions)
 
             if best == free and not _part.req_primary and \
                new_part_type == parted.PARTITION_NORMAL:
@@ -686,102 +858,74 @@ def allocatePartitions(storage, disks, partitions, freespace):
                                                   start=_part.req_start_sector,
                                                   best_free=current_free,
                                                   boot=boot,
-                                                  grow=_part.req_grow)
+                                                  grow=_part.req_grow,
+                                                  regions=regions)
 
             if best and free != best:
                 update = True
-                allocated = new_partitions[:new_partitions.index(_part)+1]
-                if any([p.req_grow for p in allocated]):
+                if any_growable:
                     log.debug("evaluating growth potential for new layout")
-                    new_growth = 0
-                    for disk_path in disklabels.keys():
-                        log.debug("calculating growth for disk %s", disk_path)
-                        # Now we check, for growable requests, which of the two
-                        # free regions will allow for more growth.
-
-                        # set up chunks representing the disks' layouts
-                        temp_parts = []
-                        for _p in new_partitions[:new_partitions.index(_part)]:
-                            if _p.disk.path == disk_path:
-                                temp_parts.append(_p)
-
-                        # add the current request to the temp disk to set up
-                        # its partedPartition attribute with a base geometry
-                        if disk_path == _disk.path:
-                            _part_type = new_part_type
-                            _free = best
-                            if new_part_type == parted.PARTITION_EXTENDED and \
-                               new_part_type != _part.req_partType:
-                                addPartition(disklabel, best, new_part_type,
-                                             None)
-
-                                _part_type = parted.PARTITION_LOGICAL
-
-                                _free = getBestFreeSpaceRegion(disklabel.partedDisk,
-                                                               _part_type,
-                                                               _part.req_size,
-                                                               start=_part.req_start_sector,
-                                                               boot=boot,
-                                                               grow=_part.req_grow)
-                                if not _free:
-                                    log.info("not enough space after adding "
-                                             "extended partition for growth test")
-                                    if new_part_type == parted.PARTITION_EXTENDED:
-                                        e = disklabel.extendedPartition
-                                        disklabel.partedDisk.removePartition(e)
-
-                                    continue
-
-                            temp_part = None
-                            try:
-                                temp_part = addPartition(disklabel,
-                                                         _free,
-                                                         _part_type,
-                                                         _part.req_size,
-                                                         _part.req_start_sector,
-                                                         _part.req_end_sector)
-                            except ArithmeticError as e:
-                                log.debug("failed to allocate aligned partition "
-                                         "for growth test")
-                                continue
-
-                            _part.partedPartition = temp_part
-                            _part.disk = _disk
-                            temp_parts.append(_part)
-
-                        chunks = getDiskChunks(all_disks[disk_path],
-                                               temp_parts, freespace)
-
-                        # grow all growable requests
-                        disk_growth = 0 # in sectors
-                        disk_sector_size = Size(disklabels[disk_path].partedDevice.sectorSize)
-                        for chunk in chunks:
-                            chunk.growRequests()
-                            # record the growth for this layout
-                            new_growth += chunk.growth
-                            disk_growth += chunk.growth
-                            for req in chunk.requests:
-                                log.debug("request %d (%s) growth: %d (%s) "
-                                          "size: %s",
-                                          req.device.id,
-                                          req.device.name,
-                                          req.growth,
-                                          sectorsToSize(req.growth,
-                                                        disk_sector_size),
-                                          sectorsToSize(req.growth + req.base,
-                                                        disk_sector_size))
-                        log.debug("disk %s growth: %d (%s)",
-                                        disk_path, disk_growth,
-                                        sectorsToSize(disk_growth,
-                                                      disk_sector_size))
+                    # Now we check, for growable requests, which of the two
+                    # free regions will allow for more growth.
+                    for disk_path in disklabels:
+                        if disk_path != _disk.path and \
+                           disk_path not in disk_growth:
+                            disk_growth[disk_path] = getDiskGrowth(all_disks[disk_path],
+                                                                   disk_partitions[disk_path],
+                                                                   freespace)
+
+                    new_growth = sum(g for (path, g) in disk_growth.items()
+                                     if path != _disk.path)
+
+                    # add the current request to the temp disk to set up
+                    # its partedPartition attribute with a base geometry
+                    _part_type = new_part_type
+                    _free = best
+                    extended = (new_part_type == parted.PARTITION_EXTENDED and
+                                new_part_type != _part.req_partType)
+                    if extended:
+                        addPartition(disklabel, best, new_part_type, None)
+
+                        _part_type = parted.PARTITION_LOGICAL
+
+                        _free = getBestFreeSpaceRegion(disklabel.partedDisk,
+                                                       _part_type,
+                                                       _part.req_size,
+                                                       start=_part.req_start_sector,
+                                                       boot=boot,
+                                                       grow=_part.req_grow)
+
+                    temp_part = None
+                    if not _free:
+                        log.info("not enough space after adding "
+                                 "extended partition for growth test")
+                    else:
+                        try:
+                            temp_part = addPartition(disklabel,
+                                                     _free,
+                                                     _part_type,
+                                                     _part.req_size,
+                                                     _part.req_start_sector,
+                                                     _part.req_end_sector)
+                        except ArithmeticError:
+                            log.debug("failed to allocate aligned partition "
+                                     "for growth test")
 
                     if temp_part:
+                        _part.partedPartition = temp_part
+                        _part.disk = _disk
+                        new_growth += getDiskGrowth(_disk,
+                                                    disk_partitions[_disk.path] + [_part],
+                                                    freespace)
+                        disklabel.recordState()
                         disklabel.partedDisk.removePartition(temp_part)
+
                     _part.partedPartition = None
                     _part.disk = None
 
-                    if new_part_type == parted.PARTITION_EXTENDED:
+                    if extended:
                         e = disklabel.extendedPartition
+                        disklabel.recordState()
                         disklabel.partedDisk.removePartition(e)
 
                     log.debug("total growth: %d sectors", new_growth)
@@ -861,6 +1005,10 @@ def allocatePartitions(storage, disks, partitions, freespace):
         # the disk, so we need to grab the latest version...
         _part.partedPartition = disklabel.partedDisk.getPartitionByPath(_part.path)
 
+        disk_partitions[_disk.path].append(_part)
+        disk_growth.pop(_disk.path, None)
+        free_regions.pop(_disk.path, None)
+
 
 class Request(object):
     """ A partition request.
@@ -1097,6 +1245,65 @@ class Chunk(object):
     def sortRequests(self):
         pass
 
+    def _allocateGrowth(self, requests, uniform=False):
+        """ Return the growth each request gets from the pool in one round.
+
+            :param requests: the requests to grow, in chunk order
+            :type requests: list of :class:`Request`
+            :keyword uniform: grow requests uniformly instead of proportionally
+            :type uniform: bool
+            :returns: units of growth for each request, in the same order
+            :rtype: list of int
+
+            This is the fixed point of handing out shares of the pool in
+            proportion to the requests' weights (their base sizes, or one
+            apiece under uniform growth) and returning anything beyond a
+            request's maximum growth to the pool for the others to share.
+            Requests are visited in order of their maximum growth relative to
+            their weight. As long as the next one's share of what is left
+            reaches its maximum it is capped, and everything after it divides
+            the rest of the pool in proportion to the weights. Units lost to
+            truncation stay in the pool.
+        """
+        weights = [1 if uniform else int(r.base) for r in requests]
+        room = []
+        for (req, weight) in zip(requests, weights):
+            max_growth = self.maxGrowth(req)
+            if max_growth:
+                room.append(max(int(max_growth - req.growth), 0))
+            else:
+                room.append(None)
+
+        # An approximate order is good enough here: the test for whether a
+        # request gets capped is exact, and any request that ends up with more
+        # than its maximum is trimmed and the pool shared out again.
+        def capRatio(i):
+            if room[i] is None or not weights[i]:
+                return float("inf")
+
+            return float(room[i]) / weights[i]
+
+        growth = [0] * len(requests)
+        pool = int(self.pool)
+        base = sum(weights)
+        order = sorted(range(len(requests)), key=capRatio)
+        for (n, i) in enumerate(order):
+            if room[i] is None or not weights[i] or \
+               room[i] * base > weights[i] * pool:
+                break
+
+            growth[i] = room[i]
+            pool -= room[i]
+            base -= weights[i]
+        else:
+            n = len(order)
+
+        if base:
+            for i in order[n:]:
+                growth[i] = weights[i] * pool // base   # truncate, don't round
+
+        return growth
+
     def growRequests(self, uniform=False):
         """ Calculate growth amounts for requests in this chunk.
 
@@ -1117,42 +1324,40 @@ class Chunk(object):
         for req in self.requests:
             log.debug("req: %r", req)
 
-        # we use this to hold the base for the next loop through the
-        # chunk's requests since we want the base to be the same for
-        # all requests in any given growth iteration
+        # Each round works out the final growth of every remaining request
+        # directly (see _allocateGrowth). Another round is only needed if a
+        # request's maximum growth turned out to depend on the growth of the
+        # requests before it (see DiskChunk.maxGrowth) and some of its growth
+        # had to be put back.
         new_base = self.base
-        last_pool = 0 # used to track changes to the pool across iterations
-        while not self.done and self.pool and last_pool != self.pool:
-            last_pool = self.pool    # to keep from getting stuck
-            self.base = new_base
-            if uniform:
-                growth = int(last_pool / self.remaining)
-
+        requests = [p for p in self.requests
+                    if not p.done and p not in self.skip_list]
+        while requests and self.pool:
             log.debug("%d requests and %s (%s) left in chunk",
-                        self.remaining, self.pool, self.lengthToSize(self.pool))
-            for p in self.requests:
-                if p.done or p in self.skip_list:
-                    continue
-
-                if not uniform:
-                    # Each request is allocated free units from the pool
-                    # based on the relative _base_ sizes of the remaining
-                    # growable requests.
-                    share = Decimal(p.base) / Decimal(self.base)
-                    growth = int(share * last_pool) # truncate, don't round
-
+                        len(requests), self.pool, self.lengthToSize(self.pool))
+            allocation = self._allocateGrowth(requests, uniform=uniform)
+            for (p, growth) in zip(requests, allocation):
                 p.growth += growth
                 self.pool -= growth
                 log.debug("adding %s (%s) to %d (%s)",
                             growth, self.lengthToSize(growth),
                             p.device.id, p.device.name)
 
+            last_pool = self.pool
+            for p in requests:
                 new_base = self.trimOverGrownRequest(p, base=new_base)
                 log.debug("new grow amount for request %d (%s) is %s "
                           "units, or %s",
                             p.device.id, p.device.name, p.growth,
                             self.lengthToSize(p.growth))
 
+            if self.pool == last_pool:
+                break
+
+            requests = [p for p in requests if not p.done]
+
+        self.base = new_base
+
         if self.pool:
             # allocate any leftovers in pool to the first partition
             # that can still grow
@@ -1420,6 +1625,38 @@ def getDiskChunks(disk, partitions, free):
 
     return chunks
 
+def getDiskGrowth(disk, partitions, free):
+    """ Return the total growth the requests on a disk would get.
+
+        :param disk: the disk
+        :type disk: :class:`~.devices.StorageDevice`
+        :param partitions: list of partitions
+        :type partitions: list of :class:`~.devices.PartitionDevice`
+        :param free: list of free regions
+        :type free: list of :class:`parted.Geometry`
+        :returns: the sum of the requests' growth, in sectors
+        :rtype: int
+
+        The growth is worked out on the chunks :func:`getDiskChunks` returns
+        for the disk. The partitions themselves are not changed.
+    """
+    log.debug("calculating growth for disk %s", disk.path)
+    disk_growth = 0 # in sectors
+    disk_sector_size = Size(disk.format.partedDevice.sectorSize)
+    for chunk in getDiskChunks(disk, partitions, free):
+        chunk.growRequests()
+        # record the growth for this layout
+        disk_growth += chunk.growth
+        for req in chunk.requests:
+            log.debug("request %d (%s) growth: %d (%s) size: %s",
+                      req.device.id, req.device.name, req.growth,
+                      sectorsToSize(req.growth, disk_sector_size),
+                      sectorsToSize(req.growth + req.base, disk_sector_size))
+
+    log.debug("disk %s growth: %d (%s)", disk.path, disk_growth,
+              sectorsToSize(disk_growth, disk_sector_size))
+    return disk_growth
+
 class TotalSizeSet(object):
     """ Set of device requests with a target combined size.
 
@@ -1737,6 +1974,7 @@ def growPartitions(disks, partitions, free, size_sets=None):
                 log.debug("setting %s new geometry: %s", name,
                                                          partition.geometry)
                 constraint = parted.Constraint(exactGeom=partition.geometry)
+                disklabel.recordState()
                 disklabel.partedDisk.addPartition(partition=partition,
                                                   constraint=constraint)
                 path = partition.path
@@ -1836,6 +2074,7 @@ def growLVM(storage):
         for lv in fatlvs:
             if lv in vg.thinpools:
                 # make sure the pool's base size is at least the sum of its lvs'
+                lv.recordState()
                 lv.req_size = max(lv.req_size, lv.usedSpace)
 
                 # add the required padding to the requested pool size
@@ -1852,6 +2091,7 @@ def growLVM(storage):
         for lv in percentage_based_lvs:
             new_extents = int(lv.req_percent * Decimal('0.01') * percentage_basis)
             # set req_size also so the request can also be growable if desired
+            lv.recordState()
             lv.size = lv.req_size = vg.peSize * new_extents
 
         # grow regular lvs
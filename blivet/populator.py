@@ -42,6 +42,7 @@ from .devices import MultipathDevice, OpticalDevice
 from .devices import PartitionDevice, ZFCPDiskDevice, iScsiDiskDevice
 from .devices import devicePathToName
 from . import formats
+from .formats.fs import FS
 from .devicelibs import lvm
 from .devicelibs import raid
 from . import udev
@@ -117,6 +118,14 @@ class Populator(object):
 
         self._cleanup = False
 
+        # filesystems whose probing has been put off until the tree has been
+        # built; see _probeFormats
+        self._deferredProbes = None
+
+        # device id -> udev data identifying the format the device had when
+        # it was last scanned; see handleUdevEvent
+        self._formatSignatures = {}
+
     def setDiskImages(self, images):
         """ Set the disk images and reflect them in exclusiveDisks.
 
@@ -608,7 +617,8 @@ class Populator(object):
 
     def addUdevDevice(self, info):
         name = udev.device_get_name(info)
-        log_method_call(self, name=name, info=pprint.pformat(dict(info)))
+        if log.isEnabledFor(logging.DEBUG):
+            log_method_call(self, name=name, info=pprint.pformat(dict(info)))
         uuid = udev.device_get_uuid(info)
         sysfs_path = udev.device_get_sysfs_path(info)
 
@@ -750,6 +760,7 @@ class Populator(object):
         if device_added:
             device.originalFormat = copy.copy(device.format)
         device.deviceLinks = udev.device_get_symlinks(info)
+        self._formatSignatures[device.id] = udev.device_get_format_signature(info)
 
     def handleUdevDiskLabelFormat(self, info, device):
         disklabel_type = udev.device_get_disklabel_type(info)
@@ -853,7 +864,8 @@ class Populator(object):
     def handleVgLvs(self, vg_device):
         """ Handle setup of the LV's in the vg_device. """
         vg_name = vg_device.name
-        lv_info = dict((k, v) for (k, v) in iter(self.devicetree.lvInfo.items())
+        lvm_info = self.devicetree.lvmInfo
+        lv_info = dict((k, v) for (k, v) in iter(lvm_info.lvs.items())
                                 if v.vg_name == vg_name)
 
         self.names.extend(n for n in lv_info.keys() if n not in self.names)
@@ -909,7 +921,7 @@ class Populator(object):
 
             if lv_attr[0] in 'Ss':
                 log.info("found lvm snapshot volume '%s'", name)
-                origin_name = blockdev.lvm.lvorigin(vg_name, lv_name)
+                origin_name = lvm_info.lvOrigin(vg_name, lv_name)
                 if not origin_name:
                     log.error("lvm snapshot '%s-%s' has unknown origin",
                                 vg_name, lv_name)
@@ -959,11 +971,11 @@ class Populator(object):
                 lv_class = LVMThinPoolDevice
             elif lv_attr[0] == 'V':
                 # thin volume
-                pool_name = blockdev.lvm.thlvpoolname(vg_name, lv_name)
+                pool_name = lvm_info.thinPoolName(vg_name, lv_name)
                 pool_device_name = "%s-%s" % (vg_name, pool_name)
                 addRequiredLV(pool_device_name, "failed to look up thin pool")
 
-                origin_name = blockdev.lvm.lvorigin(vg_name, lv_name)
+                origin_name = lvm_info.lvOrigin(vg_name, lv_name)
                 if origin_name:
                     origin_device_name = "%s-%s" % (vg_name, origin_name)
                     addRequiredLV(origin_device_name, "failed to locate origin lv")
@@ -1366,11 +1378,23 @@ class Populator(object):
             kwargs["uuid"] = info["ID_FS_UUID_SUB"]
             kwargs["volUUID"] = uuid
 
+        # only filesystems are probed
+        fmt_class = formats.get_device_format_class(format_designator)
+        if self._deferredProbes is not None and fmt_class and \
+           issubclass(fmt_class, FS):
+            kwargs["probe"] = False
+
         try:
             log.info("type detected on '%s' is '%s'", name, format_designator)
             device.format = formats.getFormat(format_designator, **kwargs)
             if device.format.type:
                 log.info("got format: %s", device.format)
+            if getattr(device.format, "needsProbe", False):
+                # the device has to be set up again to probe the filesystem
+                # once the tree has been torn down
+                device.format.probeDevice = device
+                if self._deferredProbes is not None:
+                    self._deferredProbes.append(device)
         except FSError:
             log.warning("type '%s' on '%s' invalid, assuming no format",
                       format_designator, name)
@@ -1402,6 +1426,119 @@ class Populator(object):
         info = udev.get_device(device.sysfsPath)
 
         self.handleUdevDeviceFormat(info, device)
+        self._formatSignatures[device.id] = udev.device_get_format_signature(info)
+
+    def handleUdevEvent(self, info, action=None):
+        """ Update the tree to reflect a udev event.
+
+            :param info: udev data for the device the event is about
+            :type info: :class:`pyudev.Device`
+            :keyword str action: "add", "change" or "remove" (default: the
+                                 event's own action)
+
+            Only the device the event is about and the devices that depend on
+            it are scanned again; the rest of the tree is left alone. Events
+            for devices with scheduled actions are ignored.
+        """
+        if action is None:
+            action = info.action
+
+        name = udev.device_get_name(info)
+        log_method_call(self, name=name, action=action)
+        if udev.device_is_blacklisted(info):
+            return
+
+        # lvm metadata may well have changed along with the device
+        self.devicetree.dropLVMCache()
+
+        device = self.devicetree.getDeviceBySysfsPath(udev.device_get_sysfs_path(info))
+        if device is None:
+            if action in ("add", "change"):
+                self.addUdevDevice(info)
+            return
+
+        affected = [device] + self.devicetree.getDependentDevices(device)
+        if any(self.devicetree.actions.find(device=d) for d in affected):
+            log.warning("ignoring %s event for %s, which has pending actions",
+                        action, name)
+            return
+
+        if action == "remove":
+            self._removeEventDevice(device)
+        elif action in ("add", "change"):
+            self._rescanEventDevice(info, device)
+        else:
+            log.debug("ignoring %s event for %s", action, name)
+
+    def _removeDependents(self, device):
+        """ Remove the devices built on device from the tree.
+
+            :returns: the devices that were removed and the devices that had
+                      been built upon along with device (eg: the other PVs of
+                      a VG)
+            :rtype: tuple of two lists of :class:`~.devices.StorageDevice`
+        """
+        dependents = self.devicetree.getDependentDevices(device)
+        members = []
+        for dependent in dependents:
+            for parent in dependent.parents:
+                if parent is not device and parent not in dependents and \
+                   parent not in members:
+                    members.append(parent)
+
+        for child in self.devicetree.getChildren(device):
+            if self.devicetree._isIndexed(child):
+                self.devicetree.recursiveRemove(child, actions=False)
+
+        return (dependents, members)
+
+    def _rescanMembers(self, members):
+        """ Scan the formats of devices whose container was removed again. """
+        for member in members:
+            if not self.devicetree._isIndexed(member):
+                continue
+
+            info = udev.get_device(member.sysfsPath)
+            if info:
+                self.handleUdevDeviceFormat(info, member)
+
+    def _removeEventDevice(self, device):
+        log.info("%s was removed", device.name)
+        (_dependents, members) = self._removeDependents(device)
+        if not device.formatImmutable:
+            device.format = None
+
+        self.devicetree._removeDevice(device, force=True)
+        self._formatSignatures.pop(device.id, None)
+        self._rescanMembers(members)
+
+    def _rescanEventDevice(self, info, device):
+        device.deviceLinks = udev.device_get_symlinks(info)
+        signature = udev.device_get_format_signature(info)
+        # partitions can be added and removed without changing the signature
+        # of the disklabel
+        if self._formatSignatures.get(device.id) == signature and \
+           device.format.type != "disklabel":
+            log.debug("format of %s has not changed", device.name)
+            return
+
+        log.info("format of %s has changed, scanning it again", device.name)
+        (dependents, members) = self._removeDependents(device)
+        paths = [d.sysfsPath for d in dependents if d.sysfsPath]
+
+        self.handleUdevDeviceFormat(info, device)
+        device.originalFormat = copy.copy(device.format)
+        self._formatSignatures[device.id] = signature
+        self._rescanMembers(members)
+
+        # add back the dependents that are still there
+        for path in paths:
+            if self.devicetree.getDeviceBySysfsPath(path):
+                continue
+
+            dependent_info = udev.get_device(path)
+            if dependent_info:
+                self.addUdevDevice(dependent_info)
 
     def _handleInconsistencies(self):
         for vg in [d for d in self.devicetree.devices if d.type == "lvmvg"]:
@@ -1533,11 +1670,15 @@ class Populator(object):
             self._cleanup = True
 
         parted.register_exn_handler(parted_exn_handler)
+        if flags.probe_threads > 1 and not flags.lazy_probe:
+            self._deferredProbes = []
+
         try:
             self._populate()
         except Exception:
             raise
         finally:
+            self._deferredProbes = None
             parted.clear_exn_handler()
             self.restoreConfigs()
 
@@ -1599,12 +1740,22 @@ class Populator(object):
             for dev in devices:
                 self.addUdevDevice(dev)
 
+        self._probeFormats()
         self.populated = True
 
         # After having the complete tree we make sure that the system
         # inconsistencies are ignored or resolved.
         self._handleInconsistencies()
 
+    def _probeFormats(self):
+        """ Run the probes that were put off while building the tree. """
+        if not self._deferredProbes:
+            return
+
+        devices = self._deferredProbes
+        self._deferredProbes = []
+        self.devicetree.probeFormats(devices)
+
     @property
     def names(self):
         return self.devicetree.names
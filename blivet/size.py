@@ -156,6 +156,10 @@ def parseUnits(spec, xlate):
 
     return None
 
+# results of parseSpec for English specs, hashed by spec and radix character
+_parsedSpecs = {}
+_PARSED_SPECS_MAX = 1024
+
 def parseSpec(spec):
     """ Parse string representation of size.
 
@@ -175,6 +179,11 @@ def parseSpec(spec):
 
     # Replace the localized radix character with a .
     radix = locale.nl_langinfo(locale.RADIXCHAR)
+    key = (spec, radix)
+    size = _parsedSpecs.get(key)
+    if size is not None:
+        return size
+
     if radix != '.':
         spec = spec.replace(radix, '.')
 
@@ -201,7 +210,12 @@ def parseSpec(spec):
     else:
         unit = parseUnits(spec_ascii, False)
         if unit is not None:
-            return size * unit.factor
+            size = size * unit.factor
+            # English specs mean the same in any language, so remember them
+            if len(_parsedSpecs) >= _PARSED_SPECS_MAX:
+                _parsedSpecs.clear()
+            _parsedSpecs[key] = size
+            return size
 
     # No English match found, try localized size specs.
     if six.PY2:
@@ -226,6 +240,7 @@ class Size(Decimal):
         Also generates human readable strings to a specified number of
         decimal places.
     """
+    __slots__ = ()
 
     def __new__(cls, value=0, context=None):
         """ Initialize a new Size object.  Must pass a bytes or a spec value
@@ -245,12 +260,15 @@ class Size(Decimal):
             If you want to use a spec value to represent a bytes value,
             you can use the letter 'b' or 'B' or omit the size specifier.
         """
-        if isinstance(value, (six.string_types, bytes)):
+        if isinstance(value, Size):
+            # already a whole number of bytes
+            return Decimal.__new__(cls, value=value, context=context)
+        elif isinstance(value, six.integer_types):
+            return Decimal.__new__(cls, value=value, context=context)
+        elif isinstance(value, (six.string_types, bytes)):
             size = parseSpec(value)
-        elif isinstance(value, (six.integer_types, float, Decimal)):
+        elif isinstance(value, (float, Decimal)):
             size = Decimal(value)
-        elif isinstance(value, Size):
-            size = Decimal(value.convertTo())
         else:
             raise ValueError("invalid value %s for size" % value)
 
@@ -272,25 +290,41 @@ class Size(Decimal):
     def __repr__(self):
         return "Size('%s')" % self
 
+    def __copy__(self):
+        return self
+
     def __deepcopy__(self, memo):
-        return Size(self.convertTo())
+        # pylint: disable=unused-argument
+        # Size instances are immutable, so copies can share them
+        return self
 
     # pickling support for Size
     # see https://docs.python.org/3/library/pickle.html#object.__reduce__
     def __reduce__(self):
         return (self.__class__, (self.convertTo(),))
 
+    # Sums, differences and products of whole numbers of bytes need no
+    # rounding, so they are computed on ints and only other operands go
+    # through Decimal.
     def __add__(self, other, context=None):
+        if isinstance(other, _WHOLE_TYPES):
+            return _fromInt(int(self) + int(other))
         return Size(Decimal.__add__(self, other))
 
     # needed to make sum() work with Size arguments
     def __radd__(self, other, context=None):
+        if isinstance(other, _WHOLE_TYPES):
+            return _fromInt(int(other) + int(self))
         return Size(Decimal.__radd__(self, other))
 
     def __sub__(self, other, context=None):
+        if isinstance(other, _WHOLE_TYPES):
+            return _fromInt(int(self) - int(other))
         return Size(Decimal.__sub__(self, other))
 
     def __mul__(self, other, context=None):
+        if isinstance(other, _WHOLE_TYPES):
+            return _fromInt(int(self) * int(other))
         return Size(Decimal.__mul__(self, other))
     __rmul__ = __mul__
 
@@ -416,3 +450,10 @@ class Size(Decimal):
 
         rounded = (Decimal(self) / factor).to_integral_value(rounding=rounding)
         return Size(rounded * factor)
+
+# operand types whose values are always whole numbers of bytes
+_WHOLE_TYPES = (Size,) + six.integer_types
+
+def _fromInt(value):
+    """ Return a :class:`Size` for a whole number of bytes. """
+    return Decimal.__new__(Size, value)
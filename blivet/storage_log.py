@@ -1,27 +1,63 @@
-import inspect
+import json
 import logging
 import sys
 import traceback
 
+from .flags import flags
+
 log = logging.getLogger("blivet")
 log.addHandler(logging.NullHandler())
 
+IGNORED_FUNCS = frozenset(["function_name_and_depth",
+                           "log_method_call",
+                           "log_method_return"])
+
 def function_name_and_depth():
-    IGNORED_FUNCS = ["function_name_and_depth",
-                     "log_method_call",
-                     "log_method_return"]
-    stack = inspect.stack()
+    """ Return the name of the calling function and the depth of the stack.
+
+        The functions of this module that log on behalf of their caller are
+        skipped.
+    """
+    frame = sys._getframe(1) # pylint: disable=protected-access
+    while frame is not None and frame.f_code.co_name in IGNORED_FUNCS:
+        frame = frame.f_back
 
-    for i, frame in enumerate(stack):
-        methodname = frame[3]
-        if methodname not in IGNORED_FUNCS:
-            return (methodname, len(stack) - i)
+    if frame is None:
+        return ("unknown function?", 0)
 
-    return ("unknown function?", 0)
+    methodname = frame.f_code.co_name
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+
+    return (methodname, depth)
+
+def _log_trace(event, classname, methodname, depth, data):
+    """ Log a method call or return as a JSON object. """
+    record = {"event": event, "class": classname, "method": methodname,
+              "depth": depth}
+    record.update(data)
+    log.debug("%s", json.dumps(record, sort_keys=True, default=str),
+              extra={"trace": record})
 
 def log_method_call(d, *args, **kwargs):
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+
     classname = d.__class__.__name__
     (methodname, depth) = function_name_and_depth()
+
+    for k, v in kwargs.items():
+        if "pass" in k.lower() and v:
+            kwargs[k] = "Skipped"
+
+    if flags.structured_trace:
+        _log_trace("call", classname, methodname, depth,
+                   {"args": ["%s" % a for a in args],
+                    "kwargs": dict((k, "%s" % v) for (k, v) in kwargs.items())})
+        return
+
     spaces = depth * ' '
     fmt = "%s%s.%s:"
     fmt_args = [spaces, classname, methodname]
@@ -32,15 +68,21 @@ def log_method_call(d, *args, **kwargs):
 
     for k, v in kwargs.items():
         fmt += " %s: %s ;"
-        if "pass" in k.lower() and v:
-            v = "Skipped"
         fmt_args.extend([k, v])
 
     log.debug(fmt, *fmt_args)
 
 def log_method_return(d, retval):
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+
     classname = d.__class__.__name__
     (methodname, depth) = function_name_and_depth()
+    if flags.structured_trace:
+        _log_trace("return", classname, methodname, depth,
+                   {"retval": "%s" % (retval,)})
+        return
+
     spaces = depth * ' '
     fmt = "%s%s.%s returned %s"
     fmt_args = (spaces, classname, methodname, retval)
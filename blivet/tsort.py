@@ -24,37 +24,47 @@ class CyclicGraphError(Exception):
     pass
 
 def tsort(graph):
+    """ Return the items of a graph in topological order.
+
+        :param dict graph: a graph as returned by :func:`create_graph`
+        :returns: the sorted items
+        :rtype: list
+        :raises: :class:`CyclicGraphError` if the graph contains cycles
+
+        This is Kahn's algorithm, so it runs in O(items + edges). The graph is
+        not modified.
+    """
     order = []  # sorted list of items
 
     if not graph or not graph['items']:
         return order
 
+    incoming = graph['incoming'].copy()
+
     # determine which nodes have no incoming edges
-    roots = [n for n in graph['items'] if graph['incoming'][n] == 0]
+    roots = [n for n in graph['items'] if incoming[n] == 0]
     if not roots:
         raise CyclicGraphError("no root nodes")
 
-    visited = []    # list of nodes visited, for cycle detection
+    visited = set()     # nodes visited, for cycle detection
     while roots:
         # remove a root, add it to the order
         root = roots.pop()
         if root in visited:
             raise CyclicGraphError("graph contains cycles")
 
-        visited.append(root)
+        visited.add(root)
         order.append(root)
         # remove each edge from the root to another node
-        for (parent, child) in [e for e in graph['edges'] if e[0] == root]:
-            graph['incoming'][child] -= 1
-            graph['edges'].remove((parent, child))
+        for child in graph['children'][root]:
+            incoming[child] -= 1
             # if destination node is now a root, add it to roots
-            if graph['incoming'][child] == 0:
+            if incoming[child] == 0:
                 roots.append(child)
 
     if len(graph['items']) != len(visited):
         raise CyclicGraphError("graph contains cycles")
 
-
     return order
 
 def create_graph(items, edges):
@@ -68,24 +78,29 @@ def create_graph(items, edges):
         Return Value:
 
             The return value is a dictionary representing the directed graph.
-            It has three keys:
+            It has four keys:
 
                 items is the same as the input argument of the same name
                 edges is the same as the input argument of the same name
                 incoming is a dict of incoming edge count hashed by item
+                children is a dict of lists of child items hashed by item,
+                    in the order the edges were given
 
     """
     graph = {'items': [],       # the items to sort
              'edges': [],       # partial order info: (parent, child) pairs
-             'incoming': {}}    # incoming edge count for each item
+             'incoming': {},    # incoming edge count for each item
+             'children': {}}    # adjacency lists: children of each item
 
     graph['items'] = items
     graph['edges'] = edges
     for item in items:
         graph['incoming'][item] = 0
+        graph['children'][item] = []
 
-    for (_parent, child) in edges:
+    for (parent, child) in edges:
         graph['incoming'][child] += 1
+        graph['children'][parent].append(child)
 
     return graph
 
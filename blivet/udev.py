@@ -23,6 +23,8 @@
 
 import os
 import re
+from collections import namedtuple
+from threading import Lock
 
 from . import util
 from .size import Size
@@ -51,11 +53,91 @@ def get_devices(subsystem="block"):
     return [d for d in global_udev.list_devices(subsystem=subsystem)
                         if not __is_blacklisted_blockdev(d.sys_name)]
 
-def settle():
-    # wait maximal 300 seconds for udev to be done running blkid, lvm,
-    # mdadm etc. This large timeout is needed when running on machines with
-    # lots of disks, or with slow disks
-    util.run_program(["udevadm", "settle", "--timeout=300"])
+def get_monitor(subsystem="block"):
+    """ Return a monitor for udev events on the global udev context.
+
+        :keyword str subsystem: the subsystem whose events to receive
+        :rtype: :class:`pyudev.Monitor`
+
+        Events are only queued once the monitor has been started, either
+        explicitly or by the first poll.
+    """
+    monitor = pyudev.Monitor.from_netlink(global_udev)
+    monitor.filter_by(subsystem)
+    return monitor
+
+SettleStats = namedtuple("SettleStats", ["requested", "executed"])
+
+class SettleCoordinator(object):
+    """ Runs udevadm settle only when there may be something to wait for.
+
+        The kernel numbers its uevents (/sys/kernel/uevent_seqnum). If no
+        uevent has been sent since the last settle, all of them have already
+        been handled by udev and there is no need to settle again. This
+        coalesces runs of settle requests with nothing in between them into
+        a single settle.
+    """
+    SEQNUM_FILE = "/sys/kernel/uevent_seqnum"
+
+    def __init__(self):
+        self.requested = 0
+        self.executed = 0
+        self._seqnum = None
+        self._lock = Lock()
+
+    @property
+    def stats(self):
+        """ How many settles were requested and how many were executed. """
+        return SettleStats(self.requested, self.executed)
+
+    def _currentSeqnum(self):
+        try:
+            with open(self.SEQNUM_FILE) as f:
+                return int(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+
+    def invalidate(self):
+        """ Make sure the next settle request is executed. """
+        with self._lock:
+            self._seqnum = None
+
+    def settle(self, force=False):
+        """ Wait for udev to handle all the uevents sent so far.
+
+            :keyword bool force: settle even if no new uevents have been sent
+        """
+        with self._lock:
+            self.requested += 1
+
+            # read the sequence number first; anything sent while settling
+            # will have to be waited for next time
+            seqnum = self._currentSeqnum()
+            if not force and seqnum is not None and seqnum == self._seqnum:
+                return
+
+            # wait maximal 300 seconds for udev to be done running blkid, lvm,
+            # mdadm etc. This large timeout is needed when running on machines
+            # with lots of disks, or with slow disks
+            rc = util.run_program(["udevadm", "settle", "--timeout=300"])
+            if rc != 0:
+                # udev may still be busy, so the next request has to settle
+                log.warning("udevadm settle failed with exit status %s", rc)
+                self._seqnum = None
+                return
+
+            self.executed += 1
+            self._seqnum = seqnum
+
+settle_coordinator = SettleCoordinator()
+
+def settle(force=False):
+    """ Wait for udev to handle all the uevents sent so far.
+
+        :keyword bool force: settle even if no uevents have been sent since
+                             the last settle
+    """
+    settle_coordinator.settle(force=force)
 
 def trigger(subsystem=None, action="add", name=None):
     argv = ["trigger", "--action=%s" % action]
@@ -137,6 +219,10 @@ def __is_blacklisted_blockdev(dev_name):
 
     return False
 
+def device_is_blacklisted(info):
+    """ Is this a device get_devices leaves out? """
+    return __is_blacklisted_blockdev(info.sys_name)
+
 # These are functions for retrieving specific pieces of information from
 # udev database entries.
 def device_get_name(udev_info):
@@ -167,6 +253,17 @@ def device_get_label(udev_info):
     """ Get the label from the device's format as reported by udev. """
     return udev_info.get("ID_FS_LABEL")
 
+def device_get_format_signature(info):
+    """ Return the udev data that identifies a device's formatting.
+
+        If this changes, the device has been reformatted (or had its
+        partition table replaced) since the data was first read.
+    """
+    return tuple(info.get(key) for key in ("ID_FS_TYPE", "ID_FS_UUID",
+                                           "ID_FS_UUID_SUB", "ID_FS_LABEL",
+                                           "ID_PART_TABLE_TYPE",
+                                           "ID_PART_TABLE_UUID"))
+
 def device_is_dm(info):
     """ Return True if the device is a device-mapper device. """
     dm_dir = os.path.join(device_get_sysfs_path(info), "dm")
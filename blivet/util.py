@@ -21,57 +21,75 @@ import logging
 log = logging.getLogger("blivet")
 program_log = logging.getLogger("program")
 
-from threading import Lock
+from threading import Lock, Thread
 # this will get set to anaconda's program_log_lock in enable_installer_mode
 program_log_lock = Lock()
 
 
 def _run_program(argv, root='/', stdin=None, env_prune=None, stderr_to_stdout=False, binary_output=False):
+    """ Run a program and return its exit code and output.
+
+        The program is run without holding program_log_lock, so programs can
+        run concurrently in separate threads. The command line is logged
+        before the program is started. Its output is buffered and logged
+        along with the exit code in one block, while holding the lock, once
+        it has exited.
+
+        .. note::
+
+            Running a program in a chroot uses a preexec_fn, which is not
+            safe while other threads are running. Programs that run from
+            several threads at once should not use the root argument.
+    """
     if env_prune is None:
         env_prune = []
 
     def chroot():
-        if root and root != '/':
-            os.chroot(root)
+        os.chroot(root)
+
+    env = os.environ.copy()
+    env.update({"LC_ALL": "C",
+                "INSTALL_PATH": root})
+    for var in env_prune:
+        env.pop(var, None)
+
+    if stderr_to_stdout:
+        stderr_dir = subprocess.STDOUT
+    else:
+        stderr_dir = subprocess.PIPE
 
     with program_log_lock:
         program_log.info("Running... %s", " ".join(argv))
 
-        env = os.environ.copy()
-        env.update({"LC_ALL": "C",
-                    "INSTALL_PATH": root})
-        for var in env_prune:
-            env.pop(var, None)
-
-        if stderr_to_stdout:
-            stderr_dir = subprocess.STDOUT
-        else:
-            stderr_dir = subprocess.PIPE
-        try:
-            proc = subprocess.Popen(argv,
-                                    stdin=stdin,
-                                    stdout=subprocess.PIPE,
-                                    stderr=stderr_dir,
-                                    close_fds=True,
-                                    preexec_fn=chroot, cwd=root, env=env)
-
-            out, err = proc.communicate()
-            if not binary_output and six.PY3:
-                out = out.decode("utf-8")
-            if out:
-                if not stderr_to_stdout:
-                    program_log.info("stdout:")
-                for line in out.splitlines():
-                    program_log.info("%s", line)
-
-            if not stderr_to_stdout and err:
-                program_log.info("stderr:")
-                for line in err.splitlines():
-                    program_log.info("%s", line)
-
-        except OSError as e:
+    try:
+        proc = subprocess.Popen(argv,
+                                stdin=stdin,
+                                stdout=subprocess.PIPE,
+                                stderr=stderr_dir,
+                                close_fds=True,
+                                preexec_fn=chroot if root and root != '/' else None,
+                                cwd=root, env=env)
+
+        out, err = proc.communicate()
+    except OSError as e:
+        with program_log_lock:
             program_log.error("Error running %s: %s", argv[0], e.strerror)
-            raise
+        raise
+
+    if not binary_output and six.PY3:
+        out = out.decode("utf-8")
+
+    with program_log_lock:
+        if out:
+            if not stderr_to_stdout:
+                program_log.info("stdout:")
+            for line in out.splitlines():
+                program_log.info("%s", line)
+
+        if not stderr_to_stdout and err:
+            program_log.info("stderr:")
+            for line in err.splitlines():
+                program_log.info("%s", line)
 
         program_log.debug("Return code: %d", proc.returncode)
 
@@ -94,6 +112,24 @@ def run_program_and_capture_output_binary(*args, **kwargs):
     kwargs["binary_output"] = True
     return _run_program(*args, **kwargs)
 
+def run_programs(argvs, max_workers=None, **kwargs):
+    """ Run several programs concurrently.
+
+        :param argvs: the command lines of the programs to run
+        :type argvs: iterable of lists of str
+        :keyword int max_workers: the maximum number of programs to run at once
+                                  (default: :data:`PARALLEL_MAP_WORKERS`)
+        :returns: the exit code and output of each program, in the order of
+                  the command lines
+        :rtype: list of (int, str) tuples
+
+        Any other keyword arguments are passed to each program's run, as for
+        :func:`run_program_and_capture_output`. The output of each program is
+        logged separately, as a whole.
+    """
+    return parallel_map(lambda argv: _run_program(argv, **kwargs), argvs,
+                        max_workers=max_workers)
+
 def mount(device, mountpoint, fstype, options=None):
     if options is None:
         options = "defaults"
@@ -399,6 +435,163 @@ class ObjectID(object):
         self.id = self._newid_gen() # pylint: disable=attribute-defined-outside-init
         return self
 
+class WatcherList(list):
+    """ A list of callbacks that is not carried over to copies.
+
+        Objects use this to hold functions registered by whoever is
+        interested in changes to them (eg: the device tree's lookup indexes).
+        Copies of the object start out unwatched; it is up to the owner of the
+        copy to register again if it wants to be notified.
+    """
+    def __copy__(self):
+        return self.__class__()
+
+    def __deepcopy__(self, memo):
+        return self.__class__()
+
+    def notify(self, *args):
+        """ Call each of the registered functions with the given arguments. """
+        for func in list(self):
+            func(*args)
+
+class UndoJournal(object):
+    """ A record of changes to a set of objects, from which they can be undone.
+
+        Each device tree has a journal of its own (see
+        :meth:`~.devicetree.DeviceTree.checkpoint`), which the objects in the
+        tree refer to. While the journal is recording (see :meth:`start`),
+        the methods that change one of these objects call :meth:`record`
+        first, which saves the object's state unless it has already been
+        saved.
+
+        The saved state of an object is a copy of its attributes, including
+        the contents of any list, dict or set among them. The classes whose
+        instances hold other mutable state, like a parted.Disk, name the
+        attributes in question in a _journalDuplicate attribute; the
+        duplicate() method of these attributes' values is used to save them.
+        Functions registered in a :class:`WatcherList` are not considered
+        part of an object's state.
+
+        Recordings can be nested. Whatever an inner recording has saved is
+        passed on to the outer one when the inner one is finished with.
+
+        Copies of a journal start out empty, so that the objects in a copy of
+        a device tree record their changes in the copy's journal only.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._recordings = []  # innermost last; id(obj) -> saved state
+
+    def __copy__(self):
+        return self.__class__()
+
+    def __deepcopy__(self, memo):
+        return self.__class__()
+
+    @property
+    def recording(self):
+        """ whether changes are being recorded """
+        return bool(self._recordings)
+
+    def start(self):
+        """ Start recording changes.
+
+            :returns: the new recording, to be passed to either :meth:`close`
+                      or :meth:`undo`
+            :rtype: dict
+        """
+        recording = {}
+        with self._lock:
+            self._recordings.append(recording)
+
+        return recording
+
+    def record(self, obj, attrs=None):
+        """ Save an object's state if changes are being recorded.
+
+            :param obj: the object about to be changed
+            :keyword attrs: the names of the attributes that make up the state
+                            (default: all of them)
+            :type attrs: iterable of str
+        """
+        if not self._recordings:
+            return
+
+        with self._lock:
+            if not self._recordings:
+                return
+
+            recording = self._recordings[-1]
+            if id(obj) not in recording:
+                recording[id(obj)] = self._save(obj, attrs)
+
+    @staticmethod
+    def _save(obj, attrs):
+        if attrs is None:
+            values = dict(obj.__dict__)
+        else:
+            values = dict((a, obj.__dict__[a]) for a in attrs
+                          if a in obj.__dict__)
+
+        for attr in getattr(obj, "_journalDuplicate", ()):
+            if values.get(attr) is not None:
+                values[attr] = values[attr].duplicate()
+
+        contents = []
+        for value in values.values():
+            if isinstance(value, WatcherList):
+                continue
+            elif isinstance(value, (list, dict, set)):
+                contents.append((value, copy.copy(value)))
+
+        return (obj, values, contents, attrs is None)
+
+    def _finish(self, recording):
+        """ Stop a recording, which has to be the innermost one. """
+        if not self._recordings or self._recordings[-1] is not recording:
+            raise ValueError("recordings must be finished innermost first")
+
+        self._recordings.pop()
+
+    def close(self, recording):
+        """ Stop a recording and keep the changes made since it started.
+
+            :param recording: the recording, as returned by :meth:`start`
+        """
+        with self._lock:
+            self._finish(recording)
+            if self._recordings:
+                outer = self._recordings[-1]
+                for (key, entry) in recording.items():
+                    outer.setdefault(key, entry)
+
+    def undo(self, recording):
+        """ Stop a recording and restore the saved objects' states.
+
+            :param recording: the recording, as returned by :meth:`start`
+        """
+        with self._lock:
+            self._finish(recording)
+
+        for (obj, values, contents, everything) in recording.values():
+            for (container, saved) in contents:
+                if isinstance(container, list):
+                    container[:] = saved
+                else:
+                    container.clear()
+                    container.update(saved)
+
+            current = obj.__dict__
+            if everything:
+                for attr in list(current.keys()):
+                    if attr not in values and \
+                       not isinstance(current[attr], WatcherList):
+                        del current[attr]
+
+            for (attr, value) in values.items():
+                if not isinstance(value, WatcherList):
+                    current[attr] = value
+
 def canonicalize_UUID(a_uuid):
     """ Converts uuids to canonical form.
 
@@ -620,3 +813,57 @@ def eintr_retry_call(func, *args):
             if e.errno == errno.EINTR:
                 continue
             raise
+
+# the number of threads parallel_map runs at most unless told otherwise
+PARALLEL_MAP_WORKERS = 8
+
+def parallel_map(func, items, max_workers=PARALLEL_MAP_WORKERS):
+    """ Call func on every item, using up to max_workers threads.
+
+        :param func: the function to call
+        :type func: callable taking one item
+        :param items: the items to pass to func
+        :type items: iterable
+        :keyword int max_workers: the maximum number of threads to run at once
+                                  (default: :data:`PARALLEL_MAP_WORKERS`)
+        :returns: func's return values, in the order of the items
+        :rtype: list
+
+        If any of the calls raises an exception, the exception raised for the
+        first such item is re-raised once all calls have finished.
+    """
+    items = list(items)
+    workers = min(max_workers or PARALLEL_MAP_WORKERS, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    pending = iter(enumerate(items))
+    pending_lock = Lock()
+
+    def worker():
+        while True:
+            with pending_lock:
+                try:
+                    (idx, item) = next(pending)
+                except StopIteration:
+                    return
+
+            try:
+                results[idx] = func(item)
+            except Exception: # pylint: disable=broad-except
+                errors[idx] = sys.exc_info()
+
+    threads = [Thread(target=worker) for _i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            six.reraise(*error)
+
+    return results
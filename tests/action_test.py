@@ -1,6 +1,10 @@
 #!/usr/bin/python
 
+import functools
+import threading
+import time
 import unittest
+from mock import patch
 
 from tests.storagetestcase import StorageTestCase
 import blivet
@@ -8,6 +12,7 @@ from blivet.formats import getFormat
 from blivet.size import Size
 
 # device classes for brevity's sake -- later on, that is
+from blivet.devices import StorageDevice
 from blivet.devices import DiskDevice
 from blivet.devices import PartitionDevice
 from blivet.devices import MDRaidArrayDevice
@@ -23,6 +28,9 @@ from blivet.deviceaction import ActionResizeFormat
 from blivet.deviceaction import ActionDestroyFormat
 from blivet.deviceaction import ActionAddMember
 from blivet.deviceaction import ActionRemoveMember
+from blivet.actionlist import ActionList
+from blivet.errors import StorageError
+from blivet.flags import flags
 
 class DeviceActionTestCase(StorageTestCase):
     """ DeviceActionTestSuite """
@@ -1154,6 +1162,165 @@ class DeviceActionTestCase(StorageTestCase):
         """ Verify correct functioning of action sorting. """
         pass
 
+class ActionListTestCase(unittest.TestCase):
+    """ ActionList pruning and sorting """
+
+    def testPrune(self):
+        disk = StorageDevice("sda", size=Size("10 GiB"), exists=True,
+                             fmt=getFormat("ext4", exists=True))
+        destroy_format = ActionDestroyFormat(disk)
+        destroy_format.apply()
+        create_xfs = ActionCreateFormat(disk, getFormat("xfs"))
+        create_xfs.apply()
+        create_ext4 = ActionCreateFormat(disk, getFormat("ext4"))
+        create_ext4.apply()
+
+        disk2 = StorageDevice("sdb", size=Size("10 GiB"), exists=True,
+                              fmt=getFormat("lvmpv", exists=True))
+        vg = LVMVolumeGroupDevice("vg", parents=[disk2], exists=True)
+        lv = LVMLogicalVolumeDevice("lv", parents=[vg], size=Size("1 GiB"))
+        lv_actions = [ActionCreateDevice(lv),
+                      ActionCreateFormat(lv, getFormat("xfs")),
+                      ActionDestroyDevice(lv)]
+
+        action_list = ActionList()
+        for action in [destroy_format, lv_actions[0], create_xfs,
+                       lv_actions[1], create_ext4, lv_actions[2]]:
+            action_list.append(action)
+
+        action_list.prune()
+
+        # destroying a non-existent lv cancels everything done to it, and
+        # only the last format create on the disk is kept
+        self.assertEqual(list(action_list), [destroy_format, create_ext4])
+
+    def _checkOrder(self, actions):
+        for (i, action) in enumerate(actions):
+            for later in actions[i+1:]:
+                self.assertFalse(action.requires(later),
+                                 "%s requires %s" % (action, later))
+
+    def testSort(self):
+        actions = []
+        for i in range(10):
+            disk = StorageDevice("sd%d" % i, size=Size("10 GiB"), exists=True,
+                                 fmt=getFormat("ext4", exists=True))
+            group = [ActionDestroyFormat(disk),
+                     ActionCreateFormat(disk, getFormat("lvmpv"))]
+            for action in group:
+                action.apply()
+
+            vg = LVMVolumeGroupDevice("vg%d" % i, parents=[disk])
+            lv = LVMLogicalVolumeDevice("lv", parents=[vg], size=Size("1 GiB"))
+            group += [ActionCreateDevice(vg), ActionCreateDevice(lv),
+                      ActionCreateFormat(lv, getFormat("xfs"))]
+            actions.extend(group)
+
+        # a resize of an existing lv
+        disk = StorageDevice("sdx", size=Size("10 GiB"), exists=True,
+                             fmt=getFormat("lvmpv", exists=True))
+        vg = LVMVolumeGroupDevice("vgx", parents=[disk], exists=True)
+        lv = LVMLogicalVolumeDevice("lvx", parents=[vg], size=Size("1 GiB"),
+                                    exists=True)
+        actions.append(ActionResizeDevice(lv, Size("2 GiB")))
+
+        action_list = ActionList()
+        for action in reversed(actions):
+            action_list.append(action)
+
+        action_list.sort()
+        order = list(action_list)
+        self.assertEqual(len(order), len(actions))
+        self.assertEqual(set(order), set(actions))
+        self._checkOrder(order)
+
+        # every destroy comes before every resize, every resize before
+        # every create
+        types = [a.type for a in order]
+        self.assertEqual(types, sorted(types, reverse=True))
+
+    def _diskActions(self, n_disks):
+        actions = []
+        for i in range(n_disks):
+            disk = StorageDevice("sd%d" % i, size=Size("10 GiB"), exists=True,
+                                 fmt=getFormat("ext4", exists=True))
+            group = [ActionDestroyFormat(disk),
+                     ActionCreateFormat(disk, getFormat("lvmpv"))]
+            for action in group:
+                action.apply()
+
+            vg = LVMVolumeGroupDevice("vg%d" % i, parents=[disk])
+            lv = LVMLogicalVolumeDevice("lv", parents=[vg], size=Size("1 GiB"))
+            group += [ActionCreateDevice(vg), ActionCreateDevice(lv),
+                      ActionCreateFormat(lv, getFormat("xfs"))]
+            for action in group[2:]:
+                action.apply()
+
+            actions.extend(group)
+
+        return actions
+
+    def testProcessParallel(self):
+        actions = self._diskActions(4)
+        action_list = ActionList()
+        for action in actions:
+            action_list.append(action)
+
+        lock = threading.Lock()
+        running = []
+        max_running = [0]
+        executed = []
+
+        def disks(action):
+            return set(d for d in action.device.ancestors if not d.parents)
+
+        def execute(action, callbacks=None):
+            with lock:
+                # nothing else is using the same disk
+                for other in running:
+                    self.assertFalse(disks(action) & disks(other))
+
+                running.append(action)
+                max_running[0] = max(max_running[0], len(running))
+
+            time.sleep(0.01)
+            with lock:
+                running.remove(action)
+                executed.append(action)
+
+        with patch.object(flags, "action_threads", 4):
+            for action in actions:
+                action.execute = functools.partial(execute, action)
+
+            action_list.process()
+
+        self.assertEqual(list(action_list), [])
+        self.assertEqual(len(executed), len(actions))
+        self._checkOrder(executed)
+        self.assertTrue(max_running[0] > 1)
+
+    def testProcessParallelFailure(self):
+        actions = self._diskActions(2)
+        action_list = ActionList()
+        for action in actions:
+            action_list.append(action)
+
+        def execute(action, callbacks=None):
+            if action is actions[1]:
+                raise StorageError("failed")
+
+        with patch.object(flags, "action_threads", 4):
+            for action in actions:
+                action.execute = functools.partial(execute, action)
+
+            self.assertRaises(StorageError, action_list.process)
+
+        # nothing that requires the failed action was executed
+        remaining = list(action_list)
+        self.assertIn(actions[1], remaining)
+        for action in actions[2:5]:
+            self.assertIn(action, remaining)
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+""" Benchmark for :meth:`blivet.actionlist.ActionList.sort`.
+
+    Usage: PYTHONPATH=. python tests/benchmarks/action_sort.py [count] [--pairwise]
+
+    Each group of five actions reformats an existing disk as an LVM PV and
+    creates a VG with one formatted LV on it, so the default count of 10000
+    actions means 2000 disks. With --pairwise the O(n^2) sort that compares
+    every pair of actions is timed as well; keep the count low for that.
+"""
+
+import sys
+import time
+
+from blivet.actionlist import ActionList
+from blivet.deviceaction import ActionCreateDevice, ActionCreateFormat
+from blivet.deviceaction import ActionDestroyFormat
+from blivet.devices import StorageDevice
+from blivet.devices import LVMVolumeGroupDevice, LVMLogicalVolumeDevice
+from blivet.formats import getFormat
+from blivet.size import Size
+from blivet import tsort
+
+def make_actions(count):
+    actions = []
+    for i in range(count // 5):
+        disk = StorageDevice("bench%d" % i, size=Size("100 GiB"), exists=True,
+                             fmt=getFormat("ext4", exists=True))
+        group = [ActionDestroyFormat(disk),
+                 ActionCreateFormat(disk, getFormat("lvmpv"))]
+        for action in group:
+            action.apply()
+
+        vg = LVMVolumeGroupDevice("benchvg%d" % i, parents=[disk])
+        lv = LVMLogicalVolumeDevice("lv", parents=[vg], size=Size("10 GiB"))
+        group += [ActionCreateDevice(vg),
+                  ActionCreateDevice(lv),
+                  ActionCreateFormat(lv, getFormat("ext4"))]
+        actions.extend(group)
+
+    # present them in the reverse of a valid order
+    actions.reverse()
+    return actions
+
+def pairwise_sort(actions):
+    """ Sort actions by checking every pair, as ActionList.sort used to. """
+    edges = []
+    for (action_idx, action) in enumerate(actions):
+        for (child_idx, child) in enumerate(actions):
+            if child is not action and child.requires(action):
+                edges.append((action_idx, child_idx))
+
+    graph = tsort.create_graph(list(range(len(actions))), edges)
+    return [actions[idx] for idx in tsort.tsort(graph)]
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    count = int(args[0]) if args else 10000
+
+    actions = make_actions(count)
+    action_list = ActionList()
+    for action in actions:
+        action_list.append(action)
+
+    start = time.time()
+    action_list.sort()
+    print("ActionList.sort: %d actions in %.3fs" % (len(actions),
+                                                    time.time() - start))
+
+    if "--pairwise" in sys.argv:
+        start = time.time()
+        pairwise_sort(actions)
+        print("pairwise sort:   %d actions in %.3fs" % (len(actions),
+                                                        time.time() - start))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+""" Benchmark for :func:`blivet.partitioning.allocatePartitions`.
+
+    Usage: PYTHONPATH=. python tests/benchmarks/allocate_partitions.py [disks]
+
+    Three growable partitions per disk are allocated on sparse-file disks with
+    empty gpt disklabels, each partition free to go on any of the disks. The
+    time taken and the number of times a disk's growth had to be worked out
+    (calls to getDiskChunks) are reported. Run it in an older tree to compare.
+"""
+
+import os
+import sys
+import time
+
+from mock import Mock, patch
+
+from blivet import partitioning
+from blivet.devices import DiskFile, PartitionDevice
+from blivet.formats import getFormat
+from blivet.size import Size
+from blivet.util import create_sparse_tempfile
+
+def main():
+    args = sys.argv[1:]
+    count = int(args[0]) if args else 20
+
+    paths = [create_sparse_tempfile("allocbench%d" % i, Size("100 GiB"))
+             for i in range(count)]
+    try:
+        disks = []
+        for path in paths:
+            disk = DiskFile(path)
+            disk.format = getFormat("disklabel", device=disk.path,
+                                    labelType="gpt", exists=False)
+            disks.append(disk)
+
+        partitions = [PartitionDevice("p%d" % i, grow=True,
+                                      size=Size("%d GiB" % (1 + i % 5)))
+                      for i in range(count * 3)]
+        free = partitioning.getFreeRegions(disks)
+        storage = Mock(bootDisk=None, compareDisksKey=lambda d: d.name)
+
+        chunks = Mock(wraps=partitioning.getDiskChunks)
+        with patch("blivet.partitioning.getDiskChunks", chunks):
+            start = time.time()
+            partitioning.allocatePartitions(storage, disks, partitions, free)
+            elapsed = time.time() - start
+
+        print("%d partitions on %d disks: %.3fs, %d disks' growth worked out"
+              % (len(partitions), count, elapsed, chunks.call_count))
+    finally:
+        for path in paths:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
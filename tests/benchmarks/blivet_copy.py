@@ -0,0 +1,80 @@
+#!/usr/bin/python
+""" Benchmark for :meth:`blivet.Blivet.copy`.
+
+    Usage: PYTHONPATH=. python tests/benchmarks/blivet_copy.py [disks]
+
+    The tree holds an existing LVM PV with a VG and two LVs on each disk, as
+    many as there are disks (500 by default), with the LVM report of a
+    system that has all of them. The time a copy takes is measured, and then
+    the memory another copy allocates, with :mod:`tracemalloc`.
+"""
+
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from blivet import Blivet
+from blivet.devices import StorageDevice
+from blivet.devices import LVMVolumeGroupDevice, LVMLogicalVolumeDevice
+from blivet.formats import getFormat
+from blivet.size import Size
+
+PVData = namedtuple("PVData", ["pv_name", "pv_uuid", "vg_name", "vg_uuid",
+                               "vg_size", "vg_free", "vg_extent_size",
+                               "vg_extent_count", "vg_free_count",
+                               "vg_pv_count"])
+LVData = namedtuple("LVData", ["vg_name", "lv_name", "uuid", "attr", "size",
+                               "segtype"])
+
+def make_storage(count):
+    storage = Blivet()
+    tree = storage.devicetree
+    pvs = {}
+    lvs = {}
+    for i in range(count):
+        disk = StorageDevice("bench%d" % i, size=Size("100 GiB"), exists=True,
+                             fmt=getFormat("lvmpv", exists=True))
+        vg = LVMVolumeGroupDevice("benchvg%d" % i, parents=[disk], exists=True)
+        tree._addDevice(disk)
+        tree._addDevice(vg)
+        pvs[disk.path] = PVData(disk.path, "pv-uuid-%d" % i, vg.name,
+                                "vg-uuid-%d" % i, "107369988096",
+                                "85895151616", "4194304", "25599", "20479",
+                                "1")
+        for name in ("root", "home"):
+            lv = LVMLogicalVolumeDevice(name, parents=[vg], exists=True,
+                                        size=Size("10 GiB"),
+                                        fmt=getFormat("ext4", exists=True))
+            tree._addDevice(lv)
+            lvs[lv.name] = LVData(vg.name, name, "lv-uuid-%s-%d" % (name, i),
+                                  "-wi-a-----", "10737418240", "linear")
+
+    # pylint: disable=protected-access
+    tree.lvmInfo._pvs = pvs
+    tree.lvmInfo._lvs = lvs
+    return storage
+
+def main():
+    args = sys.argv[1:]
+    count = int(args[0]) if args else 500
+
+    storage = make_storage(count)
+
+    start = time.time()
+    new = storage.copy()
+    copy_time = time.time() - start
+
+    # tracing slows the copy down, so the memory is measured separately
+    tracemalloc.start()
+    storage.copy()
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(new.devicetree.devices) == len(storage.devicetree.devices)
+    print("%d devices: copy %.3fs, %.1f MiB allocated (peak %.1f MiB)"
+          % (len(storage.devicetree.devices), copy_time,
+             current / 1024.0 / 1024, peak / 1024.0 / 1024))
+
+if __name__ == "__main__":
+    main()
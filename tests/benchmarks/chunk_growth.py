@@ -0,0 +1,49 @@
+#!/usr/bin/python
+""" Benchmark for :meth:`blivet.partitioning.Chunk.growRequests`.
+
+    Usage: PYTHONPATH=. python tests/benchmarks/chunk_growth.py [requests]
+
+    A chunk of 40000 units per request is split between growable requests of
+    assorted base sizes, most of which have a maximum size. The growth is
+    timed for growRequests and for the iterative algorithm it replaced (see
+    legacyGrowRequests in tests/partitioning_test.py).
+"""
+
+import random
+import sys
+import time
+
+from mock import Mock
+
+from blivet.partitioning import Chunk, Request
+
+from tests.partitioning_test import legacyGrowRequests
+
+def make_chunk(count):
+    rand = random.Random(count)
+    requests = []
+    for i in range(count):
+        dev = Mock(req_grow=True, id=i)
+        dev.name = "lv%d" % i
+        req = Request(dev)
+        req.base = rand.randint(256, 25600)
+        if i % 10:
+            req.max_growth = rand.randint(1, 4 * req.base)
+        requests.append(req)
+
+    return Chunk(count * 40000, requests=requests)
+
+def main():
+    args = sys.argv[1:]
+    count = int(args[0]) if args else 1000
+
+    for (name, grow) in (("growRequests", Chunk.growRequests),
+                         ("legacy", legacyGrowRequests)):
+        chunk = make_chunk(count)
+        start = time.time()
+        grow(chunk)
+        print("%-12s %d requests: %.3fs (%d units grown)"
+              % (name, count, time.time() - start, chunk.growth))
+
+if __name__ == "__main__":
+    main()
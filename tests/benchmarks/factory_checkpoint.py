@@ -0,0 +1,72 @@
+#!/usr/bin/python
+""" Benchmark for :meth:`blivet.devicetree.DeviceTree.checkpoint`.
+
+    Usage: PYTHONPATH=. python tests/benchmarks/factory_checkpoint.py [disks]
+
+    The tree holds an existing LVM PV with a VG and two LVs on each disk, as
+    many as there are disks (500 by default). The change made between saving
+    and reverting the tree is the kind a device factory makes: an LV is added
+    to one of the VGs. The full copy of the Blivet instance that factories
+    used to take is timed against a checkpoint of the tree, and reverting the
+    change is timed for the checkpoint.
+"""
+
+import sys
+import time
+
+from blivet import Blivet
+from blivet.deviceaction import ActionCreateDevice
+from blivet.devices import StorageDevice
+from blivet.devices import LVMVolumeGroupDevice, LVMLogicalVolumeDevice
+from blivet.formats import getFormat
+from blivet.size import Size
+
+def make_storage(count):
+    storage = Blivet()
+    tree = storage.devicetree
+    for i in range(count):
+        disk = StorageDevice("bench%d" % i, size=Size("100 GiB"), exists=True,
+                             fmt=getFormat("lvmpv", exists=True))
+        vg = LVMVolumeGroupDevice("benchvg%d" % i, parents=[disk], exists=True)
+        tree._addDevice(disk)
+        tree._addDevice(vg)
+        for name in ("root", "home"):
+            lv = LVMLogicalVolumeDevice(name, parents=[vg], exists=True,
+                                        size=Size("10 GiB"),
+                                        fmt=getFormat("ext4", exists=True))
+            tree._addDevice(lv)
+
+    return storage
+
+def change(storage):
+    vg = storage.devicetree.getDeviceByName("benchvg0")
+    lv = LVMLogicalVolumeDevice("new", parents=[vg], size=Size("10 GiB"),
+                                fmt=getFormat("xfs"))
+    storage.devicetree.registerAction(ActionCreateDevice(lv))
+
+def main():
+    args = sys.argv[1:]
+    count = int(args[0]) if args else 500
+
+    storage = make_storage(count)
+
+    start = time.time()
+    storage.copy()
+    copy_time = time.time() - start
+
+    start = time.time()
+    checkpoint = storage.devicetree.checkpoint()
+    change(storage)
+    change_time = time.time() - start
+
+    start = time.time()
+    storage.devicetree.revertCheckpoint(checkpoint)
+    revert_time = time.time() - start
+
+    assert storage.devicetree.getDeviceByName("benchvg0-new") is None
+    print("%d devices: copy %.3fs, checkpoint and change %.3fs, "
+          "revert %.3fs" % (len(storage.devicetree.devices), copy_time,
+                            change_time, revert_time))
+
+if __name__ == "__main__":
+    main()
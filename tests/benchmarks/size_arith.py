@@ -0,0 +1,99 @@
+#!/usr/bin/python
+""" Benchmark for :class:`blivet.size.Size` arithmetic and parsing.
+
+    Usage: PYTHONPATH=. python tests/benchmarks/size_arith.py [requests]
+
+    The workload resembles the growth of partition and LV requests during
+    allocation: each pass hands out a share of a free pool to every request,
+    clamps it to the request's maximum size and returns the excess to the
+    pool. It is timed for Size and for DecimalSize, a copy of Size's
+    arithmetic as it was before the whole-byte fast paths were added, which
+    builds every result by way of a Decimal. Parsing of size specs is timed
+    the same way, with and without the cache of parsed specs.
+"""
+
+import sys
+import time
+from decimal import Decimal, ROUND_DOWN
+
+from blivet import size
+from blivet.size import Size
+
+def uncached_parseSpec(spec):
+    """ parseSpec without its cache of parsed specs. """
+    size._parsedSpecs.clear()
+    return size.parseSpec(spec)
+
+class DecimalSize(Decimal):
+    """ Size's constructor and arithmetic without the fast paths. """
+    def __new__(cls, value=0, context=None):
+        if isinstance(value, str):
+            value = uncached_parseSpec(value)
+        else:
+            value = Decimal(value)
+
+        value = value.to_integral_value(rounding=ROUND_DOWN)
+        return Decimal.__new__(cls, value=value, context=context)
+
+    def __add__(self, other, context=None):
+        return DecimalSize(Decimal.__add__(self, other))
+
+    def __radd__(self, other, context=None):
+        return DecimalSize(Decimal.__radd__(self, other))
+
+    def __sub__(self, other, context=None):
+        return DecimalSize(Decimal.__sub__(self, other))
+
+    def __mul__(self, other, context=None):
+        return DecimalSize(Decimal.__mul__(self, other))
+    __rmul__ = __mul__
+
+    def __floordiv__(self, other, context=None):
+        return DecimalSize(Decimal.__floordiv__(self, other))
+
+def grow(cls, count, passes=20):
+    """ Grow count requests from a shared pool, like Chunk.growRequests. """
+    bases = [cls("%d MiB" % (100 + i % 400)) for i in range(count)]
+    maxes = [base * 4 if i % 3 else cls(0) for (i, base) in enumerate(bases)]
+    growth = [cls(0)] * count
+    pool = cls("2 TiB") - sum(bases, cls(0))
+
+    for _pass in range(passes):
+        share = pool // count
+        if share <= cls(0):
+            break
+
+        for i in range(count):
+            size = bases[i] + growth[i] + share
+            if maxes[i] and size > maxes[i]:
+                size = maxes[i]
+
+            pool -= size - bases[i] - growth[i]
+            growth[i] = size - bases[i]
+
+    return sum(growth, cls(0))
+
+def parse(cls, count):
+    specs = ["%d MiB" % (i % 64) for i in range(count)]
+    return [cls(spec) for spec in specs]
+
+def main():
+    args = sys.argv[1:]
+    count = int(args[0]) if args else 2000
+
+    for cls in (Size, DecimalSize):
+        start = time.time()
+        total = grow(cls, count)
+        grow_time = time.time() - start
+
+        start = time.time()
+        parse(cls, count * 10)
+        parse_time = time.time() - start
+
+        print("%-12s growth of %d requests: %.3fs (%s grown), "
+              "%d specs parsed: %.3fs" % (cls.__name__, count, grow_time,
+                                          Size(total), count * 10,
+                                          parse_time))
+
+if __name__ == "__main__":
+    main()
@@ -196,6 +196,76 @@ class ClearPartTestCase(unittest.TestCase):
         """
         pass
 
+    def testGetFreeSpace(self):
+        """ Test that Blivet.getFreeSpace follows changes to the tree. """
+        b = blivet.Blivet()
+        b.config.clearPartType = CLEARPART_TYPE_LINUX
+
+        DiskDevice = blivet.devices.DiskDevice
+        PartitionDevice = blivet.devices.PartitionDevice
+
+        disks = []
+        for name in ("sda", "sdb"):
+            disk = DiskDevice(name, size=100000, exists=True)
+            disk.format = blivet.formats.getFormat("disklabel",
+                                                   device=disk.path,
+                                                   exists=True)
+            disk.format._partedDisk = mock.Mock()
+            disk.format._partedDevice = mock.Mock()
+            disk.format._partedDisk.configure_mock(partitions=[])
+            disk.format._partedDisk.getFreeSpacePartitions.return_value = []
+            b.devicetree._addDevice(disk)
+            disks.append(disk)
+
+        (sda, sdb) = disks
+
+        def add_partition(disk, number, size):
+            name = "%s%d" % (disk.name, number)
+            partition = PartitionDevice(name, size=size, exists=True,
+                                        parents=[disk])
+            partition._partedPartition = mock.Mock(**{'path': "/dev/" + name,
+                                                      'type': PARTITION_NORMAL,
+                                                      'getFlag.return_value': 0,
+                                                      'getLength.return_value': size})
+            partition.format = blivet.formats.getFormat("ext4",
+                                                        device=partition.path,
+                                                        exists=True)
+            b.devicetree._addDevice(partition)
+            return partition
+
+        sda1 = add_partition(sda, 1, 500)
+        self.assertEqual(b._partitionsByDisk(), {sda.id: [sda1]})
+        self.assertEqual(b.getFreeSpace(disks=disks)[sda.name][0], sda1.size)
+
+        # the partitions of each disk are looked up again once the tree has
+        # changed
+        sda2 = add_partition(sda, 2, 10000)
+        sdb1 = add_partition(sdb, 1, 2000)
+        sdb2 = add_partition(sdb, 2, 3000)
+        self.assertEqual(b._partitionsByDisk(),
+                         {sda.id: [sda1, sda2], sdb.id: [sdb1, sdb2]})
+        free = b.getFreeSpace(disks=disks)
+        self.assertEqual(free[sda.name][0], sda1.size + sda2.size)
+        self.assertEqual(free[sdb.name][0], sdb1.size + sdb2.size)
+
+        # sdb keeps a partition, so it is not cleared as a whole
+        b.devicetree._removeDevice(sda1)
+        b.devicetree._removeDevice(sdb1)
+        self.assertEqual(b._partitionsByDisk(),
+                         {sda.id: [sda2], sdb.id: [sdb2]})
+        free = b.getFreeSpace(disks=disks)
+        self.assertEqual(free[sda.name][0], sda2.size)
+        self.assertEqual(free[sdb.name][0], sdb2.size)
+
+        # callers get their own dict and lists
+        partitions = b._partitionsByDisk()
+        partitions[sda.id].append(sdb1)
+        partitions[sdb.id] = [sdb1]
+        del partitions[sda.id]
+        self.assertEqual(b._partitionsByDisk(),
+                         {sda.id: [sda2], sdb.id: [sdb2]})
+        self.assertEqual(b.getFreeSpace(disks=disks)[sda.name][0], sda2.size)
+
     def testRecursiveRemove(self):
         """
             protected device at various points in stack
@@ -1,14 +1,16 @@
 #!/usr/bin/python
 
 import unittest
+from mock import patch
 
 import blivet
 
 from blivet import devicefactory
 from blivet.devicelibs import raid
-from blivet.devices import DiskDevice
+from blivet.devices import DiskDevice, StorageDevice
 from blivet.errors import RaidError
 from blivet.formats import getFormat
+from blivet.osinstall import Root
 from blivet.size import Size
 
 class MDFactoryTestCase(unittest.TestCase):
@@ -59,5 +61,54 @@ class MDFactoryTestCase(unittest.TestCase):
 
         self.assertIsNone(self.factory2.get_container())
 
+class DeviceFactoryCheckpointTestCase(unittest.TestCase):
+    def setUp(self):
+        self.b = blivet.Blivet()
+        self.dev = StorageDevice("dev1", size=Size("1 GiB"), exists=True)
+        self.b.devicetree._addDevice(self.dev)
+        self.root = Root(name="root1")
+        self.b.roots = [self.root]
+        self.factory = devicefactory.get_device_factory(self.b,
+           devicefactory.DEVICE_TYPE_MD,
+           Size("1 GiB"),
+           raid_level=raid.RAID1)
+
+    def _configure(self, error=None):
+        def change():
+            self.dev.name = "dev2"
+            self.b.devicetree._addDevice(StorageDevice("dev3",
+                                                       size=Size("1 GiB")))
+            self.b.roots = []
+            if error is not None:
+                raise error
+
+        with patch.object(self.factory, "_configure", side_effect=change):
+            self.factory.configure()
+
+    def _check(self, names, roots):
+        self.assertFalse(self.b.devicetree._journal.recording)
+        self.assertEqual(self.dev.name, names[0])
+        self.assertEqual([d.name for d in self.b.devicetree.devices], names)
+        self.assertEqual(self.b.roots, roots)
+
+    def testConfigure(self):
+        self._configure()
+        self._check(["dev2", "dev3"], [])
+
+    def testFailure(self):
+        self.assertRaises(devicefactory.DeviceFactoryError, self._configure,
+                          ValueError("no"))
+        self._check(["dev1"], [self.root])
+
+    def testInterrupt(self):
+        # the tree is restored even if configure does not fail with an
+        # Exception
+        self.assertRaises(KeyboardInterrupt, self._configure,
+                          KeyboardInterrupt())
+        self._check(["dev1"], [self.root])
+
+        self.assertRaises(SystemExit, self._configure, SystemExit(1))
+        self._check(["dev1"], [self.root])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+import copy
+import unittest
+from collections import namedtuple
+from mock import patch
+
+import blivet.devicelibs.lvm as lvm
+
+# the fields of libblockdev's BDLVMPVdata and BDLVMLVdata used here
+PVData = namedtuple("PVData", ["pv_name", "vg_name"])
+LVData = namedtuple("LVData", ["lv_name", "vg_name", "uuid", "size", "attr", "segtype"])
+
+# lvs --noheadings --all --separator "|" -o vg_name,lv_name,origin,pool_lv
+LVS_RELATIONS = """\
+  vg|home||
+  vg|pool||
+  vg|[pool_tdata]||
+  vg|[pool_tmeta]||
+  vg|root||
+  vg|snap|root|
+  vg|thin||pool
+  vg|tsnap|thin|pool
+"""
+
+class LVMInfoTestCase(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch("blivet.devicelibs.lvm.util.run_program_and_capture_output",
+                        return_value=(0, LVS_RELATIONS))
+        self.run_lvs = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("blivet.devicelibs.lvm.blockdev")
+    def testSnapshot(self, blockdev):
+        blockdev.lvm.pvs.return_value = [PVData("/dev/sda1", "vg")]
+        blockdev.lvm.lvs.return_value = [LVData("root", "vg", "1", "1073741824", "owi-a-s---", "linear"),
+                                         LVData("snap", "vg", "2", "1073741824", "swi-a-s---", "linear")]
+
+        info = lvm.LVMInfo()
+        self.assertEqual(list(info.pvs.keys()), ["/dev/sda1"])
+        self.assertEqual(sorted(info.lvs.keys()), ["vg-root", "vg-snap"])
+        self.assertEqual(info.lvOrigin("vg", "snap"), "root")
+        self.assertEqual(info.lvOrigin("vg", "root"), None)
+        self.assertEqual(blockdev.lvm.pvs.call_count, 1)
+        self.assertEqual(blockdev.lvm.lvs.call_count, 1)
+        self.assertEqual(self.run_lvs.call_count, 1)
+        self.assertFalse(blockdev.lvm.lvorigin.called)
+
+        # invalidate drops everything, to be fetched again on demand
+        info.invalidate()
+        self.assertEqual(self.run_lvs.call_count, 1)
+        self.assertEqual(info.lvOrigin("vg", "snap"), "root")
+        self.assertEqual(self.run_lvs.call_count, 2)
+
+        # refresh fetches everything right away
+        info.refresh()
+        self.assertEqual(blockdev.lvm.pvs.call_count, 2)
+        self.assertEqual(blockdev.lvm.lvs.call_count, 2)
+        self.assertEqual(self.run_lvs.call_count, 3)
+
+    @patch("blivet.devicelibs.lvm.blockdev")
+    def testCopy(self, blockdev):
+        blockdev.lvm.lvs.return_value = [LVData("root", "vg", "1", "1073741824", "owi-a-s---", "linear"),
+                                         LVData("snap", "vg", "2", "1073741824", "swi-a-s---", "linear")]
+
+        info = lvm.LVMInfo()
+        self.assertEqual(sorted(info.lvs.keys()), ["vg-root", "vg-snap"])
+        self.assertEqual(info.lvOrigin("vg", "snap"), "root")
+
+        # copies share the reports instead of fetching or copying them
+        new = copy.deepcopy(info)
+        self.assertIs(new.lvs, info.lvs)
+        self.assertEqual(new.lvOrigin("vg", "snap"), "root")
+        self.assertEqual(blockdev.lvm.lvs.call_count, 1)
+        self.assertEqual(self.run_lvs.call_count, 1)
+
+        # and invalidating one of them leaves the other alone
+        new.invalidate()
+        self.assertEqual(sorted(info.lvs.keys()), ["vg-root", "vg-snap"])
+        self.assertEqual(blockdev.lvm.lvs.call_count, 1)
+
+    @patch("blivet.devicelibs.lvm.blockdev")
+    def testBulkRelations(self, blockdev):
+        info = lvm.LVMInfo()
+        self.assertEqual(info.thinPoolName("vg", "thin"), "pool")
+        self.assertEqual(info.lvOrigin("vg", "thin"), None)
+        self.assertEqual(info.thinPoolName("vg", "tsnap"), "pool")
+        self.assertEqual(info.lvOrigin("vg", "tsnap"), "thin")
+        self.assertEqual(info.thinPoolName("vg", "pool_tdata"), None)
+
+        # everything came from the single lvs run
+        argv = self.run_lvs.call_args[0][0]
+        self.assertEqual(argv[0], "lvs")
+        self.assertEqual(argv[argv.index("-o") + 1], "vg_name,lv_name,origin,pool_lv")
+        self.assertEqual(self.run_lvs.call_count, 1)
+        self.assertFalse(blockdev.lvm.lvorigin.called)
+        self.assertFalse(blockdev.lvm.thlvpoolname.called)
+
+        # LVs the listing does not include are asked about one at a time
+        blockdev.lvm.thlvpoolname.return_value = "pool"
+        self.assertEqual(info.thinPoolName("vg", "thin2"), "pool")
+        self.assertEqual(blockdev.lvm.thlvpoolname.call_count, 1)
+        self.assertEqual(self.run_lvs.call_count, 1)
+
+    @patch("blivet.devicelibs.lvm.blockdev")
+    def testRelationsFailure(self, blockdev):
+        self.run_lvs.return_value = (5, "")
+        blockdev.lvm.lvorigin.return_value = "root"
+
+        # the relations are then asked for one LV at a time, and lvs is not
+        # run again
+        info = lvm.LVMInfo()
+        self.assertEqual(info.lvOrigin("vg", "snap"), "root")
+        self.assertEqual(info.lvOrigin("vg", "snap"), "root")
+        self.assertEqual(blockdev.lvm.lvorigin.call_count, 1)
+        self.assertEqual(self.run_lvs.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+
+import unittest
+
+import blivet
+
+from blivet.devices import StorageDevice
+from blivet.devices import LUKSDevice
+from blivet.devices import LVMLogicalVolumeDevice
+from blivet.devices import LVMSnapShotDevice
+from blivet.devices import LVMVolumeGroupDevice
+from blivet.size import Size
+
+class DeviceDependenciesTestCase(unittest.TestCase):
+    """ Test the cached ancestry behind Device.dependsOn and ancestors. """
+
+    def setUp(self):
+        self.pv1 = StorageDevice("pv1", fmt=blivet.formats.getFormat("lvmpv"),
+                                 size=Size("1 GiB"))
+        self.pv2 = StorageDevice("pv2", fmt=blivet.formats.getFormat("lvmpv"),
+                                 size=Size("1 GiB"))
+        self.vg = LVMVolumeGroupDevice("testvg", parents=[self.pv1])
+        self.lv = LVMLogicalVolumeDevice("testlv", parents=[self.vg],
+                                         size=Size("100 MiB"), exists=True)
+
+    def testDependsOn(self):
+        self.assertTrue(self.lv.dependsOn(self.pv1))
+        self.assertTrue(self.lv.dependsOn(self.vg))
+        self.assertFalse(self.lv.dependsOn(self.lv))
+        self.assertFalse(self.lv.dependsOn(self.pv2))
+        self.assertFalse(self.vg.dependsOn(self.lv))
+        self.assertEqual(set(self.lv.ancestors),
+                         set([self.lv, self.vg, self.pv1]))
+
+    def testParentChanges(self):
+        # populate the caches
+        self.assertFalse(self.lv.dependsOn(self.pv2))
+
+        self.vg.parents.append(self.pv2)
+        self.assertTrue(self.lv.dependsOn(self.pv2))
+        self.assertIn(self.pv2, self.lv.ancestors)
+
+        self.vg.parents.remove(self.pv1)
+        self.assertFalse(self.lv.dependsOn(self.pv1))
+        self.assertNotIn(self.pv1, self.lv.ancestors)
+
+        self.vg.parents.replace(self.pv2, self.pv1)
+        self.assertTrue(self.lv.dependsOn(self.pv1))
+        self.assertFalse(self.lv.dependsOn(self.pv2))
+
+    def testImplicitDependencies(self):
+        snap = LVMSnapShotDevice("snap", parents=[self.vg], origin=self.lv)
+        luks = LUKSDevice("luks", parents=[snap])
+
+        # devices on top of a snapshot depend on the snapshot's origin too
+        self.assertTrue(snap.dependsOn(self.lv))
+        self.assertTrue(luks.dependsOn(self.lv))
+        self.assertFalse(self.lv.dependsOn(snap))
+        self.assertNotIn(self.lv, luks.ancestors)
+
+if __name__ == "__main__":
+    unittest.main()
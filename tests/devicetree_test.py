@@ -1,13 +1,22 @@
+import copy
 import unittest
+from mock import patch
 
 from tests.imagebackedtestcase import ImageBackedTestCase
 
+import blivet
+from blivet.errors import DeviceTreeError
 from blivet.size import Size
 from blivet import devicelibs
 from blivet import devicefactory
 from blivet import util
 from blivet.udev import trigger
+from blivet.devicetree import DeviceTree
+from blivet.populator import Populator
 from blivet.devices import LVMSnapShotDevice, LVMThinSnapShotDevice
+from blivet.devices import LVMLogicalVolumeDevice, LVMVolumeGroupDevice
+from blivet.devices import StorageDevice
+from blivet.formats import getFormat
 
 """
     TODO:
@@ -29,6 +38,361 @@ def recursive_getattr(x, attr, default=None):
 
     return val
 
+class DeviceTreeLookupTestCase(unittest.TestCase):
+    """ Verify that the device lookup indexes follow changes to the tree. """
+    def setUp(self):
+        self.tree = DeviceTree()
+        self.dev = StorageDevice("dev1", size=Size("1 GiB"), uuid="1234",
+                                 sysfsPath="/devices/virtual/block/dev1",
+                                 fmt=getFormat("ext4", label="root",
+                                               uuid="abcd"))
+        self.pv = StorageDevice("pv1", size=Size("1 GiB"),
+                                fmt=getFormat("lvmpv"))
+        self.vg = LVMVolumeGroupDevice("test-vg", parents=[self.pv])
+        self.lv = LVMLogicalVolumeDevice("lv", parents=[self.vg],
+                                         fmt=getFormat("xfs"))
+        for device in (self.dev, self.pv, self.vg, self.lv):
+            self.tree._addDevice(device)
+
+    def testLookups(self):
+        tree = self.tree
+        self.assertEqual(tree.getDeviceByName("dev1"), self.dev)
+        self.assertEqual(tree.getDeviceByPath("/dev/dev1"), self.dev)
+        self.assertEqual(tree.getDeviceByUuid("1234"), self.dev)
+        self.assertEqual(tree.getDeviceByUuid("abcd"), self.dev)
+        self.assertEqual(tree.getDeviceByLabel("root"), self.dev)
+        self.assertEqual(tree.getDeviceBySysfsPath("/devices/virtual/block/dev1"),
+                         self.dev)
+        self.assertEqual(tree.getDeviceByID(self.dev.id), self.dev)
+        self.assertIsNone(tree.getDeviceByName("dev2"))
+        self.assertIsNone(tree.getDeviceByID(-1))
+
+        # lvm doubles the dashes in device-mapper names
+        self.assertEqual(tree.getDeviceByName("test-vg"), self.vg)
+        self.assertEqual(tree.getDeviceByName("test--vg-lv"), self.lv)
+        self.assertEqual(tree.getDeviceByPath("/dev/mapper/test--vg-lv"), self.lv)
+
+    def testRename(self):
+        tree = self.tree
+        self.dev.name = "dev2"
+        self.assertIsNone(tree.getDeviceByName("dev1"))
+        self.assertIsNone(tree.getDeviceByPath("/dev/dev1"))
+        self.assertEqual(tree.getDeviceByName("dev2"), self.dev)
+        self.assertEqual(tree.getDeviceByPath("/dev/dev2"), self.dev)
+
+        # the lv's name is derived from the vg's name
+        self.vg.name = "vg2"
+        self.assertIsNone(tree.getDeviceByName("test-vg-lv"))
+        self.assertEqual(tree.getDeviceByName("vg2-lv"), self.lv)
+        self.assertEqual(tree.getDeviceByPath("/dev/mapper/vg2-lv"), self.lv)
+
+    def testAttributeChanges(self):
+        tree = self.tree
+        self.dev.format.label = "boot"
+        self.assertIsNone(tree.getDeviceByLabel("root"))
+        self.assertEqual(tree.getDeviceByLabel("boot"), self.dev)
+
+        self.dev.format = getFormat("xfs", uuid="efgh")
+        self.assertIsNone(tree.getDeviceByUuid("abcd"))
+        self.assertIsNone(tree.getDeviceByLabel("boot"))
+        self.assertEqual(tree.getDeviceByUuid("efgh"), self.dev)
+
+        self.dev.uuid = "5678"
+        self.assertIsNone(tree.getDeviceByUuid("1234"))
+        self.assertEqual(tree.getDeviceByUuid("5678"), self.dev)
+
+        self.dev.sysfsPath = ""
+        self.assertIsNone(tree.getDeviceBySysfsPath("/devices/virtual/block/dev1"))
+
+    def testUuidsAndLabels(self):
+        tree = self.tree
+        self.assertEqual(tree.uuids, {"1234": self.dev, "abcd": self.dev})
+        self.assertEqual(tree.labels, {"root": self.dev})
+        self.assertEqual(tree.resolveDevice("UUID=abcd"), self.dev)
+        self.assertEqual(tree.resolveDevice("UUID=\"1234\""), self.dev)
+        self.assertEqual(tree.resolveDevice("LABEL=root"), self.dev)
+
+        # callers get their own dicts
+        tree.labels.clear()
+        self.assertEqual(tree.labels, {"root": self.dev})
+
+        self.dev.format.label = "boot"
+        self.assertEqual(tree.labels, {"boot": self.dev})
+        self.assertIsNone(tree.resolveDevice("LABEL=root"))
+        self.assertEqual(tree.resolveDevice("LABEL=boot"), self.dev)
+
+        # the last device with a uuid wins
+        self.lv.format.uuid = "abcd"
+        self.assertEqual(tree.uuids["abcd"], self.lv)
+        self.assertEqual(tree.resolveDevice("UUID=abcd"), self.lv)
+
+        # btrfs member devices are not included in the labels
+        self.pv.format = getFormat("btrfs", label="boot")
+        self.assertEqual(tree.labels, {"boot": self.dev})
+        self.assertEqual(tree.resolveDevice("LABEL=boot"), self.dev)
+
+    def testHideAndRemove(self):
+        tree = self.tree
+        self.dev.exists = True
+        tree.hide(self.dev)
+        self.assertIsNone(tree.getDeviceByName("dev1"))
+        self.assertEqual(tree.getDeviceByName("dev1", hidden=True), self.dev)
+        self.assertEqual(tree.getDeviceByUuid("abcd", hidden=True), self.dev)
+
+        tree.unhide(self.dev)
+        self.assertEqual(tree.getDeviceByName("dev1"), self.dev)
+
+        tree._removeDevice(self.lv)
+        self.assertIsNone(tree.getDeviceByName("test-vg-lv"))
+        self.assertIsNone(tree.getDeviceByID(self.lv.id, hidden=True))
+
+        # changes to devices no longer in the tree are ignored
+        self.lv.name = "lv2"
+        self.assertIsNone(tree.getDeviceByName("test-vg-lv2"))
+
+    def testChildren(self):
+        tree = self.tree
+        self.assertEqual(tree.getChildren(self.pv), [self.vg])
+        self.assertEqual(tree.getChildren(self.lv), [])
+        self.assertEqual(tree.descendants(self.pv), [self.vg, self.lv])
+        self.assertEqual(tree.getDependentDevices(self.pv), [self.vg, self.lv])
+
+        # snapshots depend on their origin without being built on it
+        self.lv.exists = True
+        snap = LVMSnapShotDevice("snap", parents=[self.vg], origin=self.lv)
+        tree._addDevice(snap)
+        self.assertEqual(tree.descendants(self.lv), [])
+        self.assertEqual(tree.getDependentDevices(self.lv), [snap])
+        self.assertEqual(tree.getChildren(self.vg), [self.lv, snap])
+
+        # parent list changes are reflected immediately
+        pv2 = StorageDevice("pv2", size=Size("1 GiB"), fmt=getFormat("lvmpv"))
+        tree._addDevice(pv2)
+        self.vg.parents.append(pv2)
+        self.assertEqual(tree.getChildren(pv2), [self.vg])
+        self.assertEqual(tree.descendants(pv2), [self.vg, self.lv, snap])
+        self.vg.parents.remove(self.pv)
+        self.assertEqual(tree.getChildren(self.pv), [])
+
+        tree._removeDevice(snap)
+        self.assertEqual(tree.getChildren(self.vg), [self.lv])
+
+    def testDevices(self):
+        tree = self.tree
+        devices = tree.devices
+        self.assertEqual(devices, [self.dev, self.pv, self.vg, self.lv])
+
+        # callers get their own list
+        devices.remove(self.dev)
+        self.assertEqual(tree.devices, [self.dev, self.pv, self.vg, self.lv])
+
+        generation = tree.generation
+        tree._removeDevice(self.dev)
+        self.assertNotEqual(tree.generation, generation)
+        self.assertEqual(tree.devices, [self.pv, self.vg, self.lv])
+
+        tree._addDevice(self.dev)
+        self.pv.uuid = self.dev.uuid
+        self.assertRaises(DeviceTreeError, getattr, tree, "devices")
+
+    def testBlivetViews(self):
+        storage = blivet.Blivet()
+        storage.devicetree = self.tree
+        self.assertEqual(storage.pvs, [self.pv])
+        self.assertEqual(storage.vgs, [self.vg])
+        self.assertEqual(storage.lvs, [self.lv])
+
+        # views follow changes to the tree
+        self.pv.format = getFormat("xfs")
+        self.assertEqual(storage.pvs, [])
+        self.dev.format = getFormat("lvmpv")
+        self.assertEqual(storage.pvs, [self.dev])
+        self.tree._removeDevice(self.lv)
+        self.assertEqual(storage.lvs, [])
+        self.assertEqual(storage.devices, [self.dev, self.pv, self.vg])
+
+    def testCopy(self):
+        tree = copy.deepcopy(self.tree)
+        dev = tree.getDeviceByName("dev1")
+        self.assertIsNotNone(dev)
+        self.assertIsNot(dev, self.dev)
+
+        dev.name = "dev2"
+        self.assertEqual(tree.getDeviceByName("dev2"), dev)
+        self.assertEqual(self.tree.getDeviceByName("dev1"), self.dev)
+        self.assertIsNone(self.tree.getDeviceByName("dev2"))
+
+        dev.format.label = "boot"
+        self.assertEqual(tree.getDeviceByLabel("boot"), dev)
+        self.assertEqual(self.tree.getDeviceByLabel("root"), self.dev)
+
+        vg = tree.getDeviceByName("test-vg")
+        self.assertEqual(tree.getChildren(vg), [tree.getDeviceByName("test-vg-lv")])
+        pv2 = StorageDevice("pv2", size=Size("1 GiB"), fmt=getFormat("lvmpv"))
+        tree._addDevice(pv2)
+        vg.parents.append(pv2)
+        self.assertEqual(tree.getChildren(pv2), [vg])
+        self.assertEqual(self.tree.getChildren(self.pv), [self.vg])
+
+    def testCheckpoint(self):
+        tree = self.tree
+        checkpoint = tree.checkpoint()
+        tree._removeDevice(self.lv)
+        self.vg.name = "vg2"
+        self.dev.format.label = "boot"
+        pv2 = StorageDevice("pv2", size=Size("1 GiB"), fmt=getFormat("lvmpv"))
+        tree._addDevice(pv2)
+        self.vg.parents.append(pv2)
+        lv2 = LVMLogicalVolumeDevice("lv2", parents=[self.vg], size=Size("1 GiB"))
+        tree.registerAction(blivet.deviceaction.ActionCreateDevice(lv2))
+        self.assertEqual(tree.getDeviceByName("vg2-lv2"), lv2)
+        self.assertEqual(self.vg.lvs, [lv2])
+
+        tree.revertCheckpoint(checkpoint)
+        self.assertEqual(tree.devices, [self.dev, self.pv, self.vg, self.lv])
+        self.assertEqual(tree.names, ["dev1", "pv1", "test-vg", "test-vg-lv"])
+        self.assertEqual(list(tree.actions), [])
+        self.assertEqual(self.vg.name, "test-vg")
+        self.assertEqual(list(self.vg.parents), [self.pv])
+        self.assertEqual(self.vg.lvs, [self.lv])
+        self.assertEqual(tree.getDeviceByName("test-vg-lv"), self.lv)
+        self.assertEqual(tree.getDeviceByLabel("root"), self.dev)
+        self.assertEqual(tree.getChildren(self.pv), [self.vg])
+        self.assertIsNone(tree.getDeviceByName("pv2"))
+        self.assertIsNone(tree.getDeviceByName("vg2-lv2"))
+
+        # released changes are kept
+        checkpoint = tree.checkpoint()
+        self.dev.name = "dev2"
+        tree.releaseCheckpoint(checkpoint)
+        self.assertEqual(tree.getDeviceByName("dev2"), self.dev)
+        self.assertFalse(tree._journal.recording)
+
+    def testCheckpointCopy(self):
+        # a checkpoint only covers the tree it was taken of
+        new = copy.deepcopy(self.tree)
+        new_dev = new.getDeviceByName("dev1")
+        checkpoint = self.tree.checkpoint()
+        new_dev.name = "dev2"
+        new_dev.format.label = "boot"
+        self.dev.name = "dev3"
+        self.tree.revertCheckpoint(checkpoint)
+        self.assertEqual(self.dev.name, "dev1")
+        self.assertEqual(new_dev.name, "dev2")
+        self.assertEqual(new.getDeviceByLabel("boot"), new_dev)
+
+        # and the copy's checkpoints only cover the copy
+        checkpoint = new.checkpoint()
+        new_dev.name = "dev4"
+        self.dev.name = "dev5"
+        new.revertCheckpoint(checkpoint)
+        self.assertEqual(new_dev.name, "dev2")
+        self.assertEqual(self.dev.name, "dev5")
+
+class FakeUdevInfo(dict):
+    """ Just enough of a pyudev.Device to describe a udev event. """
+    def __init__(self, name, action="add", **properties):
+        dict.__init__(self, **properties)
+        self.sys_name = name
+        self.sys_path = "/sys/devices/virtual/block/%s" % name
+        self.action = action
+
+class DeviceTreeUdevEventTestCase(unittest.TestCase):
+    """ Verify that udev events are applied to an existing tree. """
+    def setUp(self):
+        self.tree = DeviceTree()
+        self.db = {}
+        self.scanned = []
+
+        patches = [patch.object(Populator, "addUdevDevice", autospec=True,
+                                side_effect=self._addUdevDevice),
+                   patch.object(Populator, "handleUdevDeviceFormat",
+                                autospec=True,
+                                side_effect=self._handleUdevDeviceFormat),
+                   patch("blivet.populator.udev.get_device",
+                         side_effect=self.db.get)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _addUdevDevice(self, populator, info):
+        """ Add a disk (no digits in the name) or a partition of it. """
+        name = info.sys_name
+        disk_name = name.rstrip("0123456789")
+        parents = [self.tree.getDeviceByName(disk_name)] if disk_name != name else []
+
+        device = StorageDevice(name, parents=parents, size=Size("1 GiB"),
+                               sysfsPath=info.sys_path, exists=True)
+        self.tree._addDevice(device)
+        populator.handleUdevDeviceFormat(info, device)
+        populator._formatSignatures[device.id] = blivet.udev.device_get_format_signature(info)
+
+    def _handleUdevDeviceFormat(self, _populator, info, device):
+        self.scanned.append(device.name)
+        device.format = getFormat(info.get("ID_FS_TYPE"), exists=True,
+                                  uuid=info.get("ID_FS_UUID"))
+
+    def _event(self, name, action, **properties):
+        info = FakeUdevInfo(name, action=action, **properties)
+        if action == "remove":
+            self.db.pop(info.sys_path, None)
+        else:
+            self.db[info.sys_path] = info
+        self.tree.handleUdevEvent(info)
+
+    def testEvents(self):
+        tree = self.tree
+        self._event("sda", "add")
+        self._event("sda1", "add", ID_FS_TYPE="ext4", ID_FS_UUID="1")
+        self._event("sda2", "add", ID_FS_TYPE="xfs", ID_FS_UUID="2")
+        self.assertEqual(sorted(d.name for d in tree.devices),
+                         ["sda", "sda1", "sda2"])
+        self.assertEqual(self.scanned, ["sda", "sda1", "sda2"])
+
+        # a change event that leaves the format alone is cheap
+        del self.scanned[:]
+        self._event("sda1", "change", ID_FS_TYPE="ext4", ID_FS_UUID="1")
+        self.assertEqual(self.scanned, [])
+
+        # a new format is picked up without touching anything else
+        self._event("sda1", "change", ID_FS_TYPE="xfs", ID_FS_UUID="3")
+        self.assertEqual(self.scanned, ["sda1"])
+        self.assertEqual(tree.getDeviceByName("sda1").format.type, "xfs")
+        self.assertEqual(tree.getDeviceByUuid("3"), tree.getDeviceByName("sda1"))
+
+        # reformatting the disk means its dependents have to be scanned again
+        del self.scanned[:]
+        sda1 = tree.getDeviceByName("sda1")
+        self._event("sda2", "remove")
+        self._event("sda", "change", ID_FS_TYPE="lvmpv", ID_FS_UUID="4")
+        self.assertEqual(self.scanned, ["sda", "sda1"])
+        self.assertEqual(sorted(d.name for d in tree.devices), ["sda", "sda1"])
+        self.assertIsNot(tree.getDeviceByName("sda1"), sda1)
+
+        self._event("sda", "remove")
+        self.assertEqual(tree.devices, [])
+
+    def testPendingActions(self):
+        self._event("sda", "add", ID_FS_TYPE="ext4")
+        sda = self.tree.getDeviceByName("sda")
+        self.tree.registerAction(blivet.deviceaction.ActionCreateFormat(sda, getFormat("xfs")))
+        self._event("sda", "remove")
+        self.assertEqual(self.tree.devices, [sda])
+
+    def testProcessEvents(self):
+        events = [FakeUdevInfo("sda"), FakeUdevInfo("sda1")]
+        for info in events:
+            self.db[info.sys_path] = info
+
+        class FakeMonitor(object):
+            def poll(self, timeout=None):
+                # pylint: disable=unused-argument
+                return events.pop(0) if events else None
+
+        self.assertEqual(self.tree.processUdevEvents(FakeMonitor()), 2)
+        self.assertEqual(len(self.tree.devices), 2)
+        self.assertEqual(self.tree.processUdevEvents(FakeMonitor()), 0)
+
 class BlivetResetTestCase(ImageBackedTestCase):
     """ A class to test the results of Blivet.reset (and DeviceTree.populate).
 
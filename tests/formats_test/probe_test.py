@@ -0,0 +1,266 @@
+#!/usr/bin/python
+
+import copy
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from mock import patch
+
+from blivet import Blivet
+from blivet.devices import StorageDevice
+from blivet.devicetree import DeviceTree
+from blivet.flags import flags
+from blivet.formats import getFormat
+from blivet.formats.fs import Ext4FS
+from blivet.populator import Populator
+from blivet.size import Size
+
+class FakeUdevInfo(dict):
+    """ Just enough of a pyudev.Device to describe a device's format. """
+    def __init__(self, name, **properties):
+        dict.__init__(self, **properties)
+        self.sys_name = name
+        self.sys_path = "/sys/devices/virtual/block/%s" % name
+
+class FakeLV(StorageDevice):
+    """ A device whose node only exists while it is set up. """
+    def __init__(self, *args, **kwargs):
+        self.active = True
+        self.calls = []
+        StorageDevice.__init__(self, *args, **kwargs)
+
+    @property
+    def status(self):
+        return self.exists and self.active
+
+    def setup(self, orig=False):
+        self.calls.append("setup")
+        self.active = True
+
+    def teardown(self, recursive=None):
+        self.calls.append("teardown")
+        self.active = False
+
+class FSProbeTestCase(unittest.TestCase):
+    """ Existing filesystems are probed for size info in installer mode. """
+
+    def setUp(self):
+        self._installer_mode = flags.installer_mode
+        self._lazy_probe = flags.lazy_probe
+        flags.installer_mode = True
+
+    def tearDown(self):
+        flags.installer_mode = self._installer_mode
+        flags.lazy_probe = self._lazy_probe
+
+    def _fakeUpdateSizeInfo(self, fmt):
+        fmt._size = Size("1 GiB")
+
+    def testProbe(self):
+        with patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=self._fakeUpdateSizeInfo) as update:
+            fmt = getFormat("ext4", device="/dev/sda1", exists=True)
+            self.assertEqual(update.call_count, 1)
+            self.assertEqual(fmt.targetSize, Size("1 GiB"))
+
+            # deferred probing
+            fmt = getFormat("ext4", device="/dev/sda1", exists=True,
+                            probe=False)
+            self.assertEqual(update.call_count, 1)
+            self.assertTrue(fmt.needsProbe)
+            fmt.probe()
+            self.assertEqual(update.call_count, 2)
+            self.assertEqual(fmt.targetSize, Size("1 GiB"))
+
+            # nothing to probe for filesystems that do not exist yet
+            fmt = getFormat("ext4", device="/dev/sda1", probe=False)
+            self.assertFalse(fmt.needsProbe)
+            fmt.probe()
+            self.assertEqual(update.call_count, 2)
+
+    def testLazyProbe(self):
+        flags.lazy_probe = True
+        with patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=self._fakeUpdateSizeInfo) as update:
+            for attr in ("size", "minSize", "resizable", "targetSize"):
+                fmt = getFormat("ext4", device="/dev/sda1", exists=True)
+                self.assertEqual(update.call_count, 0)
+                self.assertTrue(fmt.needsProbe)
+
+                getattr(fmt, attr)
+                self.assertEqual(update.call_count, 1, msg=attr)
+                self.assertFalse(fmt.needsProbe)
+                self.assertEqual(fmt.size, Size("1 GiB"))
+                self.assertEqual(update.call_count, 1, msg=attr)
+                update.reset_mock()
+
+            # an explicit request still probes right away
+            fmt = getFormat("ext4", device="/dev/sda1", exists=True, probe=True)
+            self.assertEqual(update.call_count, 1)
+
+    def testConcurrentRead(self):
+        flags.lazy_probe = True
+        fmt = getFormat("ext4", device="/dev/sda1", exists=True)
+        started = threading.Event()
+        finish = threading.Event()
+
+        def updateSizeInfo(fmt):
+            started.set()
+            finish.wait()
+            self._fakeUpdateSizeInfo(fmt)
+
+        with patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=updateSizeInfo) as update:
+            thread = threading.Thread(target=fmt.probe)
+            thread.start()
+            started.wait()
+
+            # a read while another thread is probing waits for the probe
+            timer = threading.Timer(0.2, finish.set)
+            timer.start()
+            self.assertEqual(fmt.size, Size("1 GiB"))
+            self.assertTrue(finish.is_set())
+            thread.join()
+            timer.join()
+            self.assertEqual(update.call_count, 1)
+            self.assertFalse(fmt.needsProbe)
+
+    def testCopy(self):
+        flags.lazy_probe = True
+        fmt = getFormat("ext4", device="/dev/sda1", exists=True)
+        new = copy.deepcopy(fmt)
+        self.assertIsNot(new._probeLock, fmt._probeLock)
+        with patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=self._fakeUpdateSizeInfo):
+            self.assertEqual(new.size, Size("1 GiB"))
+
+        self.assertTrue(fmt.needsProbe)
+
+    def testProbeFormats(self):
+        flags.lazy_probe = True
+        tree = DeviceTree()
+        for i in range(4):
+            fmt = getFormat("ext4", device="/dev/sda%d" % (i + 1), exists=True)
+            tree._addDevice(StorageDevice("sda%d" % (i + 1), fmt=fmt,
+                                          size=Size("1 GiB"), exists=True))
+
+        with patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=self._fakeUpdateSizeInfo) as update:
+            tree.probeFormats(tree.devices[:2])
+            self.assertEqual(update.call_count, 2)
+            self.assertEqual([d.format.needsProbe for d in tree.devices],
+                             [False, False, True, True])
+
+            tree.probeFormats()
+            self.assertEqual(update.call_count, 4)
+            tree.probeFormats()
+            self.assertEqual(update.call_count, 4)
+
+    def testProbeFormatsSetup(self):
+        flags.lazy_probe = True
+        tree = DeviceTree()
+        lvs = []
+        for i in range(3):
+            fmt = getFormat("ext4", device="/dev/vg/lv%d" % i, exists=True)
+            lv = FakeLV("vg-lv%d" % i, fmt=fmt, size=Size("1 GiB"), exists=True)
+            lv.active = i > 0
+            fmt.probeDevice = lv
+            tree._addDevice(lv)
+            lvs.append(lv)
+
+        def updateSizeInfo(fmt):
+            self.assertTrue(all(lv.status for lv in lvs))
+            self._fakeUpdateSizeInfo(fmt)
+
+        # only the inactive device is set up, and it is torn down afterwards
+        with patch.object(flags, "probe_threads", 3), \
+             patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=updateSizeInfo) as update:
+            tree.probeFormats()
+            self.assertEqual(update.call_count, 3)
+
+        self.assertEqual([lv.calls for lv in lvs], [["setup", "teardown"], [], []])
+        self.assertEqual([lv.status for lv in lvs], [False, True, True])
+
+    def testDeferredProbes(self):
+        """ Only filesystems are created without probing while populating. """
+        tree = DeviceTree()
+        populator = tree._populator
+        populator._deferredProbes = []
+        devices = []
+        for (name, fmt_type) in (("sda1", "swap"), ("sda2", "ext4")):
+            device = StorageDevice(name, size=Size("1 GiB"), exists=True)
+            tree._addDevice(device)
+            devices.append(device)
+
+        with patch.object(Populator, "handleUdevDiskLabelFormat"), \
+             patch("blivet.populator.blockdev.mpath.is_mpath_member",
+                   return_value=False), \
+             patch("blivet.populator.formats.getFormat",
+                   wraps=getFormat) as get_format, \
+             patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=self._fakeUpdateSizeInfo) as update:
+            for (device, fmt_type) in zip(devices, ("swap", "ext4")):
+                info = FakeUdevInfo(device.name, ID_FS_TYPE=fmt_type)
+                populator.handleUdevDeviceFormat(info, device)
+
+            self.assertEqual(update.call_count, 0)
+
+        self.assertEqual([d.format.type for d in devices], ["swap", "ext4"])
+        self.assertNotIn("probe", get_format.call_args_list[0][1])
+        self.assertFalse(get_format.call_args_list[1][1]["probe"])
+        self.assertEqual(populator._deferredProbes, [devices[1]])
+        self.assertIs(devices[1].format.probeDevice, devices[1])
+
+    def testPopulate(self):
+        """ Lazy probes of a populated tree in installer mode. """
+        flags.lazy_probe = True
+        storage = Blivet()
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        storage._dumpFile = os.path.join(tmpdir, "storage.state")
+
+        def populate(populator):
+            lv = FakeLV("vg-root", size=Size("1 GiB"), exists=True)
+            storage.devicetree._addDevice(lv)
+            info = FakeUdevInfo("dm-0", ID_FS_TYPE="ext4", ID_FS_UUID="1234")
+            populator.handleUdevDeviceFormat(info, lv)
+
+        probed = []
+        def updateSizeInfo(fmt):
+            lv = storage.devicetree.getDeviceByName("vg-root")
+            probed.append(lv.status)
+            self._fakeUpdateSizeInfo(fmt)
+
+        with patch.object(Populator, "_populate", autospec=True,
+                          side_effect=populate), \
+             patch.object(Populator, "handleUdevDiskLabelFormat"), \
+             patch("blivet.populator.blockdev.mpath.is_mpath_member",
+                   return_value=False), \
+             patch("blivet.udev.settle"), \
+             patch.object(storage.iscsi, "startup"), \
+             patch.object(storage.fcoe, "startup"), \
+             patch.object(storage.zfcp, "startup"), \
+             patch("blivet.blivet.findExistingInstallations", return_value=[]), \
+             patch("blivet.blivet.get_edd_dict", return_value={}), \
+             patch.object(Ext4FS, "updateSizeInfo", autospec=True,
+                          side_effect=updateSizeInfo):
+            storage.reset()
+
+            # the tree was torn down and dumped without probing anything
+            lv = storage.devicetree.getDeviceByName("vg-root")
+            self.assertEqual(lv.calls, ["teardown"])
+            self.assertEqual(probed, [])
+            self.assertTrue(lv.format.needsProbe)
+            repr(lv)
+
+            # the lv is active for the probe and inactive again after it
+            self.assertEqual(lv.format.size, Size("1 GiB"))
+            self.assertEqual(probed, [True])
+            self.assertEqual(lv.calls, ["teardown", "setup", "teardown"])
+            self.assertFalse(lv.status)
+
+if __name__ == "__main__":
+    unittest.main()
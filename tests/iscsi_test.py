@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from mock import Mock, patch
+
+from blivet import iscsi
+from blivet.flags import flags
+
+class FakeNode(object):
+    """ A libiscsi.node that logs in by creating a file named after it. """
+    loginDir = None
+
+    def __init__(self, name, tpgt=1, address=None, port=3260, iface="default"):
+        self.name = name
+        self.tpgt = tpgt
+        self.address = address
+        self.port = port
+        self.iface = iface
+        self.authinfo = None
+
+    def setAuth(self, authinfo):
+        self.authinfo = authinfo
+
+    def login(self):
+        time.sleep(0.2)
+        if "broken" in self.name:
+            raise IOError("login to %s failed" % self.name)
+
+        open(os.path.join(self.loginDir, self.name), "w").close()
+
+class FakeLibiscsi(object):
+    """ Just enough of the libiscsi module for discovery and logins.
+
+        Each portal at address 10.0.0.<n> has nodes iqn.<n>.a and iqn.<n>.b,
+        except for address 10.0.0.99, where discovery fails.
+    """
+    node = FakeNode
+
+    @staticmethod
+    def discover_sendtargets(address, port, authinfo):
+        time.sleep(0.2)
+        if address == "10.0.0.99":
+            raise IOError("no route to host")
+
+        number = address.rpartition(".")[2]
+        return [FakeNode("iqn.%s.%s" % (number, suffix), address=address,
+                         port=port)
+                for suffix in ("a", "b")]
+
+    @staticmethod
+    def chapAuthInfo(username=None, password=None, reverse_username=None,
+                     reverse_password=None):
+        return (username, password, reverse_username, reverse_password)
+
+class ISCSIBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loginDir = tempfile.mkdtemp()
+        FakeNode.loginDir = self.loginDir
+
+        patchers = [patch.object(iscsi, "libiscsi", FakeLibiscsi, create=True),
+                    patch.object(iscsi, "has_iscsi", return_value=True),
+                    patch.object(flags, "ibft", False)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.iscsi = type(iscsi.iscsi)()
+        self.iscsi.initiator = "iqn.1994-05.com.example:test"
+        self.iscsi.started = True
+        self.iscsi.stabilize = Mock()
+        self.portals = [("10.0.0.%d" % n, "3260") for n in range(1, 7)]
+
+    def tearDown(self):
+        shutil.rmtree(self.loginDir)
+
+    def _add(self, threads, portals, **kwargs):
+        with patch.object(flags, "iscsi_threads", threads):
+            start = time.time()
+            self.iscsi.addTargets(portals, **kwargs)
+            return time.time() - start
+
+    def _check(self):
+        names = sorted("iqn.%d.%s" % (n, s) for n in range(1, 7) for s in "ab")
+        self.assertEqual(sorted(os.listdir(self.loginDir)), names)
+        self.assertEqual(sorted(node.name for node in self.iscsi.active_nodes()),
+                         names)
+        self.iscsi.stabilize.assert_called_once_with()
+
+    def testSerial(self):
+        self._add(1, self.portals)
+        self._check()
+
+    def testParallel(self):
+        # 6 discoveries and 12 logins take 3.6s one at a time
+        elapsed = self._add(6, self.portals + [("10.0.0.99", "3260")])
+        self.assertLess(elapsed, 2)
+        self._check()
+
+        # there is nothing new to log into
+        self.assertRaises(IOError, self._add, 6, self.portals)
+
+    def testDiscoverPortals(self):
+        portals = self.portals[:2] + [("10.0.0.99", "3260")]
+        with patch.object(flags, "iscsi_threads", 3):
+            found = self.iscsi.discover_portals(portals)
+
+        self.assertEqual(sorted(found.keys()), sorted(portals))
+        self.assertEqual([n.name for n in found[portals[0]]],
+                         ["iqn.1.a", "iqn.1.b"])
+        self.assertEqual(found[("10.0.0.99", "3260")], [])
+        self.assertNotIn(("10.0.0.99", "3260"), self.iscsi.discovered_targets)
+
+    def testFailedLogins(self):
+        with patch.object(FakeLibiscsi, "discover_sendtargets",
+                          return_value=[FakeNode("iqn.broken.%d" % n)
+                                        for n in range(4)]):
+            self.assertRaises(IOError, self._add, 4, self.portals[:1])
+
+        self.assertEqual(self.iscsi.active_nodes(), [])
+        self.assertFalse(self.iscsi.stabilize.called)
+
+    def testTarget(self):
+        self._add(4, self.portals, target="iqn.2.b")
+        self.assertEqual(os.listdir(self.loginDir), ["iqn.2.b"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+import os
+import tempfile
+import threading
+import unittest
+
+from blivet.mounts import MountsCache
+
+MOUNTINFO = """\
+18 1 253:1 / / rw,relatime shared:1 - ext4 /dev/vda1 rw
+40 18 253:2 / /home rw,relatime shared:20 master:1 - xfs /dev/vda2 rw
+41 18 253:3 / /mnt/top rw,relatime - btrfs /dev/vdb rw,subvol=/
+42 18 253:3 /root /mnt/root rw,relatime shared:22 - btrfs /dev/vdb rw,subvol=/root
+43 40 253:4 / /home rw,relatime shared:23 - ext4 /dev/vdc rw
+garbage
+"""
+
+class MountsCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.write(fd, MOUNTINFO.encode("utf-8"))
+        os.close(fd)
+
+        self.cache = MountsCache()
+        self.cache.MOUNTINFO = self.path
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def testLookups(self):
+        cache = self.cache
+        self.assertEqual(cache.getMountpoints("/dev/vda1"), ["/"])
+        self.assertEqual(cache.getMountpoints("/dev/vdb"), [])
+        self.assertEqual(cache.getMountpoints("/dev/vdb", 5), ["/mnt/top"])
+        self.assertEqual(cache.getMountpoints("/dev/vdb", "root"), ["/mnt/root"])
+        self.assertEqual(cache.getDevices("/home"), [("/dev/vda2", None),
+                                                     ("/dev/vdc", None)])
+        self.assertTrue(cache.isMountpoint("/mnt/root"))
+        self.assertFalse(cache.isMountpoint("/mnt"))
+
+        # callers cannot change the cache
+        cache.getMountpoints("/dev/vda1").append("/boot")
+        self.assertEqual(cache.getMountpoints("/dev/vda1"), ["/"])
+
+    def testRefresh(self):
+        cache = self.cache
+        self.assertTrue(cache.isMountpoint("/home"))
+        with open(self.path, "w") as f:
+            f.write(MOUNTINFO.splitlines()[0] + "\n")
+
+        # a regular file never signals a change; the table is read again
+        # only once the cache is invalidated
+        self.assertTrue(cache.isMountpoint("/home"))
+        cache.invalidate()
+        self.assertFalse(cache.isMountpoint("/home"))
+        self.assertTrue(cache.isMountpoint("/"))
+
+    def testThreads(self):
+        cache = self.cache
+        results = []
+        def lookup():
+            for _i in range(200):
+                cache.invalidate()
+                results.append(cache.getMountpoints("/dev/vda1"))
+
+        threads = [threading.Thread(target=lookup) for _i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # lookups never see a table that is being read again
+        self.assertEqual(results, [["/"]] * 800)
+
+    def testSystem(self):
+        cache = MountsCache()
+        self.assertTrue(cache.isMountpoint("/"))
+        self.assertFalse(cache._changed())
+
+if __name__ == "__main__":
+    unittest.main()
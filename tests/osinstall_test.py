@@ -0,0 +1,150 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock, patch
+
+from blivet import osinstall
+from blivet.flags import flags
+
+class FakeFormat(object):
+    """ A filesystem whose contents are written out when it is mounted. """
+    def __init__(self, files, exists=True):
+        self.files = files
+        self.exists = exists
+        self.linuxNative = True
+        self.mountable = True
+        self.options = "defaults"
+        self.type = "ext4"
+        self.mountpoints = []
+        self.mounted = None
+
+    def mount(self, options=None, mountpoint=None):
+        if self.files is None:
+            raise OSError("mount failed")
+
+        for (name, contents) in self.files.items():
+            path = os.path.join(mountpoint, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(contents)
+
+        self.mountpoints.append(mountpoint)
+        self.mounted = mountpoint
+
+    def unmount(self, mountpoint=None):
+        mountpoint = mountpoint or self.mounted
+        for name in os.listdir(mountpoint):
+            path = os.path.join(mountpoint, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+
+        self.mounted = None
+
+    def teardown(self):
+        if self.mounted:
+            self.unmount()
+
+def fake_device(name, files, exists=True):
+    device = Mock(controllable=True, format=FakeFormat(files, exists=exists))
+    device.name = name
+    device.teardown.side_effect = lambda recursive=None: device.format.teardown()
+    return device
+
+class FindExistingInstallationsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.devices = [fake_device("root%d" % i,
+                                    {"etc/fstab": "root%d" % i,
+                                     "etc/os-release": "NAME=Fedora%d" % i})
+                        for i in range(6)]
+        self.devices.insert(2, fake_device("data", {"data": ""}))
+        self.devices.insert(4, fake_device("broken", None))
+        self.devices.append(fake_device("new", {"etc/fstab": "new"},
+                                        exists=False))
+        self.devicetree = Mock(leaves=self.devices)
+
+        # the mountpoint the sysroot is on and temporary directories
+        # are under
+        self.tmpdir = tempfile.mkdtemp()
+        self.sysroot = os.path.join(self.tmpdir, "sysroot")
+        os.makedirs(self.sysroot)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _find(self, threads, release=True):
+        def parse(devicetree, chroot=None):
+            with open(chroot + "/etc/fstab") as f:
+                return ({"/": f.read()}, [])
+
+        def getReleaseString(root=None, arch=None):
+            with open(root + "/etc/os-release") as f:
+                return ("x86_64", f.read().partition("=")[2], "1")
+
+        with patch.object(flags, "discovery_threads", threads), \
+             patch("blivet.osinstall.getSysroot", return_value=self.sysroot), \
+             patch("blivet.osinstall.getTargetPhysicalRoot", return_value=self.sysroot), \
+             patch("blivet.osinstall.parseFSTab", side_effect=parse), \
+             patch("tempfile.tempdir", self.tmpdir):
+            if not release:
+                return osinstall.findExistingInstallations(self.devicetree)
+
+            with patch("blivet.osinstall.getReleaseString",
+                       side_effect=getReleaseString):
+                return osinstall.findExistingInstallations(self.devicetree)
+
+    def _check(self, roots):
+        self.assertEqual([r.mounts["/"] for r in roots],
+                         ["root%d" % i for i in range(6)])
+        self.assertEqual([r.name for r in roots],
+                         ["Fedora%d Linux 1 for x86_64" % i for i in range(6)])
+
+        # non-existent formats are not even mounted
+        self.assertEqual(self.devices[-1].format.mountpoints, [])
+        for device in self.devices[:-1]:
+            device.setup.assert_called_once_with()
+
+        # filesystems without an fstab have their parents torn down too
+        self.devices[2].teardown.assert_any_call(recursive=True)
+        self.assertNotIn(((), {"recursive": True}),
+                         self.devices[0].teardown.call_args_list)
+
+    def testSerial(self):
+        self._check(self._find(1))
+        for device in self.devices[:-1]:
+            if device.format.files is not None:
+                self.assertEqual(device.format.mountpoints, [self.sysroot])
+
+    def testParallel(self):
+        self._check(self._find(4))
+
+        # each filesystem got a directory of its own, which has been removed
+        mountpoints = [m for d in self.devices for m in d.format.mountpoints]
+        self.assertEqual(len(set(mountpoints)), 7)
+        self.assertEqual(os.listdir(self.tmpdir), ["sysroot"])
+
+    def testParallelRelease(self):
+        for device in self.devices:
+            if device.name.startswith("root"):
+                device.format.files["etc/os-release"] = \
+                    "NAME=Fedora%s\nVERSION_ID=1\n" % device.name[4:]
+
+        # the arch is not found out by running programs in a chroot from
+        # the threads examining the filesystems
+        with patch("blivet.osinstall.util.capture_output") as capture_output:
+            roots = self._find(4, release=False)
+            self.assertFalse(capture_output.called)
+
+        self.assertEqual([r.mounts["/"] for r in roots],
+                         ["root%d" % i for i in range(6)])
+        self.assertEqual([r.name for r in roots],
+                         ["Fedora%d Linux 1 for %s" % (i, os.uname()[4])
+                          for i in range(6)])
+
+if __name__ == "__main__":
+    unittest.main()
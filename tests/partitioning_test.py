@@ -1,7 +1,11 @@
 #!/usr/bin/python
 
+import os
+import random
 import unittest
-from mock import Mock
+from decimal import Decimal
+from operator import gt, lt
+from mock import Mock, patch
 
 import parted
 
@@ -10,6 +14,9 @@ from blivet.partitioning import getNextPartitionType
 from blivet.partitioning import doPartitioning
 from blivet.partitioning import allocatePartitions
 from blivet.partitioning import getFreeRegions
+from blivet.partitioning import getBestFreeSpaceRegion
+from blivet.partitioning import FreeSpaceRegions
+from blivet.partitioning import getDiskChunks
 from blivet.partitioning import Request
 from blivet.partitioning import Chunk
 from blivet.partitioning import LVRequest
@@ -24,7 +31,7 @@ from blivet.devices import DiskFile
 from blivet.devices import PartitionDevice
 
 from tests.imagebackedtestcase import ImageBackedTestCase
-from blivet.util import sparsetmpfile
+from blivet.util import create_sparse_tempfile, sparsetmpfile
 from blivet.formats import getFormat
 from blivet.size import Size
 from blivet.flags import flags
@@ -36,6 +43,79 @@ disklabel_types = {'dos': (4, True, 11),
                    'gpt': (128, False, 0),
                    'mac': (62, False, 0)}
 
+def legacyGetBestFreeSpaceRegion(disk, part_type, req_size, start=None,
+                                 boot=None, best_free=None, grow=None):
+    """ getBestFreeSpaceRegion as it was before FreeSpaceRegions. """
+    extended = disk.getExtendedPartition()
+
+    for free_geom in disk.getFreeSpaceRegions():
+        if start is not None and not free_geom.containsSector(start):
+            continue
+
+        if extended:
+            in_extended = extended.geometry.contains(free_geom)
+            if ((in_extended and part_type == parted.PARTITION_NORMAL) or
+                (not in_extended and part_type == parted.PARTITION_LOGICAL)):
+                continue
+
+        if free_geom.start > disk.maxPartitionStartSector:
+            continue
+
+        if boot:
+            free_start = Size(free_geom.start * disk.device.sectorSize)
+            if free_start + req_size > Size("2 TiB"):
+                continue
+
+        free_size = Size(free_geom.getLength(unit="B"))
+        if grow or part_type == parted.PARTITION_EXTENDED:
+            op = gt
+        else:
+            op = lt
+        if req_size <= free_size:
+            if not best_free or op(free_geom.length, best_free.length):
+                best_free = free_geom
+
+                if boot:
+                    break
+
+    return best_free
+
+def legacyGrowRequests(chunk, uniform=False):
+    """ Chunk.growRequests as it was before the closed-form solver. """
+    chunk.sortRequests()
+    new_base = chunk.base
+    last_pool = 0
+    while not chunk.done and chunk.pool and last_pool != chunk.pool:
+        last_pool = chunk.pool
+        chunk.base = new_base
+        if uniform:
+            growth = int(last_pool / chunk.remaining)
+
+        for p in chunk.requests:
+            if p.done or p in chunk.skip_list:
+                continue
+
+            if not uniform:
+                share = Decimal(p.base) / Decimal(chunk.base)
+                growth = int(share * last_pool)
+
+            p.growth += growth
+            chunk.pool -= growth
+            new_base = chunk.trimOverGrownRequest(p, base=new_base)
+
+    if chunk.pool:
+        for p in chunk.requests:
+            if p.done or p in chunk.skip_list:
+                continue
+
+            p.growth += chunk.pool
+            chunk.pool = 0
+            chunk.trimOverGrownRequest(p)
+            if chunk.pool == 0:
+                break
+
+    chunk.skip_list = []
+
 class PartitioningTestCase(unittest.TestCase):
     def getDisk(self, disk_type, primary_count=0,
                 has_extended=False, logical_count=0):
@@ -505,6 +585,186 @@ class PartitioningTestCase(unittest.TestCase):
         self.assertEqual(req2.growth, 3956)
         self.assertEqual(req3.growth, 512)
 
+    def testAllocateGrowable(self):
+        disk_sizes = [Size("100 MiB"), Size("200 MiB"), Size("300 MiB")]
+        paths = [create_sparse_tempfile("allocatetest", size)
+                 for size in disk_sizes]
+        try:
+            disks = []
+            for path in paths:
+                disk = DiskFile(path)
+                disk.format = getFormat("disklabel", device=disk.path,
+                                        labelType="gpt", exists=False)
+                disks.append(disk)
+
+            p1 = PartitionDevice("p1", size=Size("10 MiB"), grow=True)
+            p2 = PartitionDevice("p2", size=Size("10 MiB"), grow=True)
+
+            storage = Mock(bootDisk=None, compareDisksKey=lambda d: d.name)
+            free = getFreeRegions(disks)
+            chunks = Mock(wraps=getDiskChunks)
+            with patch("blivet.partitioning.getDiskChunks", chunks):
+                allocatePartitions(storage, disks, [p1, p2], free)
+
+            # each request goes where it allows for the most growth in total
+            self.assertEqual(p1.disk, disks[2])
+            self.assertEqual(p2.disk, disks[1])
+
+            # the growth on each disk is worked out once as the disk is and
+            # once with the request on it, and again after the disk changes
+            grown = [disks.index(c[0][0]) for c in chunks.call_args_list]
+            self.assertEqual([grown.count(i) for i in range(3)], [3, 3, 4])
+        finally:
+            for path in paths:
+                os.unlink(path)
+
+class GrowRequestsTestCase(unittest.TestCase):
+    """ Compare Chunk.growRequests to the iterative algorithm it replaced. """
+    def _chunks(self, rand, count):
+        """ Return two identical chunks with count random requests. """
+        specs = []
+        for i in range(count):
+            base = rand.randint(0, 10000) if i else rand.randint(1, 10000)
+            max_growth = rand.choice([0, rand.randint(1, 50000)])
+            specs.append((rand.random() < 0.8, base, max_growth))
+
+        length = sum(s[1] for s in specs) + rand.randint(0, 200000)
+
+        chunks = []
+        for _i in range(2):
+            requests = []
+            for (i, (grow, base, max_growth)) in enumerate(specs):
+                dev = Mock(req_grow=grow, id=i)
+                dev.name = "req%d" % i
+                req = Request(dev)
+                req.base = base
+                req.max_growth = max_growth
+                requests.append(req)
+
+            chunks.append(Chunk(length, requests=requests))
+
+        return chunks
+
+    def _compare(self, new, old):
+        self.assertEqual(new.pool, old.pool)
+        self.assertEqual(new.growth, old.growth)
+        for (n, o) in zip(new.requests, old.requests):
+            self.assertEqual(n.done, o.done)
+            if o.max_growth:
+                self.assertLessEqual(n.growth, o.max_growth)
+
+            # the old algorithm truncated each request's share once per pass
+            # and handed the units lost that way to the first request, so the
+            # two can differ by a few units
+            self.assertLessEqual(abs(n.growth - o.growth), len(new.requests))
+
+    def testEquivalence(self):
+        rand = random.Random(42)
+        for uniform in (False, True):
+            for count in list(range(1, 20)) * 10 + [100, 500]:
+                (new, old) = self._chunks(rand, count)
+                new.growRequests(uniform=uniform)
+                legacyGrowRequests(old, uniform=uniform)
+                self._compare(new, old)
+
+    def testReclaim(self):
+        rand = random.Random(23)
+        for count in range(2, 40):
+            (new, old) = self._chunks(rand, count)
+            new.growRequests()
+            legacyGrowRequests(old)
+
+            # take back some growth from one request and grow the rest again,
+            # the way growPartitions does for requests with a format size
+            # limit
+            for chunk in (new, old):
+                grown = [r for r in chunk.requests if r.growth]
+                if grown:
+                    chunk.reclaim(grown[0], grown[0].growth // 2)
+
+            new.growRequests()
+            legacyGrowRequests(old)
+            self._compare(new, old)
+
+class FakeGeometry(object):
+    def __init__(self, start, end, sector_size):
+        self.start = start
+        self.end = end
+        self.length = end - start + 1
+        self.sector_size = sector_size
+
+    def containsSector(self, sector):
+        return self.start <= sector <= self.end
+
+    def contains(self, other):
+        return self.start <= other.start and other.end <= self.end
+
+    def getLength(self, unit="sectors"):
+        if unit == "B":
+            return self.length * self.sector_size
+
+        return self.length
+
+class FreeSpaceRegionsTestCase(unittest.TestCase):
+    """ Compare getBestFreeSpaceRegion to the search it replaced. """
+    def _disk(self, rand):
+        """ Return a mock parted.Disk with random free regions. """
+        sector_size = rand.choice([512, 4096])
+        scale = rand.choice([2**10, 2**20, 2**24])
+        free = []
+        sector = 0
+        for _i in range(rand.randint(0, 30)):
+            start = sector + rand.randint(1, 4) * scale
+            end = start + rand.randint(1, 40) * scale - 1
+            free.append(FakeGeometry(start, end, sector_size))
+            sector = end
+
+        extended = None
+        if free and rand.random() < 0.6:
+            first = rand.randrange(len(free))
+            last = rand.randrange(first, len(free))
+            extended = Mock(geometry=FakeGeometry(free[first].start - 1,
+                                                  free[last].end,
+                                                  sector_size))
+
+        max_start = rand.choice([sector + 1, sector // 2])
+        return Mock(device=Mock(path="disk", sectorSize=sector_size),
+                    maxPartitionStartSector=max_start,
+                    getFreeSpaceRegions=Mock(return_value=free),
+                    getExtendedPartition=Mock(return_value=extended))
+
+    def testEquivalence(self):
+        rand = random.Random(7)
+        for _i in range(200):
+            disk = self._disk(rand)
+            regions = FreeSpaceRegions(disk)
+            free = disk.getFreeSpaceRegions.return_value
+            others = [FakeGeometry(0, rand.randint(1, 50) * 2**20, 512)
+                      for _j in range(3)]
+            for _j in range(20):
+                kwargs = {"boot": rand.random() < 0.3,
+                          "grow": rand.random() < 0.5,
+                          "best_free": rand.choice([None] + others)}
+                if free and rand.random() < 0.3:
+                    f = rand.choice(free)
+                    kwargs["start"] = rand.randint(f.start - 1, f.end + 1)
+
+                part_type = rand.choice([parted.PARTITION_NORMAL,
+                                         parted.PARTITION_LOGICAL,
+                                         parted.PARTITION_EXTENDED])
+                req_size = Size(rand.randint(1, 20) * 2**20 *
+                                rand.choice([1, 2**4, 2**8]))
+
+                # the index is used instead of looking up the regions again
+                calls = disk.getFreeSpaceRegions.call_count
+                best = getBestFreeSpaceRegion(disk, part_type, req_size,
+                                              regions=regions, **kwargs)
+                self.assertEqual(disk.getFreeSpaceRegions.call_count, calls)
+
+                expected = legacyGetBestFreeSpaceRegion(disk, part_type,
+                                                        req_size, **kwargs)
+                self.assertIs(best, expected)
+
 class ExtendedPartitionTestCase(ImageBackedTestCase):
 
     disks = {"disk1": Size("2 GiB")}
@@ -25,6 +25,7 @@
 # we need integer division to work the same with both Python 2 and 3
 from __future__ import division
 
+import copy
 import locale
 import os
 import unittest
@@ -204,6 +205,29 @@ class SizeTestCase(unittest.TestCase):
         s = Size("10 MiB")
         self.assertEqual(s, cPickle.loads(cPickle.dumps(s)))
 
+    def testArithmetic(self):
+        s = Size("1 GiB")
+        for result in (s + 1, 1 + s, s - Size(1), s * 2, 2 * s,
+                       sum([s, s], Size(0)), Size(s)):
+            self.assertIsInstance(result, Size)
+
+        self.assertEqual(s + 1, Size(1024 ** 3 + 1))
+        self.assertEqual(s - Size("1 MiB"), Size("1023 MiB"))
+        self.assertEqual(s * 3, Size("3 GiB"))
+
+        # other operands still go through Decimal and drop partial bytes
+        self.assertEqual(Size(10) + Decimal("0.5"), Size(10))
+        self.assertEqual(Size(10) * Decimal("1.5"), Size(15))
+
+        # specs parsed earlier give the same result
+        self.assertEqual(Size("1.5 GiB"), Size("1536 MiB"))
+        self.assertEqual(Size("1.5 GiB"), Size("1536 MiB"))
+
+    def testCopy(self):
+        s = Size("10 MiB")
+        self.assertIs(copy.copy(s), s)
+        self.assertIs(copy.deepcopy([s])[0], s)
+
 class TranslationTestCase(unittest.TestCase):
 
     def __init__(self, methodName='runTest'):
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+import inspect
+import json
+import logging
+import unittest
+from mock import patch
+
+from blivet import storage_log
+from blivet.flags import flags
+
+class TraceHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+class Traced(object):
+    def method(self, arg, **kwargs):
+        storage_log.log_method_call(self, arg, **kwargs)
+        storage_log.log_method_return(self, arg)
+        return len(inspect.stack())
+
+class StorageLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = TraceHandler()
+        storage_log.log.addHandler(self.handler)
+        self._level = storage_log.log.level
+        self._structured = flags.structured_trace
+        storage_log.log.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        storage_log.log.removeHandler(self.handler)
+        storage_log.log.setLevel(self._level)
+        flags.structured_trace = self._structured
+
+    def testDisabled(self):
+        storage_log.log.setLevel(logging.INFO)
+        with patch("blivet.storage_log.function_name_and_depth") as name_and_depth:
+            Traced().method("a")
+            self.assertFalse(name_and_depth.called)
+
+        self.assertEqual(self.handler.records, [])
+
+    def testText(self):
+        depth = Traced().method("a", password="secret", size=1)
+        (call, ret) = [r.getMessage() for r in self.handler.records]
+        self.assertTrue(call.startswith(depth * " " + "Traced.method: a ;"))
+        self.assertIn("password: Skipped ;", call)
+        self.assertIn("size: 1 ;", call)
+        self.assertNotIn("secret", call)
+        self.assertEqual(ret, depth * " " + "Traced.method returned a")
+
+    def testStructured(self):
+        flags.structured_trace = True
+        depth = Traced().method("a", passphrase="secret")
+        (call, ret) = [json.loads(r.getMessage()) for r in self.handler.records]
+        self.assertEqual(call, {"event": "call", "class": "Traced",
+                                "method": "method", "depth": depth,
+                                "args": ["a"],
+                                "kwargs": {"passphrase": "Skipped"}})
+        self.assertEqual(ret, {"event": "return", "class": "Traced",
+                               "method": "method", "depth": depth,
+                               "retval": "a"})
+        self.assertEqual(self.handler.records[0].trace, call)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,6 +30,10 @@ class TopologicalSortTestCase(unittest.TestCase):
         graph = blivet.tsort.create_graph(items, edges)
         self._tsortTest(graph)
 
+        # sorting does not consume the graph
+        self.assertEqual(graph['edges'], edges)
+        self.assertEqual(blivet.tsort.tsort(graph), blivet.tsort.tsort(graph))
+
     def _tsortTest(self, graph):
         def check_order(order, graph):
             # since multiple solutions can potentially exist, just verify
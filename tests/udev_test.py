@@ -1,5 +1,7 @@
 #!/usr/bin/python
 
+import os
+import tempfile
 import unittest
 import mock
 
@@ -36,6 +38,66 @@ class UdevTest(unittest.TestCase):
         blivet.udev.trigger()
         self.assertTrue(blivet.udev.util.run_program.called)
 
+class SettleCoordinatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        import blivet.udev
+        (fd, self.seqnum_file) = tempfile.mkstemp()
+        os.close(fd)
+        self._setSeqnum(1)
+
+        self.coordinator = blivet.udev.SettleCoordinator()
+        self.coordinator.SEQNUM_FILE = self.seqnum_file
+        patcher = mock.patch("blivet.udev.util")
+        self.util = patcher.start()
+        self.util.run_program.return_value = 0
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.unlink(self.seqnum_file)
+
+    def _setSeqnum(self, seqnum):
+        with open(self.seqnum_file, "w") as f:
+            f.write("%d\n" % seqnum)
+
+    def test_coalesce(self):
+        for _i in range(3):
+            self.coordinator.settle()
+        self.assertEqual(self.util.run_program.call_count, 1)
+
+        # new uevents have to be waited for
+        self._setSeqnum(5)
+        self.coordinator.settle()
+        self.coordinator.settle()
+        self.assertEqual(self.util.run_program.call_count, 2)
+
+        self.coordinator.settle(force=True)
+        self.coordinator.invalidate()
+        self.coordinator.settle()
+        self.assertEqual(self.util.run_program.call_count, 4)
+        self.assertEqual(self.coordinator.stats, (7, 4))
+
+    def test_failure(self):
+        # a settle that fails or times out is not counted, and the next
+        # request settles again
+        self.util.run_program.return_value = 1
+        self.coordinator.settle()
+        self.coordinator.settle()
+        self.assertEqual(self.util.run_program.call_count, 2)
+        self.assertEqual(self.coordinator.stats, (2, 0))
+
+        self.util.run_program.return_value = 0
+        self.coordinator.settle()
+        self.coordinator.settle()
+        self.assertEqual(self.util.run_program.call_count, 3)
+        self.assertEqual(self.coordinator.stats, (4, 1))
+
+    def test_no_seqnum(self):
+        self.coordinator.SEQNUM_FILE = "/nonexistent"
+        self.coordinator.settle()
+        self.coordinator.settle()
+        self.assertEqual(self.util.run_program.call_count, 2)
+        self.assertEqual(self.coordinator.stats, (2, 2))
 
 if __name__ == "__main__":
     unittest.main()
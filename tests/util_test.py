@@ -1,7 +1,13 @@
 #!/usr/bin/python
 
+import copy
+import logging
+import subprocess
+import threading
+import time
 import unittest
 from decimal import Decimal
+from mock import patch
 
 from blivet import util
 
@@ -22,3 +28,140 @@ class MiscTest(unittest.TestCase):
             self.assertTrue(util.power_of_two(2 ** i), msg=i)
             self.assertFalse(util.power_of_two(2 ** i + 1), msg=i)
             self.assertFalse(util.power_of_two(2 ** i - 1), msg=i)
+
+    def test_parallel_map(self):
+        self.assertEqual(util.parallel_map(lambda x: x * 2, []), [])
+        self.assertEqual(util.parallel_map(lambda x: x * 2, range(20),
+                                           max_workers=4),
+                         [x * 2 for x in range(20)])
+
+        threads = set()
+        def record(x):
+            threads.add(threading.current_thread())
+            time.sleep(0.01)
+            return x
+
+        self.assertEqual(util.parallel_map(record, range(8), max_workers=4),
+                         list(range(8)))
+        self.assertGreater(len(threads), 1)
+        self.assertLessEqual(len(threads), 4)
+
+        # the number of threads is bounded by default
+        threads.clear()
+        count = util.PARALLEL_MAP_WORKERS * 3
+        self.assertEqual(util.parallel_map(record, range(count)),
+                         list(range(count)))
+        self.assertGreater(len(threads), 1)
+        self.assertLessEqual(len(threads), util.PARALLEL_MAP_WORKERS)
+
+        def fail(x):
+            if x % 3 == 1:
+                raise ValueError(x)
+            return x
+
+        with self.assertRaisesRegexp(ValueError, "^1$"):
+            util.parallel_map(fail, range(10), max_workers=3)
+
+    def test_run_programs(self):
+        results = util.run_programs([["sh", "-c", "echo %d; exit %d" % (i, i)]
+                                     for i in range(4)])
+        self.assertEqual(results, [(i, "%d\n" % i) for i in range(4)])
+
+        # the programs run at the same time
+        start = time.time()
+        util.run_programs([["sleep", "0.5"]] * 4)
+        self.assertLess(time.time() - start, 1.5)
+
+    def test_run_program_log(self):
+        messages = []
+        class Handler(logging.Handler):
+            def emit(self, record):
+                messages.append(record.getMessage())
+
+        handler = Handler()
+        util.program_log.addHandler(handler)
+        self.addCleanup(util.program_log.removeHandler, handler)
+        self.addCleanup(util.program_log.setLevel, util.program_log.level)
+        util.program_log.setLevel(logging.INFO)
+        popen = subprocess.Popen
+        def check_popen(*args, **kwargs):
+            # the command line is logged before the program starts, and no
+            # preexec_fn is needed without a chroot
+            self.assertEqual(messages, ["Running... sh -c echo out"])
+            self.assertIsNone(kwargs["preexec_fn"])
+            return popen(*args, **kwargs)
+
+        with patch("blivet.util.subprocess.Popen", side_effect=check_popen):
+            util.run_program(["sh", "-c", "echo out"])
+
+        self.assertEqual(messages[1:], ["stdout:", "out"])
+
+    def test_undo_journal(self):
+        class Thing(object):
+            journal = None
+
+            def __init__(self, name):
+                self.name = name
+                self.items = []
+
+            def change(self, **attrs):
+                if self.journal is not None:
+                    self.journal.record(self)
+
+                for (attr, value) in attrs.items():
+                    setattr(self, attr, value)
+
+        journal = util.UndoJournal()
+        a = Thing("a")
+        b = Thing("b")
+        a.items.append(b)
+        a.journal = b.journal = journal
+
+        # nothing is saved unless the journal is recording
+        a.change(name="a1")
+        self.assertFalse(journal.recording)
+        recording = journal.start()
+        self.assertTrue(journal.recording)
+        a.change(name="a2", extra=True)
+        a.change(name="a3")
+        a.items.remove(b)
+        c = Thing("c")
+        c.journal = journal
+        a.items.append(c)
+
+        # a nested recording's changes end up in the outer one
+        inner = journal.start()
+        b.change(name="b2")
+        journal.close(inner)
+        self.assertTrue(journal.recording)
+
+        # objects that do not record their changes are left alone
+        c.name = "c2"
+
+        items = a.items
+        journal.undo(recording)
+        self.assertFalse(journal.recording)
+        self.assertEqual(a.name, "a1")
+        self.assertFalse(hasattr(a, "extra"))
+        self.assertIs(a.items, items)
+        self.assertEqual(a.items, [b])
+        self.assertEqual(b.name, "b")
+        self.assertEqual(c.name, "c2")
+
+        # recordings have to be finished innermost first
+        recording = journal.start()
+        inner = journal.start()
+        self.assertRaises(ValueError, journal.close, recording)
+        b.change(name="b3")
+        journal.undo(inner)
+        self.assertEqual(b.name, "b")
+        a.change(name="a4")
+        journal.close(recording)
+        self.assertEqual(a.name, "a4")
+        self.assertFalse(journal.recording)
+
+        # copies of a journal start out empty
+        recording = journal.start()
+        self.assertFalse(copy.deepcopy(journal).recording)
+        self.assertFalse(copy.copy(journal).recording)
+        journal.close(recording)